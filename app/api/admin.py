@@ -0,0 +1,99 @@
+import hmac
+import asyncio
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from ..core.config import ADMIN_ENDPOINTS_ENABLED, ADMIN_TOKEN
+from ..core.profiling import cpu_profiler, memory_snapshots, snapshot_top, snapshot_diff, ProfileBusy
+from ..core.tracing import TracedRoute
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not ADMIN_ENDPOINTS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Enabled without a token is a misconfiguration, not an open door
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints require ADMIN_TOKEN to be set")
+    if not hmac.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Missing or invalid X-Admin-Token")
+
+
+router = APIRouter(route_class=TracedRoute, dependencies=[Depends(require_admin)], include_in_schema=False)
+
+GROUP_BY = ("lineno", "filename", "traceback")
+
+
+@router.post("/admin/profile/cpu")
+async def profile_cpu(
+    seconds: float = Query(10, gt=0, description="Profile length, capped by PROFILE_MAX_SECONDS"),
+    hz: float = Query(100, gt=0, le=1000, description="Samples per second"),
+    format: str = Query("folded", description="folded (flame graph input) or json (folded plus top functions)"),
+    include_idle: bool = Query(False, description="Keep samples of threads parked waiting for work"),
+    lines: bool = Query(False, description="Split frames by line number"),
+):
+    if format not in ("folded", "json"):
+        raise HTTPException(status_code=400, detail="format must be folded or json")
+    try:
+        # The sampler sleeps between samples in a worker thread, so the loop keeps serving meanwhile
+        profile = await asyncio.to_thread(cpu_profiler.run, seconds, hz, include_idle, lines)
+    except ProfileBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "folded":
+        return PlainTextResponse(profile["folded"] + "\n")
+    return profile
+
+
+@router.get("/admin/memory")
+def memory_status() -> Dict[str, Any]:
+    return memory_snapshots.status()
+
+
+@router.post("/admin/memory/start")
+def memory_start(frames: int = Query(25, ge=1, le=100, description="Traceback depth stored per allocation")) -> Dict[str, Any]:
+    return memory_snapshots.start(frames)
+
+
+@router.post("/admin/memory/stop")
+def memory_stop() -> Dict[str, Any]:
+    return memory_snapshots.stop()
+
+
+@router.post("/admin/memory/snapshot")
+def memory_snapshot(
+    group_by: str = Query("lineno", description="lineno, filename or traceback"),
+    limit: int = Query(30, ge=1, le=500),
+    frames: int = Query(5, ge=1, le=100, description="Frames shown per entry"),
+) -> Dict[str, Any]:
+    if group_by not in GROUP_BY:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(GROUP_BY)}")
+    try:
+        sid, snapshot = memory_snapshots.take()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"id": sid, **memory_snapshots.status(), **snapshot_top(snapshot, group_by, limit, frames)}
+
+
+@router.get("/admin/memory/diff")
+def memory_diff(
+    base: int = Query(..., description="Snapshot id to compare against"),
+    current: Optional[int] = Query(None, description="Later snapshot id; a new snapshot is taken when omitted"),
+    group_by: str = Query("lineno", description="lineno, filename or traceback"),
+    limit: int = Query(30, ge=1, le=500),
+    frames: int = Query(5, ge=1, le=100),
+) -> Dict[str, Any]:
+    if group_by not in GROUP_BY:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(GROUP_BY)}")
+    base_snapshot = memory_snapshots.get(base)
+    if base_snapshot is None:
+        raise HTTPException(status_code=404, detail=f"No snapshot {base}; only the last few are kept")
+    if current is None:
+        try:
+            current, current_snapshot = memory_snapshots.take()
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+    else:
+        current_snapshot = memory_snapshots.get(current)
+        if current_snapshot is None:
+            raise HTTPException(status_code=404, detail=f"No snapshot {current}")
+    return {"base": base, "current": current, **snapshot_diff(base_snapshot, current_snapshot, group_by, limit, frames)}
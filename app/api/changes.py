@@ -0,0 +1,138 @@
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from ..core.changes import change_detector, CHANGE_TYPES
+from ..core.broker import change_broker
+from ..core.config import CHANGE_STREAM_HEARTBEAT, CHANGE_LOG_SIZE
+from ..db.backends import get_storage_backend
+from ..db.utils import CHANGES_TABLE
+from ..core.tracing import TracedRoute
+
+router = APIRouter(route_class=TracedRoute)
+
+
+@router.get("/changes")
+def list_changes(
+    after: int = Query(0, ge=0, description="Return in-memory events with a sequence number above this cursor"),
+    since: Optional[datetime] = Query(None, description="Read persisted events detected at or after this time instead"),
+    cursor: Optional[str] = Query(None, description="Continue reading persisted events from the `next` of a previous page"),
+    platform: Optional[str] = None,
+    store_id: Optional[str] = None,
+    change_type: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000),
+) -> Dict[str, Any]:
+    if change_type and change_type not in CHANGE_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown change_type '{change_type}'. Use one of {', '.join(CHANGE_TYPES)}")
+
+    if since is None and cursor is None:
+        events = change_detector.recent(after, platform=platform, store_id=store_id, change_type=change_type, limit=limit)
+        return {"events": events, "next": events[-1]["seq"] if events else after}
+
+    backend = get_storage_backend()
+    if not backend:
+        raise HTTPException(status_code=503, detail="Storage backend not available")
+
+    eq = {key: value for key, value in (("platform", platform), ("store_id", store_id), ("change_type", change_type)) if value}
+    if cursor:
+        detected_at, _, last_id = cursor.rpartition("|")
+        if not detected_at or not last_id:
+            raise HTTPException(status_code=400, detail="Invalid cursor; pass the `next` value of a previous page")
+    else:
+        if not since.tzinfo:
+            since = since.replace(tzinfo=timezone.utc)
+        detected_at, last_id = since.isoformat(), None
+    try:
+        events = _persisted_changes(backend, eq, detected_at, last_id, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading changes: {str(e)}")
+    # Without new events a cursor stays where it was; a `since` query has nothing to continue from yet
+    return {"events": events, "next": _cursor(events[-1]) if events else cursor}
+
+
+def _persisted_changes(backend, eq: Dict[str, Any], detected_at: str, last_id: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    """
+    Keyset page ordered by (detected_at, id): events sharing a timestamp are split by id, so a
+    page never repeats the previous one's last event and a burst at one instant cannot stall paging.
+    """
+    order = ["detected_at", "id"]
+    if last_id is None:
+        return backend.select(CHANGES_TABLE, eq=eq, gte={"detected_at": detected_at}, order_by=order, limit=limit)
+    events = backend.select(CHANGES_TABLE, eq={**eq, "detected_at": detected_at}, gt={"id": last_id}, order_by="id", limit=limit)
+    if len(events) < limit:
+        events += backend.select(CHANGES_TABLE, eq=eq, gt={"detected_at": detected_at}, order_by=order, limit=limit - len(events))
+    return events
+
+
+def _cursor(event: Dict[str, Any]) -> str:
+    detected_at = event["detected_at"]
+    return f"{detected_at.isoformat() if isinstance(detected_at, datetime) else detected_at}|{event['id']}"
+
+
+def _values(param: Optional[str]) -> List[str]:
+    return [value.strip() for value in param.split(",") if value.strip()] if param else []
+
+
+def _sse(event: Dict[str, Any]) -> str:
+    return f"id: {event['seq']}\nevent: {event['change_type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+@router.get("/changes/stream")
+async def stream_changes(
+    request: Request,
+    platform: Optional[str] = Query(None, description="Comma-separated platforms"),
+    store_id: Optional[str] = Query(None, description="Comma-separated store ids"),
+    brand: Optional[str] = Query(None, description="Comma-separated brands"),
+    category: Optional[str] = Query(None, description="Comma-separated categories"),
+    change_type: Optional[str] = Query(None, description="Comma-separated change types"),
+    after: Optional[int] = Query(None, ge=0, description="Replay buffered events after this sequence number first"),
+):
+    unknown = set(_values(change_type)) - set(CHANGE_TYPES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown change_type '{', '.join(sorted(unknown))}'. Use one of {', '.join(CHANGE_TYPES)}")
+
+    # EventSource reconnects send the last delivered id as a header
+    last_event_id = request.headers.get("last-event-id")
+    if after is None and last_event_id and last_event_id.isdigit():
+        after = int(last_event_id)
+
+    subscription = change_broker.subscribe(
+        platform=_values(platform),
+        store_id=_values(store_id),
+        brand=_values(brand),
+        category=_values(category),
+        change_type=_values(change_type),
+    )
+
+    async def events():
+        replayed = 0
+        try:
+            if after is not None:
+                for event in change_detector.recent(after, limit=CHANGE_LOG_SIZE):
+                    if subscription.matches(event):
+                        replayed = event["seq"]
+                        yield _sse(event)
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                batch = await subscription.get(CHANGE_STREAM_HEARTBEAT)
+                if not batch:
+                    yield ": keepalive\n\n"
+                for event in batch:
+                    # Skip anything already sent during the replay above
+                    if event["seq"] > replayed:
+                        yield _sse(event)
+        finally:
+            change_broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/changes/stream/stats")
+def stream_stats() -> Dict[str, Any]:
+    return change_broker.stats()
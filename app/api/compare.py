@@ -0,0 +1,68 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+
+from .search_all import create_platform_result
+from ..core.comparison import comparison_index
+from ..core.metrics import CACHE_LOOKUPS
+from ..core.config import MATCHING_ENABLED
+from ..core.tracing import TracedRoute
+
+router = APIRouter(route_class=TracedRoute)
+
+class CompareParams(BaseModel):
+    queries: List[str] = Field(..., description="List of search queries to compare")
+    instamart_store_ids: List[str] = Field([], description="List of Instamart store IDs to search in")
+    zepto_store_ids: List[str] = Field([], description="List of Zepto store IDs to search in")
+    blinkit_coordinates: List[str] = Field([], description="List of Blinkit coordinates as 'lat,lon' strings")
+    bigbasket_coordinates: List[str] = Field([], description="List of BigBasket coordinates as 'lat,lon' strings")
+    max_age_seconds: Optional[int] = Field(None, description="Reuse cached platform results up to this age; defaults to COMPARE_CACHE_TTL")
+    min_platforms: int = Field(1, ge=1, le=4, description="Only return products found on at least this many platforms")
+    limit: Optional[int] = Field(200, ge=1, description="Maximum number of product groups to return")
+    save_to_db: bool = Field(False, description="Whether to save freshly fetched results to the database")
+
+@router.post("/compare")
+async def compare_platforms(params: CompareParams) -> Dict[str, Any]:
+    if not MATCHING_ENABLED:
+        raise HTTPException(status_code=503, detail="Product matching is disabled (MATCHING_ENABLED=false)")
+
+    locations = {
+        "instamart": params.instamart_store_ids,
+        "zepto": params.zepto_store_ids,
+        "blinkit": params.blinkit_coordinates,
+        "bigbasket": params.bigbasket_coordinates,
+    }
+    scopes = [
+        (platform, location, query)
+        for query in params.queries
+        for platform, platform_locations in locations.items()
+        for location in platform_locations
+    ]
+    if not scopes:
+        raise HTTPException(status_code=400, detail="Provide at least one query and one store or coordinate")
+
+    # Searches feed the comparison index through the pipeline, so only stale scopes are fetched
+    stale = []
+    for scope in scopes:
+        fresh = comparison_index.is_fresh(*scope, max_age=params.max_age_seconds)
+        CACHE_LOOKUPS.inc(platform=scope[0], cache="compare", result="hit" if fresh else "miss")
+        if not fresh:
+            stale.append(scope)
+    results = await asyncio.gather(*(
+        create_platform_result(platform, query, store=location, save_to_db=params.save_to_db)
+        for platform, location, query in stale
+    ))
+    failed = [
+        {"platform": r.platform, "query": r.query, "store": r.store}
+        for r in results if not r.products
+    ]
+
+    groups = comparison_index.compare(scopes, min_platforms=params.min_platforms, limit=params.limit)
+    return {
+        "groups": groups,
+        "scopes": len(scopes),
+        "fetched": len(stale),
+        "cached": len(scopes) - len(stale),
+        "empty_or_failed": failed,
+    }
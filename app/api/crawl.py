@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+
+from .search_bigbasket import list_bigbasket_categories, fetch_bigbasket_category_page
+from .search_blinkit import list_blinkit_categories, fetch_blinkit_category_page, parse_blinkit_category
+from .search_instamart import list_instamart_categories, fetch_instamart_category_page
+from ..core.crawl import CrawlState
+from ..core.config import CRAWL_PAGE_BUDGET, CRAWL_MAX_PAGES_PER_CATEGORY
+from ..core.pipeline import handle_scraped_products_async
+from ..core.tracing import TracedRoute
+
+router = APIRouter(route_class=TracedRoute)
+logger = logging.getLogger(__name__)
+
+def _plain_category(value: str) -> Optional[Dict[str, Any]]:
+    value = value.strip()
+    return {"key": value, "name": value} if value else None
+
+# platform -> (list categories, fetch one category page, parse a caller-supplied category)
+CRAWLERS: Dict[str, tuple] = {
+    "bigbasket": (list_bigbasket_categories, fetch_bigbasket_category_page, _plain_category),
+    "blinkit": (list_blinkit_categories, fetch_blinkit_category_page, parse_blinkit_category),
+    "instamart": (list_instamart_categories, fetch_instamart_category_page, _plain_category),
+}
+
+class CrawlParams(BaseModel):
+    store: str = Field(..., description="Store id (instamart) or 'lat,lon' coordinates (blinkit, bigbasket)")
+    categories: Optional[List[str]] = Field(None, description="Categories to crawl instead of discovering the category tree")
+    restart: bool = Field(False, description="Discard the saved cursor and start a new crawl")
+    page_budget: int = Field(CRAWL_PAGE_BUDGET, ge=1, description="Maximum upstream pages to fetch in this call")
+    save_to_db: bool = Field(False, description="Whether to save crawled products to the database")
+
+async def _call(fn: Callable, *args):
+    if asyncio.iscoroutinefunction(fn):
+        return await fn(*args)
+    return await run_in_threadpool(fn, *args)
+
+def _crawler(platform: str) -> tuple:
+    if platform == "zepto":
+        raise HTTPException(status_code=501, detail="Catalog crawl is not available for Zepto; use /zepto/search")
+    if platform not in CRAWLERS:
+        raise HTTPException(status_code=404, detail=f"Unknown platform: {platform}")
+    return CRAWLERS[platform]
+
+@router.post("/{platform}/crawl")
+async def crawl_catalog(platform: str, params: CrawlParams) -> Dict[str, Any]:
+    """Walk a store's categories once, deduping by variant_id; call again to resume from the saved cursor."""
+    list_categories, fetch_page, parse_category = _crawler(platform)
+    state = CrawlState.load(platform, params.store)
+
+    if params.restart or not state.started or state.complete:
+        if params.categories:
+            categories = [parse_category(value) for value in params.categories]
+            if not all(categories):
+                raise HTTPException(status_code=400, detail=f"Could not parse categories for {platform}: {params.categories}")
+        else:
+            try:
+                categories = await _call(list_categories, params.store)
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=502, detail=f"Error discovering {platform} categories: {str(e)}")
+            if not categories:
+                raise HTTPException(status_code=502, detail=f"No {platform} categories discovered; pass them in 'categories'")
+        state.start(categories)
+        state.save()
+        logger.info(f"Started {platform} crawl for {params.store} with {len(categories)} categories")
+
+    pages = 0
+    new_products = 0
+    state.last_error = None
+    while pages < params.page_budget and state.next_category():
+        category = state.current["category"]
+        try:
+            products, next_cursor = await _call(fetch_page, params.store, category, state.current["cursor"])
+        except Exception as e:
+            # The cursor still points at the failed page, so the next call retries it
+            state.last_error = f"{category['key']}: {getattr(e, 'detail', None) or str(e)}"
+            logger.error(f"{platform} crawl of {params.store} stopped at {state.last_error}")
+            break
+        pages += 1
+        fresh = state.dedupe(products)
+        new_products += len(fresh)
+        if fresh:
+            # A page is only part of its category, and the first full crawl of a store is the baseline
+            await handle_scraped_products_async(
+                platform, params.store, f"category:{category['name']}", fresh, params.save_to_db,
+                partial=True, baseline=state.crawls_completed == 0,
+            )
+        state.advance(next_cursor, CRAWL_MAX_PAGES_PER_CATEGORY)
+        state.save()
+
+    state.save()
+    return {**state.status(), "pages_this_call": pages, "products_this_call": new_products}
+
+@router.get("/{platform}/crawl/status")
+def crawl_status(platform: str, store: str) -> Dict[str, Any]:
+    _crawler(platform)
+    return CrawlState.load(platform, store).status()
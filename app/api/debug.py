@@ -0,0 +1,18 @@
+from typing import Any, Dict
+from fastapi import APIRouter, Depends, Query
+
+from .admin import require_admin
+from ..core.loop_monitor import loop_monitor
+from ..core.tracing import TracedRoute
+
+# Stack samples show source layout, so this sits behind the admin token like the profiler
+router = APIRouter(route_class=TracedRoute, dependencies=[Depends(require_admin)], include_in_schema=False)
+
+
+@router.get("/debug/loop")
+def loop_stats(
+    limit: int = Query(20, ge=0, le=500, description="Most recent block events to return"),
+    stacks: int = Query(3, ge=0, le=50, description="Distinct stacks per block event"),
+) -> Dict[str, Any]:
+    """Event-loop lag percentiles, blocking hotspots and recent block events with stack samples"""
+    return loop_monitor.stats(limit, stacks)
@@ -0,0 +1,52 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+
+from .search_blinkit import search_blinkit_generator
+from .search_bigbasket import search_bigbasket_generator
+from .search_instamart import search_instamart_generator
+from .search_zepto import search_zepto_generator
+from ..utils.export_utils import export_response, DEFAULT_BATCH_SIZE
+from ..core.tracing import TracedRoute
+
+router = APIRouter(route_class=TracedRoute)
+
+COORDINATE_PLATFORMS = ("blinkit", "bigbasket")
+STORE_PLATFORMS = ("instamart", "zepto")
+
+
+@router.get("/{platform}/download")
+def download_products(
+    platform: str,
+    query: str,
+    coordinates: Optional[str] = None,
+    store_id: Optional[str] = None,
+    format: str = Query("csv", description="csv, ndjson or parquet"),
+    columns: Optional[str] = Query(None, description="Comma separated list of columns to export"),
+    compression: str = Query("none", description="none, gzip or zstd (sent as Content-Encoding)"),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, description="Rows per write / Parquet row group"),
+):
+    if platform in COORDINATE_PLATFORMS:
+        if not coordinates:
+            raise HTTPException(status_code=400, detail=f"coordinates is required for {platform}")
+        if platform == "blinkit":
+            rows = search_blinkit_generator(query, coordinates)
+        else:
+            rows = search_bigbasket_generator(query, coordinates)
+    elif platform in STORE_PLATFORMS:
+        if not store_id:
+            raise HTTPException(status_code=400, detail=f"store_id is required for {platform}")
+        if platform == "instamart":
+            rows = search_instamart_generator(query, store_id)
+        else:
+            rows = search_zepto_generator(query, store_id)
+    else:
+        raise HTTPException(status_code=404, detail=f"Unknown platform: {platform}")
+
+    return export_response(
+        rows,
+        filename=f"{platform}_products",
+        fmt=format,
+        columns=columns,
+        compression=compression,
+        batch_size=batch_size
+    )
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Query
+
+from ..db.backends import get_storage_backend
+from ..db.utils import SNAPSHOT_TABLE
+from ..core.tracing import TracedRoute
+
+router = APIRouter(route_class=TracedRoute)
+
+# Downsampling bucket sizes in seconds, smallest first
+INTERVALS = {"15m": 900, "1h": 3600, "6h": 21600, "1d": 86400, "1w": 604800}
+# Snapshots read per request; longer ranges keep the newest rows and report `truncated`
+MAX_HISTORY_ROWS = 100000
+
+
+def _as_datetime(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        moment = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    # Stored timestamps are UTC ISO strings and the SQLite backend compares them as text
+    return moment.astimezone(timezone.utc) if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def choose_interval(start: datetime, end: datetime, max_points: int) -> str:
+    span = (end - start).total_seconds()
+    for name, seconds in INTERVALS.items():
+        if span / seconds <= max_points:
+            return name
+    return "1w"
+
+
+def downsample(rows: List[Dict[str, Any]], seconds: Optional[int]) -> List[Dict[str, Any]]:
+    """Aggregate time-ordered snapshots into fixed buckets (min/max/avg/last price, last stock)."""
+    points = []
+    current = None
+    for row in rows:
+        moment = _as_datetime(row["scraped_at"])
+        bucket = moment if not seconds else datetime.fromtimestamp(
+            int(moment.timestamp()) // seconds * seconds, tz=timezone.utc
+        )
+        price = float(row["price"]) if row.get("price") is not None else None
+        if current is None or current["t"] != bucket:
+            current = {
+                "t": bucket,
+                "price_min": price,
+                "price_max": price,
+                "price_last": price,
+                "_price_sum": price or 0.0,
+                "_price_count": 1 if price is not None else 0,
+                "samples": 0,
+            }
+            points.append(current)
+        elif price is not None:
+            current["price_min"] = price if current["price_min"] is None else min(current["price_min"], price)
+            current["price_max"] = price if current["price_max"] is None else max(current["price_max"], price)
+            current["price_last"] = price
+            current["_price_sum"] += price
+            current["_price_count"] += 1
+        current["samples"] += 1
+        current["mrp"] = row.get("mrp")
+        current["in_stock"] = row.get("in_stock")
+        current["inventory"] = row.get("inventory")
+        current["organic_rank"] = row.get("organic_rank")
+
+    for point in points:
+        count = point.pop("_price_count")
+        total = point.pop("_price_sum")
+        point["price_avg"] = round(total / count, 2) if count else None
+        point["t"] = point["t"].isoformat()
+    return points
+
+
+@router.get("/history")
+def product_history(
+    platform: str,
+    variant_id: str,
+    store_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    interval: str = Query("auto", description="auto, raw, 15m, 1h, 6h, 1d or 1w"),
+    max_points: int = Query(500, ge=1, le=10000, description="Upper bound on points per series when interval=auto"),
+) -> Dict[str, Any]:
+    backend = get_storage_backend()
+    if not backend:
+        raise HTTPException(status_code=503, detail="Storage backend not available")
+
+    end = _as_datetime(end) if end else datetime.now(timezone.utc)
+    start = _as_datetime(start) if start else end - timedelta(days=30)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if interval == "auto":
+        interval = choose_interval(start, end, max_points)
+    if interval != "raw" and interval not in INTERVALS:
+        raise HTTPException(status_code=400, detail=f"Unknown interval '{interval}'")
+
+    eq = {"platform": platform, "variant_id": variant_id}
+    if store_id:
+        eq["store_id"] = store_id
+
+    try:
+        rows = backend.select(
+            SNAPSHOT_TABLE,
+            columns=["store_id", "scraped_at", "price", "mrp", "in_stock", "inventory", "organic_rank"],
+            eq=eq,
+            gte={"scraped_at": start.isoformat()},
+            lte={"scraped_at": end.isoformat()},
+            order_by="scraped_at",
+            descending=True,
+            limit=MAX_HISTORY_ROWS + 1,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading history: {str(e)}")
+    truncated = len(rows) > MAX_HISTORY_ROWS
+    rows = rows[:MAX_HISTORY_ROWS]
+    rows.reverse()
+
+    by_store: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        by_store.setdefault(row["store_id"], []).append(row)
+
+    return {
+        "platform": platform,
+        "variant_id": variant_id,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "interval": interval,
+        # Only the newest MAX_HISTORY_ROWS snapshots were read; points start at `covered_from`
+        "truncated": truncated,
+        "covered_from": _as_datetime(rows[0]["scraped_at"]).isoformat() if truncated else start.isoformat(),
+        "series": [
+            {"store_id": store, "points": downsample(store_rows, INTERVALS.get(interval))}
+            for store, store_rows in by_store.items()
+        ],
+    }
@@ -0,0 +1,34 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..core.metrics import registry, render
+from ..core.broker import change_broker
+from ..core.comparison import comparison_index
+from ..core.membership import store_membership
+from ..db.writer import db_writer
+from ..core.tracing import TracedRoute
+
+router = APIRouter(route_class=TracedRoute)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Queue depths and sizes are read from their owners when /metrics is scraped
+registry.gauge("scraper_db_writer_queue_depth", "Row batches waiting for the background DB writer",
+               callback=db_writer.queue_depth)
+registry.counter("scraper_db_writer_rows_spilled_total", "Rows the DB writer spilled to disk after failed retries",
+                 callback=lambda: db_writer.stats["rows_spilled"])
+registry.counter("scraper_db_writer_retries_total", "Batch writes retried by the DB writer",
+                 callback=lambda: db_writer.stats["retries"])
+registry.gauge("scraper_change_stream_subscribers", "Open change-feed subscriptions",
+               callback=lambda: change_broker.stats()["subscribers"])
+registry.gauge("scraper_change_stream_pending_events", "Change events queued for change-feed subscribers",
+               callback=lambda: change_broker.stats()["pending"])
+registry.gauge("scraper_compare_cache_scopes", "Scopes held by the comparison cache",
+               callback=lambda: len(comparison_index))
+registry.gauge("scraper_membership_stores_loaded", "Store membership filters loaded in memory",
+               callback=lambda: store_membership.stats()["stores_loaded"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,13 +1,19 @@
 import asyncio
+import logging
 from typing import List, Dict, Any, Optional
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 
 from .search_instamart import search_instamart
 from .search_zepto import search_zepto
 from .search_blinkit import search_blinkit
+from .search_bigbasket import search_bigbasket
+from ..utils.export_utils import export_response, DEFAULT_BATCH_SIZE
+from ..core.tracing import TracedRoute, span
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
+logger = logging.getLogger(__name__)
 
 class SearchParams(BaseModel):
     queries: List[str] = Field(..., description="List of search queries to execute")
@@ -23,6 +29,10 @@ class SearchResult(BaseModel):
     products: List[Dict[str, Any]]
 
 async def create_platform_result(platform: str, query: str, store: str = None, save_to_db: bool = False) -> SearchResult:
+    with span(f"search.{platform}", query=query, store=store):
+        return await _platform_result(platform, query, store, save_to_db)
+
+async def _platform_result(platform: str, query: str, store: str = None, save_to_db: bool = False) -> SearchResult:
     try:
         products = []
         
@@ -31,19 +41,22 @@ async def create_platform_result(platform: str, query: str, store: str = None, s
         elif platform == "zepto":
             products = await search_zepto(query=query, store_id=store, save_to_db=save_to_db)
         elif platform == "blinkit":
-            products = await search_blinkit(query=query, coordinates=store, save_to_db=save_to_db)
+            products = await run_in_threadpool(search_blinkit, query=query, coordinates=store, save_to_db=save_to_db)
+        elif platform == "bigbasket":
+            products = await run_in_threadpool(search_bigbasket, query=query, coordinates=store, save_to_db=save_to_db)
         else:
             raise ValueError(f"Unknown platform: {platform}")
         
-        return SearchResult(
-            platform=platform,
-            query=query,
-            store=store,
-            products=products
-        )
+        with span("validate", products=len(products)):
+            return SearchResult(
+                platform=platform,
+                query=query,
+                store=store,
+                products=products
+            )
             
     except Exception as e:
-        print(f"Error in {platform} search for query '{query}', location '{store}': {str(e)}")
+        logger.error(f"Error in {platform} search for query '{query}', location '{store}': {str(e)}")
         
         return SearchResult(
             platform=platform,
@@ -52,10 +65,7 @@ async def create_platform_result(platform: str, query: str, store: str = None, s
             products=[]
         )
 
-@router.post("/search/all", response_model=List[SearchResult])
-async def search_all_platforms(search_params: SearchParams) -> List[SearchResult]:
-
-    all_results = []
+def create_platform_tasks(search_params: SearchParams) -> list:
     tasks = []
     
     for query in search_params.queries:
@@ -71,10 +81,41 @@ async def search_all_platforms(search_params: SearchParams) -> List[SearchResult
             # Assuming coords is a string like "lat,lon"
             tasks.append(create_platform_result("blinkit", query, store=coords, save_to_db=search_params.save_to_db))
     
+    return tasks
+
+@router.post("/search/all", response_model=List[SearchResult])
+async def search_all_platforms(search_params: SearchParams) -> List[SearchResult]:
+
+    all_results = []
+    tasks = create_platform_tasks(search_params)
+    
     results = await asyncio.gather(*tasks, return_exceptions=True)
     
     for result in results:
         if not isinstance(result, Exception):
             all_results.append(result)
     
-    return all_results
\ No newline at end of file
+    return all_results
+
+@router.post("/search/all/download")
+async def download_all_platforms(
+    search_params: SearchParams,
+    format: str = Query("csv", description="csv, ndjson or parquet"),
+    columns: Optional[str] = Query(None, description="Comma separated list of columns to export"),
+    compression: str = Query("none", description="none, gzip or zstd (sent as Content-Encoding)"),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, description="Rows per write / Parquet row group"),
+):
+    async def rows():
+        for next_result in asyncio.as_completed(create_platform_tasks(search_params)):
+            result = await next_result
+            for product in result.products:
+                yield product
+
+    return export_response(
+        rows(),
+        filename="all_platforms_products",
+        fmt=format,
+        columns=columns,
+        compression=compression,
+        batch_size=batch_size
+    )
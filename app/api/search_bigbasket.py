@@ -1,30 +1,43 @@
 from fastapi import APIRouter, HTTPException
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+import re
 import json
 import logging
-import cloudscraper
 import time
 import random
 import base64
 
+from ..core.constants import BIGBASKET_BASE_URL
 from ..db.models import Product
-from ..db.utils import save_products_to_db
+from ..core.pipeline import handle_scraped_products, ExportPipeline
+from ..core.crawl import walk_strings
+from ..core.archive import archive_response
+from ..core.metrics import instrument_fetch, instrument_extract, record_response, UPSTREAM_RETRIES, PAGES_PER_QUERY
 from ..utils.format_utils import model_to_dict
+from ..core.tracing import TracedRoute, span
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 logger = logging.getLogger(__name__)
 
 # Global session management
 bb_session = None
 last_request_time = 0
 
+BIGBASKET_CATEGORY_TREE_URL = f"{BIGBASKET_BASE_URL}/ui-svc/v1/category-tree"
+BIGBASKET_PAGE_SIZE = 30
+# Category links look like /pc/fruits-vegetables/fresh-vegetables/
+BIGBASKET_CATEGORY_RE = re.compile(r"/pc/([a-z0-9-]+(?:/[a-z0-9-]+)*)/?")
+
 def generate_address_info(lat: float, lon: float, address: str, pincode: str, city: str) -> str:
     """Generate the _bb_addressinfo cookie value from coordinates"""
     address_info = f"{lat}|{lon}|{address}|{pincode}|{city}|1|false|true|true|Bigbasketeer"
     return base64.b64encode(address_info.encode()).decode()
 
+@instrument_fetch("bigbasket", "session")
 def init_bigbasket_session(lat: float, lon: float, address: str, pincode: str, city: str):
     """Initialize a session with BigBasket including location cookies"""
+    import cloudscraper
+
     global bb_session
     bb_session = cloudscraper.create_scraper()
     
@@ -41,7 +54,7 @@ def init_bigbasket_session(lat: float, lon: float, address: str, pincode: str, c
     # First request to establish session (unchanged)
     try:
         response = bb_session.get(
-            "https://www.bigbasket.com/",
+            f"{BIGBASKET_BASE_URL}/",
             headers={
                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
                 "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
@@ -53,6 +66,7 @@ def init_bigbasket_session(lat: float, lon: float, address: str, pincode: str, c
         logger.error(f"Error initializing BigBasket session: {str(e)}")
         bb_session = None
 
+@instrument_extract("bigbasket")
 def extract_products_bigbasket(response_data: Dict, search_query: str) -> List[Product]:
     """Extract products from BigBasket API response"""
     products = []
@@ -131,8 +145,9 @@ def extract_products_bigbasket(response_data: Dict, search_query: str) -> List[P
                 
     return products
 
-def fetch_bigbasket_data(query: str, lat: float, lon: float, address: str, pincode: str, city: str, page: int = 1) -> Dict[str, Any]:
-    """Fetch data from BigBasket with location support"""
+@instrument_fetch("bigbasket", "listing")
+def fetch_bigbasket_data(query: str, lat: float, lon: float, address: str, pincode: str, city: str, page: int = 1, listing_type: str = "ps") -> Dict[str, Any]:
+    """Fetch data from BigBasket with location support (listing_type "ps" for search, "pc" for a category slug)"""
     global bb_session, last_request_time
     
     # Initialize session with location if needed
@@ -150,9 +165,9 @@ def fetch_bigbasket_data(query: str, lat: float, lon: float, address: str, pinco
         sleep_time = 2 - (current_time - last_request_time) + random.uniform(0.1, 0.5)
         time.sleep(sleep_time)
     
-    url = "https://www.bigbasket.com/listing-svc/v2/products"
+    url = f"{BIGBASKET_BASE_URL}/listing-svc/v2/products"
     params = {
-        "type": "ps",
+        "type": listing_type,
         "slug": query,
         "page": page,
         "bucket_id": 40
@@ -162,7 +177,7 @@ def fetch_bigbasket_data(query: str, lat: float, lon: float, address: str, pinco
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
         "Accept": "application/json, text/plain, */*",
         "Accept-Language": "en-US,en;q=0.9",
-        "Referer": f"https://www.bigbasket.com/ps/?q={query}",
+        "Referer": f"https://www.bigbasket.com/ps/?q={query}" if listing_type == "ps" else f"https://www.bigbasket.com/pc/{query}/",
         "X-Requested-With": "XMLHttpRequest",
         "DNT": "1",
         "Connection": "keep-alive",
@@ -178,6 +193,7 @@ def fetch_bigbasket_data(query: str, lat: float, lon: float, address: str, pinco
         )
         
         last_request_time = time.time()
+        record_response("bigbasket", response.status_code, response.content)
         
         if response.status_code != 200:
             logger.error(f"BigBasket API error: {response.status_code} - {response.text[:200]}")
@@ -186,7 +202,12 @@ def fetch_bigbasket_data(query: str, lat: float, lon: float, address: str, pinco
                 detail=f"BigBasket API returned status {response.status_code}"
             )
         
-        return response.json()
+        response_data = response.json()
+        if listing_type == "ps":
+            archive_response("bigbasket", response.content, query, f"{lat},{lon}", "search", page)
+        else:
+            archive_response("bigbasket", response.content, f"category:{query.split('/')[-1]}", f"{lat},{lon}", "category", page)
+        return response_data
     
     except Exception as e:
         logger.error(f"Error while fetching BigBasket data: {str(e)}")
@@ -196,6 +217,102 @@ def fetch_bigbasket_data(query: str, lat: float, lon: float, address: str, pinco
             detail=f"Error while fetching data from BigBasket API: {str(e)}"
         )
 
+@instrument_fetch("bigbasket", "categories")
+def list_bigbasket_categories(
+    coordinates: str,
+    address: str = "Railway Colony",
+    pincode: str = "226004",
+    city: str = "Lucknow"
+) -> List[Dict[str, Any]]:
+    """Leaf categories of the BigBasket category tree for the location"""
+    global bb_session
+    lat, lon = map(float, coordinates.split(','))
+    if bb_session is None:
+        init_bigbasket_session(lat, lon, address, pincode, city)
+        if bb_session is None:
+            raise HTTPException(status_code=500, detail="Failed to initialize BigBasket session")
+
+    response = bb_session.get(
+        BIGBASKET_CATEGORY_TREE_URL,
+        headers={
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            "Accept": "application/json, text/plain, */*",
+            "X-Requested-With": "XMLHttpRequest",
+        },
+        timeout=30
+    )
+    record_response("bigbasket", response.status_code, response.content)
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail=f"BigBasket category tree returned status {response.status_code}")
+
+    slugs = {match.group(1) for text in walk_strings(response.json()) for match in BIGBASKET_CATEGORY_RE.finditer(text)}
+    # Parents list everything their children do, so only leaves are crawled
+    leaves = sorted(slug for slug in slugs if not any(other.startswith(slug + "/") for other in slugs))
+    return [{"key": slug, "name": slug.split("/")[-1]} for slug in leaves]
+
+def fetch_bigbasket_category_page(
+    coordinates: str,
+    category: Dict[str, Any],
+    cursor: Optional[int] = None,
+    address: str = "Railway Colony",
+    pincode: str = "226004",
+    city: str = "Lucknow"
+) -> Tuple[List[Product], Optional[int]]:
+    """One page of a category listing and the next page number, or None on the last page"""
+    lat, lon = map(float, coordinates.split(','))
+    page = cursor or 1
+    response_data = fetch_bigbasket_data(category["key"], lat, lon, address, pincode, city, page, listing_type="pc")
+    products = extract_products_bigbasket(response_data, f"category:{category['name']}")
+    for idx, product in enumerate(products):
+        product.organic_rank = (page - 1) * BIGBASKET_PAGE_SIZE + idx + 1
+    time.sleep(random.uniform(1.5, 3.0))
+    return products, (page + 1 if len(products) >= BIGBASKET_PAGE_SIZE else None)
+
+def search_bigbasket_generator(
+    query: str,
+    coordinates: str,
+    max_pages: int = 3,
+    address: str = "Railway Colony",
+    pincode: str = "226004",
+    city: str = "Lucknow"
+):
+    """Yield BigBasket product dicts page by page for streaming exports"""
+    lat, lon = map(float, coordinates.split(','))
+    page = 1
+    has_more = True
+    max_retries = 3
+    export = ExportPipeline("bigbasket", coordinates, query)
+
+    try:
+        while has_more and page <= max_pages:
+            retries = 0
+            success = False
+
+            while retries < max_retries and not success:
+                try:
+                    response_data = fetch_bigbasket_data(query, lat, lon, address, pincode, city, page)
+                    products = extract_products_bigbasket(response_data, query)
+                    for idx, product in enumerate(products):
+                        product.organic_rank = (page - 1) * 30 + idx + 1
+                    yield from export.rows(products)
+                    success = True
+                    has_more = len(products) >= 30
+                except HTTPException as e:
+                    retries += 1
+                    UPSTREAM_RETRIES.inc(platform="bigbasket")
+                    if retries >= max_retries:
+                        logger.error(f"Failed after {max_retries} retries for page {page}: {e.detail}")
+                        has_more = False
+                    else:
+                        logger.warning(f"Retry {retries} for page {page}: {e.detail}")
+                        time.sleep(2 ** retries)
+
+            if success:
+                page += 1
+                time.sleep(random.uniform(1.5, 3.0))
+    except Exception as e:
+        logger.error(f"Error in BigBasket generator: {str(e)}")
+
 @router.get("/bigbasket/search")
 def search_bigbasket(
     query: str,
@@ -215,6 +332,7 @@ def search_bigbasket(
         page = 1
         has_more = True
         max_retries = 3
+        failed = False
         
         logger.info(f"Searching BigBasket for '{query}' at location: {lat},{lon} address: {address}, pincode: {pincode}, city: {city}")
 
@@ -239,9 +357,11 @@ def search_bigbasket(
                     
                 except HTTPException as e:
                     retries += 1
+                    UPSTREAM_RETRIES.inc(platform="bigbasket")
                     if retries >= max_retries:
                         logger.error(f"Failed after {max_retries} retries for page {page}: {e.detail}")
                         has_more = False
+                        failed = True
                     else:
                         logger.warning(f"Retry {retries} for page {page}: {e.detail}")
                         time.sleep(2 ** retries)  # Exponential backoff
@@ -251,14 +371,15 @@ def search_bigbasket(
                 time.sleep(random.uniform(1.5, 3.0))  # Random delay between pages
         
         logger.info(f"Found {len(all_products)} products for query '{query}'")
+        PAGES_PER_QUERY.observe(page - 1, platform="bigbasket")
         
-        # Save to database if requested
-        if save_to_db and all_products:
-            save_products_to_db(all_products, "products")
+        # A failed page or the page cap leaves variants unseen; they must not be reported as delisted
+        handle_scraped_products("bigbasket", coordinates, query, all_products, save_to_db, partial=failed or has_more)
         
         # Return standardized response
         exclude_fields = ["id", "created_at", "updated_at"]
-        return [model_to_dict(product, exclude_fields=exclude_fields) for product in all_products]
+        with span("bigbasket.serialize"):
+            return [model_to_dict(product, exclude_fields=exclude_fields) for product in all_products]
         
     except Exception as e:
         logger.exception("BigBasket search failed")
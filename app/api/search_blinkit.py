@@ -1,15 +1,12 @@
 from fastapi import APIRouter, HTTPException
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+import re
 import json
 import subprocess
 from urllib.parse import urlencode, urlparse, parse_qs
 import logging
-import cloudscraper
 import time
 # import brotli
-from fastapi.responses import StreamingResponse
-import io
-import csv
 
 from ..utils.token_utils import (
     generate_uuid, 
@@ -17,14 +14,28 @@ from ..utils.token_utils import (
 )
 from ..core.constants import (
     BLINKIT_USER_AGENT, 
-    BLINKIT_APP_VERSION
+    BLINKIT_APP_VERSION,
+    BLINKIT_BASE_URL
 )
 from ..db.models import Product
-from ..db.utils import save_products_to_db
+from ..core.pipeline import handle_scraped_products, ExportPipeline
+from ..core.crawl import walk_strings
+from ..core.archive import archive_response
+from ..core.metrics import instrument_fetch, instrument_extract, record_response, UPSTREAM_RETRIES, PAGES_PER_QUERY
 from ..utils.format_utils import model_to_dict
+from ..core.tracing import TracedRoute, span
+from ..core.transport import get_transport
+from ..core.config import BLINKIT_TRANSPORT
+from ..core.logs import preview
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
+logger = logging.getLogger(__name__)
 
+BLINKIT_CATEGORIES_PATH = "/v1/layout/categories"
+# Category pages look like /cn/vegetables-fruits/fresh-vegetables/cid/1487/1489
+BLINKIT_CATEGORY_RE = re.compile(r"/cn/[^/\s]+/([^/\s]+)/cid/(\d+)/(\d+)")
+
+@instrument_extract("blinkit")
 def extract_products(response_data: Dict) -> List[Product]:
     products = []
     
@@ -83,9 +94,10 @@ def extract_products(response_data: Dict) -> List[Product]:
     return products
 
 cookie_temp = {}
-def fetch_blinkit_data(query: str = None, lat: str = "28.4511202", lon: str = "77.0965147", next_url: str = None) -> Dict[str, Any]:
+@instrument_fetch("blinkit", "listing")
+def fetch_blinkit_data(query: str = None, lat: str = "28.4511202", lon: str = "77.0965147", next_url: str = None, kind: str = "search") -> Dict[str, Any]:
     global cookie_temp
-    base_url = "https://blinkit.com"
+    base_url = BLINKIT_BASE_URL
     if next_url:
         url = base_url + next_url if next_url.startswith('/') else next_url
     else:
@@ -103,21 +115,22 @@ def fetch_blinkit_data(query: str = None, lat: str = "28.4511202", lon: str = "7
 
     
     try:
-        scraper = cloudscraper.create_scraper()  # returns a requests-like session
-        response = scraper.post(url, headers=headers)
-        print("Content-Type:", response.headers.get("Content-Type"))
+        response = get_transport(BLINKIT_TRANSPORT).request("POST", url, headers=headers)
+        record_response("blinkit", response.status_code, response.content)
         if response.status_code != 200:
-            print("error in response with code",response.status_code)
+            logger.warning("Blinkit returned %s (%s): %s", response.status_code, response.headers.get("content-type"), preview(response.content))
             raise HTTPException(
                 status_code=response.status_code,
                 detail=f"Failed to fetch data from Blinkit API: {response.text}"
             )
 
         
-        cookie_temp = response.cookies.get_dict()
+        cookie_temp = response.cookies
 
         response_text = response.text
         response_data = json.loads(response_text)
+        if query:
+            archive_response("blinkit", response.content, query, f"{lat},{lon}", kind, next_url or "")
         return response_data
         
     except json.JSONDecodeError:
@@ -132,8 +145,39 @@ def fetch_blinkit_data(query: str = None, lat: str = "28.4511202", lon: str = "7
         )
 
 
+def parse_blinkit_category(value: str) -> Optional[Dict[str, Any]]:
+    """Accepts a category URL or an "l0:l1" id pair"""
+    match = BLINKIT_CATEGORY_RE.search(value)
+    if match:
+        name, l0, l1 = match.groups()
+        return {"key": f"{l0}:{l1}", "name": name}
+    match = re.fullmatch(r"(\d+):(\d+)", value.strip())
+    if match:
+        return {"key": value.strip(), "name": value.strip()}
+    return None
+
+def list_blinkit_categories(coordinates: str) -> List[Dict[str, Any]]:
+    lat, lon = coordinates.split(',')
+    response_data = fetch_blinkit_data(None, lat, lon, BLINKIT_CATEGORIES_PATH)
+    categories = [parse_blinkit_category(text) for text in walk_strings(response_data) if "/cid/" in text]
+    return [category for category in categories if category]
+
+def fetch_blinkit_category_page(coordinates: str, category: Dict[str, Any], cursor: Optional[str] = None) -> Tuple[List[Product], Optional[str]]:
+    """One page of a category listing and the next_url to resume from, or None on the last page"""
+    lat, lon = coordinates.split(',')
+    l0, l1 = category["key"].split(":")
+    response_data = fetch_blinkit_data(
+        f"category:{category['name']}", lat, lon, cursor or f"/v1/layout/listing_widgets?l0_cat={l0}&l1_cat={l1}", kind="category"
+    )
+    products = extract_products(response_data)
+    for product in products:
+        product.search_query = f"category:{category['name']}"
+    time.sleep(1)
+    return products, response_data.get('response', {}).get('pagination', {}).get('next_url') or None
+
 def search_blinkit_generator(query: str = "chocolate", coordinates: str = "28.451,77.096"):
     lat, lon = coordinates.split(',')
+    export = ExportPipeline("blinkit", coordinates, query)
     page_count = 0
     has_next_url = True
     next_url = None
@@ -152,45 +196,21 @@ def search_blinkit_generator(query: str = "chocolate", coordinates: str = "28.45
                     next_url = response_data.get('response', {}).get('pagination', {}).get('next_url')
                     has_next_url = bool(next_url)
                     page_products = extract_products(response_data)
-                    for product in page_products:
-                        yield model_to_dict(product, exclude_fields=["id", "created_at", "updated_at"])
+                    yield from export.rows(page_products)
                     page_count += 1
                     time.sleep(1)
                     success = True
                 except Exception as page_err:
                     retries += 1
+                    UPSTREAM_RETRIES.inc(platform="blinkit")
                     if retries == max_retries:
-                        logging.error(f"Error processing page {page_count} after {max_retries} retries: {str(page_err)}")
+                        logger.error(f"Error processing page {page_count} after {max_retries} retries: {str(page_err)}")
                         has_next_url = False
                     else:
-                        logging.warning(f"Retry {retries} for page {page_count}: {str(page_err)}")
+                        logger.warning(f"Retry {retries} for page {page_count}: {str(page_err)}")
                         time.sleep(5)
     except Exception as e:
-        logging.error(f"Error in generator: {str(e)}")
-
-@router.get("/blinkit/download")
-def download_blinkit_csv(query: str, coordinates: str):
-    def generate():
-        header = [
-            'platform', 'search_query', 'store_id', 'product_id', 'variant_id',
-            'name', 'brand', 'mrp', 'price', 'quantity', 'in_stock', 'inventory',
-            'max_allowed_quantity', 'category', 'sub_category', 'images',
-            'organic_rank', 'rating'
-        ]
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(header)
-        yield output.getvalue()
-        output.seek(0)
-        output.truncate(0)
-        for product in search_blinkit_generator(query, coordinates):
-            row = [product.get(field, '') for field in header]
-            writer.writerow(row)
-            yield output.getvalue()
-            output.seek(0)
-            output.truncate(0)
-    return StreamingResponse(generate(), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=blinkit_products.csv"})
-
+        logger.error(f"Error in generator: {str(e)}")
 
 @router.get("/blinkit/search")
 def search_blinkit(query: str = "chocolate", coordinates: str = "28.451,77.096", save_to_db: bool = False) -> List[Dict[str, Any]]:
@@ -201,6 +221,7 @@ def search_blinkit(query: str = "chocolate", coordinates: str = "28.451,77.096",
     next_url = None
     max_pages = 10
     max_retries = 3
+    failed = False
 
     try:
         while has_next_url and page_count < max_pages:
@@ -223,18 +244,22 @@ def search_blinkit(query: str = "chocolate", coordinates: str = "28.451,77.096",
                     
                 except Exception as page_err:
                     retries += 1
+                    UPSTREAM_RETRIES.inc(platform="blinkit")
                     if retries == max_retries:
-                        logging.error(f"Error processing page {page_count} after {max_retries} retries: {str(page_err)}")
+                        logger.error(f"Error processing page {page_count} after {max_retries} retries: {str(page_err)}")
                         has_next_url = False
+                        failed = True
                     else:
-                        logging.warning(f"Retry {retries} for page {page_count}: {str(page_err)}")
+                        logger.warning(f"Retry {retries} for page {page_count}: {str(page_err)}")
                         time.sleep(5)
         
-        if save_to_db and all_products:
-            save_products_to_db(all_products, "products")
+        PAGES_PER_QUERY.observe(page_count, platform="blinkit")
+        # A failed page or the page cap leaves variants unseen; they must not be reported as delisted
+        handle_scraped_products("blinkit", coordinates, query, all_products, save_to_db, partial=failed or has_next_url)
         
         exclude_fields = ["id", "created_at", "updated_at"]
-        return [model_to_dict(product, exclude_fields=exclude_fields) for product in all_products]
+        with span("blinkit.serialize"):
+            return [model_to_dict(product, exclude_fields=exclude_fields) for product in all_products]
         
     except Exception as e:
         raise HTTPException(
@@ -1,21 +1,59 @@
 from re import search
 from fastapi import APIRouter, HTTPException
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 import json
-import subprocess
-from urllib.parse import urlencode
+import asyncio
+import logging
+from urllib.parse import urlencode, urlparse, parse_qs
 from ..utils.token_utils import (
     generate_uuid, 
     generate_matcher_id, 
     get_cookie_suffixes
 )
-from ..core.constants import INSTAMART_USER_AGENT, INSTAMART_VERSION_CODE, INSTAMART_BUILD_VERSION, INSTAMART_IMAGE_PREFIX
+from ..core.constants import (
+    INSTAMART_USER_AGENT, INSTAMART_VERSION_CODE, INSTAMART_BUILD_VERSION, INSTAMART_IMAGE_PREFIX,
+    INSTAMART_SEARCH_URL, INSTAMART_HOME_URL, INSTAMART_CATEGORY_LISTING_URL, INSTAMART_TAXONOMY_TYPE
+)
 from ..db.models import Product
-from ..db.utils import save_products_to_db
+from ..core.pipeline import handle_scraped_products_async, ExportPipeline
+from ..core.crawl import walk_strings
+from ..core.archive import archive_response
+from ..core.metrics import instrument_fetch, instrument_extract, record_response, PAGES_PER_QUERY
 from ..utils.format_utils import model_to_dict
+from ..core.tracing import TracedRoute, span
+from ..core.transport import get_transport, TransportError
+from ..core.config import INSTAMART_TRANSPORT
+
+router = APIRouter(route_class=TracedRoute)
+logger = logging.getLogger(__name__)
+
+def variation_to_product(item: Dict, variation: Dict, search_query: str, page: int = 0) -> Product:
+    return Product(
+        platform='instamart',
+        search_query=search_query,
+        store_id=variation.get('store_id', ''),
+        product_id=item.get('product_id', ''),
+        variant_id=variation.get('id', ''),
+        name=variation.get('display_name', ''),
+        brand=variation.get('brand', ''),
+        mrp=variation.get('price', {}).get('mrp', 0),
+        price=variation.get('price', {}).get('offer_price', 0),
+        quantity=variation.get('quantity', ''),
+        in_stock=variation.get('inventory', {}).get('in_stock', False),
+        inventory=variation.get('cart_allowed_quantity', {}).get('total', 0),
+        max_allowed_quantity=variation.get('max_allowed_quantity', 0),
+        category=variation.get('category', ''),
+        sub_category=variation.get('sub_category', ''),
+        images=[INSTAMART_IMAGE_PREFIX + image for image in variation.get('images', [])],
+        organic_rank=variation.get('sosAdsPositionData', {}).get('organic_rank', 0),
+        page=page,
 
-router = APIRouter()
+        platform_specific_details=json.dumps({
+            'ads_rank': variation.get('sosAdsPositionData', {}).get('ads_rank', 0),
+        }),
+    )
 
+@instrument_extract("instamart")
 def extract_products(response_data: Dict) -> List[Product]:
     products = []
     
@@ -32,38 +70,35 @@ def extract_products(response_data: Dict) -> List[Product]:
 
             # Process all variations
             for variation in variations:
-                product = Product(
-                    platform='instamart',
-                    search_query=response_data.get('data', {}).get('query', ""),                    
-                    store_id=variation.get('store_id', ''),
-                    product_id=item.get('product_id', ''),
-                    variant_id=variation.get('id', ''),
-                    name=variation.get('display_name', ''),
-                    brand=variation.get('brand', ''),
-                    mrp=variation.get('price', {}).get('mrp', 0),
-                    price=variation.get('price', {}).get('offer_price', 0),
-                    quantity=variation.get('quantity', ''),
-                    in_stock=variation.get('inventory', {}).get('in_stock', False),
-                    inventory=variation.get('cart_allowed_quantity', {}).get('total', 0),
-                    max_allowed_quantity=variation.get('max_allowed_quantity', 0),
-                    category=variation.get('category', ''),
-                    sub_category=variation.get('sub_category', ''),
-                    images=[INSTAMART_IMAGE_PREFIX + image for image in variation.get('images', [])],
-                    organic_rank=variation.get('sosAdsPositionData', {}).get('organic_rank', 0),
-                    page=response_data.get('data', {}).get('pageNumber', 0),
-
-                    platform_specific_details=json.dumps({
-                        'ads_rank': variation.get('sosAdsPositionData', {}).get('ads_rank', 0),
-                    }),
-                )
-                products.append(product)
+                products.append(variation_to_product(
+                    item,
+                    variation,
+                    response_data.get('data', {}).get('query', ""),
+                    response_data.get('data', {}).get('pageNumber', 0),
+                ))
                 
         return products
         
     except Exception as e:
         raise Exception(f"Error extracting product details: {str(e)}")
 
-async def fetch_instamart_data(query: str, store_id: str, page_num: int) -> Dict[str, Any]:
+@instrument_extract("instamart")
+def extract_listing_products(response_data: Dict, search_query: str, offset: int = 0) -> List[Product]:
+    """Products from every product widget of a category-listing response, ranked by position"""
+    products = []
+    for widget in response_data.get('data', {}).get('widgets', []) or []:
+        for item in widget.get('data', []) or []:
+            if not isinstance(item, dict):
+                continue
+            for variation in item.get('variations', []) or []:
+                product = variation_to_product(item, variation, search_query)
+                product.organic_rank = offset + len(products) + 1
+                products.append(product)
+    return products
+
+@instrument_fetch("instamart", "request")
+def run_instamart_request(url: str, referer: str, method: str = "POST", body: str = None, archive: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Run one Swiggy API call through the configured transport; `archive` holds archive_response arguments for the raw body"""
     device_id = generate_uuid()
     tid = generate_uuid()
     sid = generate_uuid()
@@ -71,29 +106,6 @@ async def fetch_instamart_data(query: str, store_id: str, page_num: int) -> Dict
     
     suffixes = get_cookie_suffixes()
     
-    if page_num == 0:
-        search_results_offset = 0
-    elif page_num == 1:
-        search_results_offset = 20
-    else:
-        search_results_offset = 20 + ((page_num - 1) * 42)
-
-    query_params = {
-        'pageNumber': page_num,
-        'searchResultsOffset': search_results_offset,
-        'limit': 40,
-        'query': query,
-        'ageConsent': 'false',
-        'pageType': 'INSTAMART_SEARCH_PAGE',
-        'isPreSearchTag': 'false',
-        'highConfidencePageNo': 0,
-        'lowConfidencePageNo': 0,
-        'voiceSearchTrackingId': '',
-        'storeId': store_id,
-        'primaryStoreId': store_id,
-        'secondaryStoreId': ''  # Empty since we're not using secondary store
-    }
-    
     cookies = [
         f'deviceId=s%3A{device_id}.{suffixes["device_id"]}',
         f'tid=s%3A{tid}.{suffixes["tid"]}',
@@ -110,58 +122,146 @@ async def fetch_instamart_data(query: str, store_id: str, page_num: int) -> Dict
         'openIMHP=false'
     ]
     
-    curl_command = [
-        'curl',
-        '--compressed',
-        '-X', 'POST',
-        f'https://www.swiggy.com/api/instamart/search?{urlencode(query_params)}',
-        '-H', 'authority: www.swiggy.com',
-        '-H', 'accept: */*',
-        '-H', 'accept-encoding: gzip, deflate, br, zstd',
-        '-H', 'accept-language: en-US,en;q=0.9',
-        '-H', 'content-type: application/json',
-        '-H', f'cookie: {"; ".join(cookies)}',
-        '-H', 'dnt: 1',
-        '-H', f'matcher: {matcher_id}',
-        '-H', 'origin: https://www.swiggy.com',
-        '-H', 'priority: u=1, i',
-        '-H', 'referer: https://www.swiggy.com/instamart/search',
-        '-H', 'sec-ch-ua: "Chromium";v="133", "Not(A:Brand";v="99"',
-        '-H', 'sec-ch-ua-mobile: ?0',
-        '-H', 'sec-ch-ua-platform: "macOS"',
-        '-H', 'sec-fetch-dest: empty',
-        '-H', 'sec-fetch-mode: cors',
-        '-H', 'sec-fetch-site: same-origin',
-        '-H', f'user-agent: {INSTAMART_USER_AGENT}',
-        '-H', f'x-build-version: {INSTAMART_BUILD_VERSION}',
-        '-d', '{"facets":{},"sortAttribute":""}'
-    ]
-    
-    process = subprocess.Popen(
-        curl_command,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
-    )
-    stdout, stderr = process.communicate()
+    headers = {
+        'authority': 'www.swiggy.com',
+        'accept': '*/*',
+        'accept-encoding': 'gzip, deflate, br, zstd',
+        'accept-language': 'en-US,en;q=0.9',
+        'content-type': 'application/json',
+        'cookie': "; ".join(cookies),
+        'dnt': '1',
+        'matcher': matcher_id,
+        'origin': 'https://www.swiggy.com',
+        'priority': 'u=1, i',
+        'referer': referer,
+        'sec-ch-ua': '"Chromium";v="133", "Not(A:Brand";v="99"',
+        'sec-ch-ua-mobile': '?0',
+        'sec-ch-ua-platform': '"macOS"',
+        'sec-fetch-dest': 'empty',
+        'sec-fetch-mode': 'cors',
+        'sec-fetch-site': 'same-origin',
+        'user-agent': INSTAMART_USER_AGENT,
+        'x-build-version': INSTAMART_BUILD_VERSION,
+    }
     
-    if process.returncode != 0:
-        error_message = stderr.decode('utf-8')
+    try:
+        response = get_transport(INSTAMART_TRANSPORT).request(method, url, headers=headers, data=body)
+    except TransportError as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Error from curl command: {error_message}"
+            detail=f"Error from {INSTAMART_TRANSPORT} transport: {str(e)}"
         )
     
-    response_text = stdout.decode('utf-8').strip()
+    record_response("instamart", response.status_code, response.content)
+    response_text = response.text.strip()
     
     try:
         # Parse the JSON response
-        return json.loads(response_text)
+        response_data = json.loads(response_text)
+        if archive:
+            archive_response("instamart", response.content, **archive)
+        return response_data
     except json.JSONDecodeError as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to parse JSON response: {str(e)}"
         )
 
+async def fetch_instamart_data(query: str, store_id: str, page_num: int) -> Dict[str, Any]:
+    if page_num == 0:
+        search_results_offset = 0
+    elif page_num == 1:
+        search_results_offset = 20
+    else:
+        search_results_offset = 20 + ((page_num - 1) * 42)
+
+    query_params = {
+        'pageNumber': page_num,
+        'searchResultsOffset': search_results_offset,
+        'limit': 40,
+        'query': query,
+        'ageConsent': 'false',
+        'pageType': 'INSTAMART_SEARCH_PAGE',
+        'isPreSearchTag': 'false',
+        'highConfidencePageNo': 0,
+        'lowConfidencePageNo': 0,
+        'voiceSearchTrackingId': '',
+        'storeId': store_id,
+        'primaryStoreId': store_id,
+        'secondaryStoreId': ''  # Empty since we're not using secondary store
+    }
+    
+    # The transport blocks (the default curl backend runs a subprocess), so it runs off the event loop
+    return await asyncio.to_thread(
+        run_instamart_request,
+        f'{INSTAMART_SEARCH_URL}?{urlencode(query_params)}',
+        'https://www.swiggy.com/instamart/search',
+        body='{"facets":{},"sortAttribute":""}',
+        archive={'query': query, 'location': store_id, 'page': page_num}
+    )
+
+def list_instamart_categories(store_id: str) -> List[Dict[str, Any]]:
+    """Categories linked from the store's Instamart home layout"""
+    query_params = {'clientId': 'INSTAMART-APP', 'storeId': store_id, 'primaryStoreId': store_id, 'secondaryStoreId': ''}
+    response_data = run_instamart_request(
+        f'{INSTAMART_HOME_URL}?{urlencode(query_params)}',
+        'https://www.swiggy.com/instamart',
+        method='GET'
+    )
+    categories = []
+    for text in walk_strings(response_data):
+        if 'categoryName=' not in text:
+            continue
+        params = parse_qs(urlparse(text).query or text.split('?', 1)[-1])
+        name = params.get('categoryName', [''])[0]
+        if name:
+            categories.append({
+                'key': name,
+                'name': name,
+                'taxonomy_type': params.get('taxonomyType', [INSTAMART_TAXONOMY_TYPE])[0],
+            })
+    return categories
+
+async def fetch_instamart_category_page(store_id: str, category: Dict[str, Any], cursor: Optional[int] = None) -> Tuple[List[Product], Optional[int]]:
+    """One page of a category listing and the offset to resume from, or None on the last page"""
+    offset = cursor or 0
+    query_params = {
+        'categoryName': category['key'],
+        'storeId': store_id,
+        'primaryStoreId': store_id,
+        'secondaryStoreId': '',
+        'offset': offset,
+        'filterName': '',
+        'taxonomyType': category.get('taxonomy_type') or INSTAMART_TAXONOMY_TYPE,
+    }
+    response_data = await asyncio.to_thread(
+        run_instamart_request,
+        f'{INSTAMART_CATEGORY_LISTING_URL}?{urlencode(query_params)}',
+        f'https://www.swiggy.com/instamart/category-listing?categoryName={category["key"]}',
+        method='GET',
+        archive={'query': f"category:{category['name']}", 'location': store_id, 'kind': 'category', 'page': offset}
+    )
+    products = extract_listing_products(response_data, f"category:{category['name']}", offset)
+    data = response_data.get('data', {}) or {}
+    has_more = data.get('hasMore', bool(products))
+    next_offset = data.get('offset') or offset + len(products)
+    return products, (next_offset if has_more and products and next_offset > offset else None)
+
+
+async def search_instamart_generator(query: str = "grapes", store_id: str = "1401254"):
+    page_num = 0
+    has_more_pages = True
+    export = ExportPipeline("instamart", store_id, query)
+    try:
+        while has_more_pages:
+            response_data = await fetch_instamart_data(query, store_id, page_num)
+            for row in export.rows(extract_products(response_data)):
+                yield row
+            has_more_pages = response_data.get('data', {}).get('hasMorePages', False)
+            page_num += 1
+    except Exception as e:
+        logger.error(f"Error in Instamart generator: {str(e)}")
+
 
 @router.get("/instamart/search")
 async def search_instamart(query: str = "grapes", store_id: str = "1401254", save_to_db: bool = False):
@@ -169,19 +269,27 @@ async def search_instamart(query: str = "grapes", store_id: str = "1401254", sav
         all_products = []
         page_num = 0
         has_more_pages = True
+        failed = False
         
         while has_more_pages:
             response_data = await fetch_instamart_data(query, store_id, page_num)
+            if not isinstance(response_data.get('data'), dict):
+                # An error body (rate limit, expired session) rather than a result page
+                logger.warning(f"Instamart page {page_num} for '{query}' returned no data, stopping")
+                failed = True
+                break
             page_products = extract_products(response_data)
             all_products.extend(page_products)
-            has_more_pages = response_data.get('data', {}).get('hasMorePages', False)
+            has_more_pages = response_data['data'].get('hasMorePages', False)
             page_num += 1
         
-        if save_to_db and all_products:
-            save_products_to_db(all_products, "products")
+        PAGES_PER_QUERY.observe(page_num, platform="instamart")
+        # Variants on the pages that were not fetched must not be reported as delisted
+        await handle_scraped_products_async("instamart", store_id, query, all_products, save_to_db, partial=failed)
             
         exclude_fields = ["id", "created_at", "updated_at"]
-        return [model_to_dict(product, exclude_fields=exclude_fields) for product in all_products]
+        with span("instamart.serialize"):
+            return [model_to_dict(product, exclude_fields=exclude_fields) for product in all_products]
     
     except Exception as e:
         raise HTTPException(
@@ -1,23 +1,29 @@
 import os
+import csv
 import json
 import logging
 import gzip
 import io
 import asyncio
-import pycurl
-import pandas as pd
 from datetime import datetime, timedelta
 from fastapi import APIRouter, HTTPException
-from playwright.async_api import async_playwright
 import subprocess
 from app.db.models import Product
-from app.db.utils import save_products_to_db
+from app.core.pipeline import handle_scraped_products_async, ExportPipeline
+from app.core.archive import archive_response
+from app.core.metrics import instrument_fetch, instrument_extract, record_response, CACHE_LOOKUPS, PAGES_PER_QUERY
 from app.utils.format_utils import model_to_dict
-import requests
+from app.core.tracing import TracedRoute, span
+from app.core.transport import get_transport, TransportRequest, TransportError
+from app.core.config import MOCK_UPSTREAM_URL, ZEPTO_TRANSPORT
+from app.core.constants import ZEPTO_API_BASE_URL
+from app.core.logs import preview
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
+logger = logging.getLogger(__name__)
 
-CURL_DIR = "curls/zepto"
+# Mock captures point at the mock server, so they are cached apart from real ones
+CURL_DIR = "curls/zepto-mock" if MOCK_UPSTREAM_URL else "curls/zepto"
 CSV_PATH = "stores_rows.csv"
 STORE_ID_PLACEHOLDER = "REPLACE_ME_STORE_ID"
 
@@ -54,8 +60,9 @@ def save_curl_config(query, requests):
 
 
 def get_zepto_store_ids(csv_path=CSV_PATH):
-    df = pd.read_csv(csv_path)
-    return df[df['platform'] == 'zepto']['id'].dropna().unique().tolist()
+    with open(csv_path, newline="") as f:
+        ids = [row["id"] for row in csv.DictReader(f) if row.get("platform") == "zepto" and row.get("id")]
+    return list(dict.fromkeys(ids))
 
 
 def extract_page_number(body: str):
@@ -84,7 +91,13 @@ async def auto_scroll(page, max_scrolls=20):
     """)
 
 
+@instrument_fetch("zepto", "capture")
 async def capture_curl_requests(query: str, max_pages: int = 20) -> list:
+    if MOCK_UPSTREAM_URL:
+        return await asyncio.to_thread(fetch_mock_capture, query, max_pages)
+
+    from playwright.async_api import async_playwright
+
     captured_requests = {}
 
     TOKEN = "SGcRKOOtIgojygd93388f5e2dd930945e1ed50d152"
@@ -149,11 +162,22 @@ async def capture_curl_requests(query: str, max_pages: int = 20) -> list:
     return [captured_requests[p] for p in sorted(captured_requests.keys())]
 
 
+def fetch_mock_capture(query: str, max_pages: int) -> list:
+    """Search request templates from the mock upstream, in the shape capture_curl_requests records"""
+    response = get_transport(ZEPTO_TRANSPORT).request("GET", f"{ZEPTO_API_BASE_URL}/__capture",
+                                                      params={"query": query, "max_pages": max_pages}, timeout=30)
+    if not response.ok:
+        raise RuntimeError(f"Mock capture failed: {response.status_code} for url: {response.url}")
+    return response.json()["requests"]
+
+
 async def ensure_fresh_curls(query: str) -> list:
     if is_curl_fresh(query):
+        CACHE_LOOKUPS.inc(platform="zepto", cache="curl_capture", result="hit")
         with open(get_curl_path(query)) as f:
             return json.load(f)["requests"]
 
+    CACHE_LOOKUPS.inc(platform="zepto", cache="curl_capture", result="miss")
     captured_requests = await capture_curl_requests(query)
     save_curl_config(query, captured_requests)
     return captured_requests
@@ -185,28 +209,46 @@ def replace_store_placeholders(req: dict, store_id: str) -> dict:
 
 
 
-def run_curl_request(req: dict) -> dict:
-    url = req["url"]
-    headers = req.get("headers", {})
-    body = req.get("body", "")
+def to_transport_request(req: dict) -> TransportRequest:
+    return TransportRequest(req.get("method") or "POST", req["url"], req.get("headers", {}), data=req.get("body", ""), timeout=30)
 
+
+def parse_zepto_response(response, query: str = None, store_id: str = None) -> dict:
+    if isinstance(response, TransportError):
+        raise RuntimeError(f"[HTTP ERROR] Request failed: {response}")
+    record_response("zepto", response.status_code, response.content)
+    if not response.ok:
+        raise RuntimeError(f"[HTTP ERROR] Request failed: {response.status_code} for url: {response.url}")
     try:
-        response = requests.post(
-            url,
-            headers=headers,
-            data=body,
-            timeout=30
-        )
-        response.raise_for_status()
-        return response.json()
-
-    except requests.exceptions.RequestException as e:
-        raise RuntimeError(f"[HTTP ERROR] Request failed: {e}")
+        response_data = response.json()
     except json.JSONDecodeError as e:
-        print("[DEBUG] Response was not valid JSON:")
+        logger.warning("Zepto response was not valid JSON (status %s): %s", response.status_code, preview(response.content))
         raise RuntimeError(f"Failed to parse JSON: {e}")
+    if query:
+        archive_response("zepto", response.content, query, store_id, "search", response_data.get("currentPage"))
+    return response_data
+
+
+@instrument_fetch("zepto", "listing")
+def run_curl_request(req: dict, query: str = None, store_id: str = None) -> dict:
+    response = get_transport(ZEPTO_TRANSPORT).request_many([to_transport_request(req)])[0]
+    return parse_zepto_response(response, query, store_id)
+
 
+@instrument_fetch("zepto", "listing_batch")
+def run_curl_requests(reqs: list, query: str = None, store_id: str = None) -> list:
+    """Send every page request as one transport batch; each result is the parsed page or the exception it raised"""
+    responses = get_transport(ZEPTO_TRANSPORT).request_many([to_transport_request(req) for req in reqs])
+    results = []
+    for response in responses:
+        try:
+            results.append(parse_zepto_response(response, query, store_id))
+        except Exception as e:
+            results.append(e)
+    return results
 
+
+@instrument_extract("zepto")
 def extract_products(response_data: dict, query: str):
     products = []
     layouts = response_data.get("layout", [])
@@ -252,11 +294,28 @@ def extract_products(response_data: dict, query: str):
                     products.append(product_model)
 
                 except Exception as e:
-                    print(f"[ERROR] Skipped product due to exception: {e}")
+                    logger.warning(f"Skipped Zepto product due to exception: {e}")
                     continue
 
     return products
 
+async def search_zepto_generator(query: str = "milk", store_id: str = None):
+    export = ExportPipeline("zepto", store_id, query)
+    try:
+        curls = await ensure_fresh_curls(query)
+        reqs = [replace_store_placeholders(base_req, store_id) for base_req in curls]
+        for response_data in await asyncio.to_thread(run_curl_requests, reqs, query, store_id):
+            try:
+                if isinstance(response_data, Exception):
+                    raise response_data
+                for row in export.rows(extract_products(response_data, query) or []):
+                    yield row
+            except Exception as e:
+                logger.error(f"Store {store_id} request failed: {e}")
+                continue
+    except Exception as e:
+        logger.error(f"Error in Zepto generator: {str(e)}")
+
 # ------------------ FASTAPI ROUTER -----------------
 
 @router.get("/zepto/search")
@@ -270,26 +329,31 @@ async def search_zepto(
 
     try:
         all_products = []
+        pages_fetched = 0
         curls = await ensure_fresh_curls(query)
+        reqs = [replace_store_placeholders(base_req, store_id) for base_req in curls]
+        # Pages go out as one batch, off the event loop
+        responses = await asyncio.to_thread(run_curl_requests, reqs, query, store_id)
 
-        for base_req in curls:
+        for req, response_data in zip(reqs, responses):
             try:
-                req = replace_store_placeholders(base_req, store_id)
-                print("printing request")
-                print(req)
-                response_data = run_curl_request(req)
-                print("printing response")
-                print(response_data)
+                if isinstance(response_data, Exception):
+                    raise response_data
+                logger.debug("Zepto request %s -> %s", preview(req), preview(response_data))
                 page_products = extract_products(response_data, query) or []
                 all_products.extend(page_products)
+                pages_fetched += 1
             except Exception as e:
-                logging.error(f"Store {store_id} request failed: {e}")
+                logger.error(f"Store {store_id} request failed: {e}")
                 continue
 
-        if save_to_db and all_products:
-            save_products_to_db(all_products, "products")
+        PAGES_PER_QUERY.observe(pages_fetched, platform="zepto")
+        # Variants on failed pages must not be reported as delisted
+        await handle_scraped_products_async("zepto", store_id, query, all_products, save_to_db,
+                                            partial=pages_fetched < len(reqs))
         exclude_fields = ["id", "created_at", "updated_at"]
-        return [model_to_dict(p, exclude_fields) for p in all_products]
+        with span("zepto.serialize"):
+            return [model_to_dict(p, exclude_fields) for p in all_products]
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
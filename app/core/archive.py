@@ -0,0 +1,167 @@
+"""
+Archive of raw upstream response bodies so history can be re-extracted after an extractor changes.
+
+Bodies are zstd-compressed and stored once per content digest under objects/; index.db records
+every fetch by (platform, kind, query, location, page, fetched_at) and points at its blob.
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from .config import RAW_ARCHIVE_ENABLED, RAW_ARCHIVE_DIR, RAW_ARCHIVE_LEVEL
+
+logger = logging.getLogger(__name__)
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    platform TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    query TEXT,
+    location TEXT,
+    page TEXT,
+    fetched_at REAL NOT NULL,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_scope ON responses (platform, query, location, fetched_at);
+CREATE INDEX IF NOT EXISTS idx_responses_fetched_at ON responses (fetched_at);
+"""
+
+
+class RawArchive:
+    def __init__(self, root: str = RAW_ARCHIVE_DIR, level: int = RAW_ARCHIVE_LEVEL):
+        self.root = root
+        self.level = level
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._compressor = None
+        self._decompressor = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            import zstandard
+
+            os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+            self._compressor = zstandard.ZstdCompressor(level=self.level)
+            self._decompressor = zstandard.ZstdDecompressor()
+            self._conn = sqlite3.connect(os.path.join(self.root, "index.db"), check_same_thread=False)
+            self._conn.executescript(INDEX_SCHEMA)
+        return self._conn
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest + ".zst")
+
+    def record(
+        self,
+        platform: str,
+        body: Union[bytes, str],
+        query: Optional[str],
+        location: Optional[str],
+        kind: str = "search",
+        page: Any = None,
+        fetched_at: float = None,
+    ) -> str:
+        """Store one response body (skipping the blob if identical content is already archived) and index it."""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        path = self.object_path(digest)
+        with self._lock:
+            conn = self._connection()
+            if os.path.exists(path):
+                stored_size = os.path.getsize(path)
+            else:
+                compressed = self._compressor.compress(body)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path + ".tmp", "wb") as f:
+                    f.write(compressed)
+                os.replace(path + ".tmp", path)
+                stored_size = len(compressed)
+            conn.execute(
+                "INSERT INTO responses (platform, kind, query, location, page, fetched_at, digest, size, stored_size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (platform, kind, query, location, None if page is None else str(page),
+                 fetched_at or time.time(), digest, len(body), stored_size),
+            )
+            conn.commit()
+        return digest
+
+    def read(self, digest: str) -> bytes:
+        with open(self.object_path(digest), "rb") as f:
+            compressed = f.read()
+        with self._lock:
+            self._connection()
+            return self._decompressor.decompress(compressed)
+
+    def entries(
+        self,
+        platform: str = None,
+        query: str = None,
+        location: str = None,
+        kind: str = None,
+        since: float = None,
+        until: float = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Index rows matching the filters in fetch order."""
+        clauses: List[str] = []
+        params: List[Any] = []
+        for column, value in (("platform", platform), ("query", query), ("location", location), ("kind", kind)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("fetched_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("fetched_at < ?")
+            params.append(until)
+        sql = "SELECT id, platform, kind, query, location, page, fetched_at, digest, size, stored_size FROM responses"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        with self._lock:
+            cursor = self._connection().execute(sql + " ORDER BY fetched_at, id", params)
+            columns = [c[0] for c in cursor.description]
+            rows = cursor.fetchall()
+        for row in rows:
+            yield dict(zip(columns, row))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT COUNT(*), COUNT(DISTINCT digest), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        stored = 0
+        for directory, _, files in os.walk(os.path.join(self.root, "objects")):
+            stored += sum(os.path.getsize(os.path.join(directory, name)) for name in files if name.endswith(".zst"))
+        return {"responses": row[0], "blobs": row[1], "raw_bytes": row[2], "stored_bytes": stored}
+
+
+raw_archive = RawArchive()
+_disabled_reason: Optional[str] = None
+
+
+def archive_response(
+    platform: str,
+    body: Union[bytes, str],
+    query: Optional[str],
+    location: Optional[str],
+    kind: str = "search",
+    page: Any = None,
+) -> None:
+    """Archive a raw response when RAW_ARCHIVE_ENABLED; never lets an archive failure break a scrape."""
+    global _disabled_reason
+    if not RAW_ARCHIVE_ENABLED or _disabled_reason or not body:
+        return
+    try:
+        raw_archive.record(platform, body, query, location, kind, page)
+    except ImportError:
+        _disabled_reason = "the raw archive requires the 'zstandard' package"
+        logger.error(f"Disabling raw archive: {_disabled_reason}")
+    except Exception as e:
+        logger.error(f"Could not archive {platform} response for '{query}' at {location}: {str(e)}")
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from .config import CHANGE_STREAM_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+FILTER_FIELDS = ("platform", "store_id", "brand", "category", "change_type")
+
+# Events of the same kind for the same variant collapse into one when a subscriber lags
+_COALESCE_KIND = {
+    "price_up": "price", "price_down": "price",
+    "stock_in": "stock", "stock_out": "stock",
+    "new_listing": "listing", "delisted": "listing",
+    "rank_move": "rank",
+}
+
+
+def _merge(older: Dict[str, Any], newer: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(newer)
+    for field in ("old_price", "old_in_stock", "old_rank"):
+        merged[field] = older.get(field)
+    kind = _COALESCE_KIND.get(newer["change_type"])
+    if kind == "price" and merged["old_price"] is not None and merged["new_price"] is not None:
+        merged["change_type"] = "price_up" if merged["new_price"] > merged["old_price"] else "price_down"
+    merged["coalesced"] = older.get("coalesced", 1) + 1
+    return merged
+
+
+class Subscription:
+    """Bounded, coalescing buffer for one stream consumer. Only touched from its event loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, filters: Dict[str, Set[str]], max_pending: int):
+        self.loop = loop
+        self.filters = filters
+        self.max_pending = max_pending
+        self.delivered = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self._pending: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        return all(str(event.get(field)) in values for field, values in self.filters.items())
+
+    def offer(self, events: List[Dict[str, Any]]) -> None:
+        for event in events:
+            key = (event["platform"], event["store_id"], event["variant_id"], _COALESCE_KIND.get(event["change_type"]))
+            older = self._pending.pop(key, None)
+            if older is not None:
+                event = _merge(older, event)
+                self.coalesced += 1
+            elif len(self._pending) >= self.max_pending:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            self._pending[key] = event
+        if self._pending:
+            self._ready.set()
+
+    async def get(self, timeout: float) -> List[Dict[str, Any]]:
+        """Wait up to `timeout` seconds and return everything pending, oldest first."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        events = list(self._pending.values())
+        self._pending.clear()
+        self.delivered += len(events)
+        return events
+
+
+class ChangeBroker:
+    """Fans change events out to stream subscribers; publish() is safe from any thread."""
+
+    def __init__(self, max_pending: int = CHANGE_STREAM_QUEUE_SIZE):
+        self.max_pending = max_pending
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, **filters: Optional[Iterable[str]]) -> Subscription:
+        active = {field: set(values) for field, values in filters.items() if field in FILTER_FIELDS and values}
+        subscription = Subscription(asyncio.get_running_loop(), active, self.max_pending)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+        if subscription.dropped:
+            logger.info(f"Change stream subscriber dropped {subscription.dropped} events while lagging")
+
+    def publish(self, events: List[Dict[str, Any]]) -> None:
+        if not events:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+        for subscription in subscribers:
+            matched = [event for event in events if subscription.matches(event)]
+            if not matched:
+                continue
+            if subscription.loop is current_loop:
+                subscription.offer(matched)
+            elif not subscription.loop.is_closed():
+                subscription.loop.call_soon_threadsafe(subscription.offer, matched)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            "subscribers": len(subscribers),
+            "pending": sum(len(s._pending) for s in subscribers),
+            "coalesced": sum(s.coalesced for s in subscribers),
+            "dropped": sum(s.dropped for s in subscribers),
+        }
+
+
+change_broker = ChangeBroker()
@@ -0,0 +1,195 @@
+import os
+import gzip
+import json
+import uuid
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import CHANGE_STATE_PATH, CHANGE_LOG_SIZE, CHANGE_RANK_THRESHOLD, CHANGE_STATE_MAX_VARIANTS, CHANGE_STATE_MAX_SCOPES
+
+logger = logging.getLogger(__name__)
+
+CHANGE_TYPES = ("new_listing", "delisted", "price_up", "price_down", "stock_in", "stock_out", "rank_move")
+
+VariantKey = Tuple[str, str, str]
+ScopeKey = Tuple[str, str, str]
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None and value != '' else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _rank(value: Any) -> Optional[int]:
+    try:
+        return int(value) if value is not None and value != '' else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _state_of(product: Any) -> list:
+    """Compact last-seen state: [hash of all volatile fields, price, in_stock, rank]."""
+    price = _number(getattr(product, 'price', None))
+    in_stock = bool(getattr(product, 'in_stock', False))
+    rank = _rank(getattr(product, 'organic_rank', None))
+    volatile = (price, _number(getattr(product, 'mrp', None)), in_stock, _rank(getattr(product, 'inventory', None)), rank)
+    fingerprint = int.from_bytes(hashlib.blake2b(repr(volatile).encode(), digest_size=8).digest(), "little")
+    return [fingerprint, price, in_stock, rank]
+
+
+class ChangeDetector:
+    """
+    Diffs each scrape against the last-seen state per (platform, store, variant).
+
+    The membership of every (platform, location, query) scope is kept as well so variants
+    that disappear from a scope can be reported as delisted. The first scrape of a scope
+    only records a baseline. Both are bounded: the least recently seen variants and scopes are
+    dropped first, and a dropped scope simply gets a new baseline.
+    """
+
+    def __init__(self, log_size: int = CHANGE_LOG_SIZE, rank_threshold: int = CHANGE_RANK_THRESHOLD,
+                 max_variants: int = CHANGE_STATE_MAX_VARIANTS, max_scopes: int = CHANGE_STATE_MAX_SCOPES):
+        self.rank_threshold = rank_threshold
+        self.max_variants = max(1, max_variants)
+        self.max_scopes = max(1, max_scopes)
+        self._state: "OrderedDict[VariantKey, list]" = OrderedDict()
+        self._scopes: "OrderedDict[ScopeKey, set]" = OrderedDict()
+        self._log: deque = deque(maxlen=log_size)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def _event(self, change_type: str, platform: str, location: str, query: str, variant: VariantKey,
+               product: Any = None, old: list = None, new: list = None) -> Dict[str, Any]:
+        self._seq += 1
+        return {
+            "seq": self._seq,
+            "id": str(uuid.uuid4()),
+            "detected_at": datetime.now(timezone.utc).isoformat(),
+            "change_type": change_type,
+            "platform": platform,
+            "store_id": variant[1],
+            "variant_id": variant[2],
+            "product_id": getattr(product, 'product_id', None),
+            "search_query": query,
+            "location": location,
+            "name": getattr(product, 'name', None),
+            "brand": getattr(product, 'brand', None),
+            "category": getattr(product, 'category', None),
+            "old_price": old[1] if old else None,
+            "new_price": new[1] if new else None,
+            "old_in_stock": old[2] if old else None,
+            "new_in_stock": new[2] if new else None,
+            "old_rank": old[3] if old else None,
+            "new_rank": new[3] if new else None,
+        }
+
+    def diff(self, platform: str, location: str, query: str, products: List[Any],
+             partial: bool = False, baseline: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """
+        `partial` marks an incomplete scrape of the scope (one page of a catalog crawl, or a search
+        that missed pages): membership is merged and delistings are not inferred. `baseline` overrides the first-scrape-of-scope check.
+        """
+        scope = (platform, str(location or ''), (query or '').strip().lower())
+        events = []
+        with self._lock:
+            if baseline is None:
+                baseline = scope not in self._scopes
+            seen = set()
+            for product in products:
+                variant = (platform, str(getattr(product, 'store_id', '') or ''), str(getattr(product, 'variant_id', '') or ''))
+                if variant in seen:
+                    continue
+                seen.add(variant)
+                new = _state_of(product)
+                old = self._state.get(variant)
+                self._state[variant] = new
+                self._state.move_to_end(variant)
+                # Set by the store membership stage, which owns new-listing detection when enabled
+                flagged = getattr(product, 'new_listing', None)
+                if flagged:
+                    events.append(self._event("new_listing", platform, location, query, variant, product, None, new))
+                    continue
+                if baseline:
+                    continue
+                if old is None:
+                    if flagged is None:
+                        events.append(self._event("new_listing", platform, location, query, variant, product, None, new))
+                    continue
+                if old[0] == new[0]:
+                    continue
+                if old[1] is not None and new[1] is not None and old[1] != new[1]:
+                    events.append(self._event("price_up" if new[1] > old[1] else "price_down",
+                                              platform, location, query, variant, product, old, new))
+                if old[2] != new[2]:
+                    events.append(self._event("stock_in" if new[2] else "stock_out",
+                                              platform, location, query, variant, product, old, new))
+                if old[3] is not None and new[3] is not None and abs(new[3] - old[3]) >= self.rank_threshold:
+                    events.append(self._event("rank_move", platform, location, query, variant, product, old, new))
+
+            if partial:
+                self._scopes.setdefault(scope, set()).update(seen)
+            else:
+                if not baseline and scope in self._scopes:
+                    for variant in self._scopes[scope] - seen:
+                        events.append(self._event("delisted", platform, location, query, variant, None,
+                                                  self._state.get(variant), None))
+                self._scopes[scope] = seen
+            self._scopes.move_to_end(scope)
+            while len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
+            while len(self._state) > self.max_variants:
+                self._state.popitem(last=False)
+            self._log.extend(events)
+        return events
+
+    def recent(self, after_seq: int = 0, platform: str = None, store_id: str = None,
+               change_type: str = None, limit: int = 500) -> List[Dict[str, Any]]:
+        with self._lock:
+            events = [e for e in self._log if e["seq"] > after_seq]
+        events = [
+            e for e in events
+            if (not platform or e["platform"] == platform)
+            and (not store_id or e["store_id"] == store_id)
+            and (not change_type or e["change_type"] == change_type)
+        ]
+        return events[:limit]
+
+    def save_state(self, path: str = CHANGE_STATE_PATH) -> None:
+        with self._lock:
+            payload = {
+                # /changes cursors are seq numbers, so numbering carries on after a restart
+                "seq": self._seq,
+                "state": [[*key, *value] for key, value in self._state.items()],
+                "scopes": [[*scope, [list(v) for v in variants]] for scope, variants in self._scopes.items()],
+            }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+        logger.info(f"Saved change-detection state for {len(payload['state'])} variants to {path}")
+
+    def load_state(self, path: str = CHANGE_STATE_PATH) -> None:
+        if not os.path.exists(path):
+            return
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                payload = json.load(f)
+        except Exception as e:
+            logger.error(f"Could not load change-detection state from {path}: {str(e)}")
+            return
+        with self._lock:
+            self._seq = max(self._seq, int(payload.get("seq", 0)))
+            # Saved in least-recently-seen order, so the LRU order survives a restart
+            self._state = OrderedDict((tuple(entry[:3]), entry[3:]) for entry in payload.get("state", [])[-self.max_variants:])
+            self._scopes = OrderedDict((tuple(entry[:3]), {tuple(v) for v in entry[3]})
+                                       for entry in payload.get("scopes", [])[-self.max_scopes:])
+        logger.info(f"Loaded change-detection state for {len(self._state)} variants from {path}")
+
+
+change_detector = ChangeDetector()
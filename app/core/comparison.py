@@ -0,0 +1,126 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .config import COMPARE_CACHE_TTL, COMPARE_CACHE_MAX_SCOPES
+from .matching import product_matcher
+from ..utils.quantity_utils import quantity_fields
+
+ScopeKey = Tuple[str, str, str]
+
+
+def _offer(product: Any) -> Dict[str, Any]:
+    price = getattr(product, "price", None)
+    per_unit, unit = getattr(product, "unit_price", None), getattr(product, "quantity_unit", None)
+    if per_unit is None:
+        fields = quantity_fields(getattr(product, "quantity", None), price)
+        per_unit, unit = fields["unit_price"], fields["quantity_unit"]
+    return {
+        "platform": getattr(product, "platform", None),
+        "store_id": getattr(product, "store_id", None),
+        "variant_id": getattr(product, "variant_id", None),
+        "name": getattr(product, "name", None),
+        "quantity": getattr(product, "quantity", None),
+        "price": price,
+        "mrp": getattr(product, "mrp", None),
+        "in_stock": bool(getattr(product, "in_stock", False)),
+        "unit_price": per_unit,
+        "unit": unit,
+    }
+
+
+def _better(a: Dict[str, Any], b: Optional[Dict[str, Any]]) -> bool:
+    """In-stock offers beat out-of-stock ones, then the lower price wins."""
+    if b is None:
+        return True
+    if a["in_stock"] != b["in_stock"]:
+        return a["in_stock"]
+    return (a["price"] if a["price"] is not None else float("inf")) < (b["price"] if b["price"] is not None else float("inf"))
+
+
+class ComparisonIndex:
+    """
+    Latest scrape per (platform, location, query), pre-aggregated to the best offer per
+    canonical product. A new scrape of a scope only rebuilds that scope's aggregates.
+    """
+
+    def __init__(self, ttl: float = COMPARE_CACHE_TTL, max_scopes: int = COMPARE_CACHE_MAX_SCOPES):
+        self.ttl = ttl
+        self.max_scopes = max_scopes
+        # scope -> (updated_at, {canonical_id: best offer})
+        self._scopes: "OrderedDict[ScopeKey, Tuple[float, Dict[str, Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._scopes)
+
+    @staticmethod
+    def scope(platform: str, location: str, query: str) -> ScopeKey:
+        return (platform, str(location or ""), (query or "").strip().lower())
+
+    def update(self, platform: str, location: str, query: str, products: List[Any]) -> None:
+        best: Dict[str, Dict[str, Any]] = {}
+        for product in products:
+            canonical_id = getattr(product, "canonical_id", None)
+            if not canonical_id:
+                continue
+            offer = _offer(product)
+            if _better(offer, best.get(canonical_id)):
+                best[canonical_id] = offer
+        key = self.scope(platform, location, query)
+        with self._lock:
+            self._scopes[key] = (time.time(), best)
+            self._scopes.move_to_end(key)
+            while len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
+
+    def is_fresh(self, platform: str, location: str, query: str, max_age: float = None) -> bool:
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            entry = self._scopes.get(self.scope(platform, location, query))
+        return entry is not None and time.time() - entry[0] <= max_age
+
+    def compare(self, scopes: Iterable[ScopeKey], min_platforms: int = 1, limit: int = None) -> List[Dict[str, Any]]:
+        """Merge per-scope aggregates into one row per canonical product with the best offer per platform."""
+        groups: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        with self._lock:
+            entries = [self._scopes.get(self.scope(*scope)) for scope in scopes]
+        for entry in entries:
+            if entry is None:
+                continue
+            for canonical_id, offer in entry[1].items():
+                platforms = groups.setdefault(canonical_id, {})
+                if _better(offer, platforms.get(offer["platform"])):
+                    platforms[offer["platform"]] = offer
+
+        results = []
+        for canonical_id, platforms in groups.items():
+            if len(platforms) < min_platforms:
+                continue
+            available = [o for o in platforms.values() if o["in_stock"] and o["price"] is not None]
+            cheapest = min(available, key=lambda o: o["price"], default=None)
+            priced = [o for o in available if o["unit_price"] is not None]
+            cheapest_unit = min(priced, key=lambda o: o["unit_price"], default=None)
+            info = product_matcher.describe(canonical_id) or {}
+            results.append({
+                "canonical_id": canonical_id,
+                "name": info.get("name") or next(iter(platforms.values()))["name"],
+                "brand": info.get("brand"),
+                "pack": info.get("pack"),
+                "platforms": platforms,
+                "available_on": sorted(o["platform"] for o in available),
+                "best_platform": cheapest["platform"] if cheapest else None,
+                "best_price": cheapest["price"] if cheapest else None,
+                "best_unit_price": cheapest_unit["unit_price"] if cheapest_unit else None,
+                "best_unit_price_platform": cheapest_unit["platform"] if cheapest_unit else None,
+                "unit": cheapest_unit["unit"] if cheapest_unit else None,
+            })
+
+        # Products sold on the most platforms first; that is where comparison matters
+        results.sort(key=lambda g: (-len(g["platforms"]), g["best_price"] is None, g["best_price"] or 0))
+        return results[:limit] if limit else results
+
+
+comparison_index = ComparisonIndex()
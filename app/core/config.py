@@ -0,0 +1,147 @@
+"""
+Runtime settings read from the environment (and the project .env file).
+"""
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+
+PROJECT_ROOT = Path(__file__).parents[2]
+load_dotenv(dotenv_path=PROJECT_ROOT / '.env')
+
+
+def env_str(name: str, default: str = None) -> str:
+    return os.environ.get(name, default)
+
+
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Background DB writer
+DB_WRITER_ENABLED = env_bool("DB_WRITER_ENABLED", True)
+DB_WRITER_QUEUE_SIZE = env_int("DB_WRITER_QUEUE_SIZE", 200)
+DB_WRITER_BATCH_SIZE = env_int("DB_WRITER_BATCH_SIZE", 500)
+DB_WRITER_CONCURRENCY = env_int("DB_WRITER_CONCURRENCY", 4)
+DB_WRITER_MAX_RETRIES = env_int("DB_WRITER_MAX_RETRIES", 4)
+DB_WRITER_RETRY_BACKOFF = env_float("DB_WRITER_RETRY_BACKOFF", 0.5)
+DB_WRITER_SPILL_PATH = env_str("DB_WRITER_SPILL_PATH", str(PROJECT_ROOT / "outputs" / "db_spill.ndjson"))
+
+# Snapshot keys and write-only-on-change
+SNAPSHOT_BUCKET_MINUTES = env_int("SNAPSHOT_BUCKET_MINUTES", 60)
+DB_SKIP_UNCHANGED = env_bool("DB_SKIP_UNCHANGED", False)
+DB_HASH_CACHE_SIZE = env_int("DB_HASH_CACHE_SIZE", 500000)
+SNAPSHOT_HISTORY_ENABLED = env_bool("SNAPSHOT_HISTORY_ENABLED", True)
+
+# Storage backend: supabase (REST), postgres (direct pool + COPY), sqlite or duckdb (local file)
+STORAGE_BACKEND = env_str("STORAGE_BACKEND", "supabase").lower()
+DATABASE_URL = env_str("DATABASE_URL")
+DATABASE_POOL_MIN = env_int("DATABASE_POOL_MIN", 1)
+DATABASE_POOL_MAX = env_int("DATABASE_POOL_MAX", 8)
+STORAGE_PATH = env_str("STORAGE_PATH", str(PROJECT_ROOT / "outputs" / "products.db"))
+# wide: full rows in products; normalized: product_dim + product_snapshots; both: write both
+STORAGE_LAYOUT = env_str("STORAGE_LAYOUT", "wide").lower()
+# Layout of Parquet datasets written by the batch scripts: wide or normalized
+DATASET_LAYOUT = env_str("DATASET_LAYOUT", "wide").lower()
+
+# Change detection between consecutive scrapes
+CHANGE_DETECTION_ENABLED = env_bool("CHANGE_DETECTION_ENABLED", True)
+CHANGE_STATE_PATH = env_str("CHANGE_STATE_PATH", str(PROJECT_ROOT / "outputs" / "change_state.json.gz"))
+CHANGE_LOG_SIZE = env_int("CHANGE_LOG_SIZE", 20000)
+CHANGE_RANK_THRESHOLD = env_int("CHANGE_RANK_THRESHOLD", 3)
+# Last-seen state kept for at most this many variants and scopes (least recently seen dropped first)
+CHANGE_STATE_MAX_VARIANTS = env_int("CHANGE_STATE_MAX_VARIANTS", 500000)
+CHANGE_STATE_MAX_SCOPES = env_int("CHANGE_STATE_MAX_SCOPES", 50000)
+# Also write change events to product_changes on save_to_db scrapes
+CHANGE_PERSIST = env_bool("CHANGE_PERSIST", True)
+
+# Server-sent change feed
+CHANGE_STREAM_QUEUE_SIZE = env_int("CHANGE_STREAM_QUEUE_SIZE", 1000)
+CHANGE_STREAM_HEARTBEAT = env_float("CHANGE_STREAM_HEARTBEAT", 15.0)
+
+# Cross-platform product matching
+MATCHING_ENABLED = env_bool("MATCHING_ENABLED", True)
+MATCH_INDEX_PATH = env_str("MATCH_INDEX_PATH", str(PROJECT_ROOT / "outputs" / "match_index.json.gz"))
+MATCH_THRESHOLD = env_float("MATCH_THRESHOLD", 0.6)
+MATCH_NUM_PERM = env_int("MATCH_NUM_PERM", 64)
+MATCH_BANDS = env_int("MATCH_BANDS", 16)
+
+# Cross-platform comparison cache
+COMPARE_CACHE_TTL = env_int("COMPARE_CACHE_TTL", 900)
+COMPARE_CACHE_MAX_SCOPES = env_int("COMPARE_CACHE_MAX_SCOPES", 5000)
+
+# Catalog crawl
+CRAWL_STATE_DIR = env_str("CRAWL_STATE_DIR", str(PROJECT_ROOT / "outputs" / "crawl"))
+CRAWL_PAGE_BUDGET = env_int("CRAWL_PAGE_BUDGET", 200)
+CRAWL_MAX_PAGES_PER_CATEGORY = env_int("CRAWL_MAX_PAGES_PER_CATEGORY", 50)
+
+# Raw upstream response archive (content-addressed zstd blobs + sqlite index)
+RAW_ARCHIVE_ENABLED = env_bool("RAW_ARCHIVE_ENABLED", False)
+RAW_ARCHIVE_DIR = env_str("RAW_ARCHIVE_DIR", str(PROJECT_ROOT / "outputs" / "raw_archive"))
+RAW_ARCHIVE_LEVEL = env_int("RAW_ARCHIVE_LEVEL", 10)
+
+# Per-store variant membership filters for new-listing detection
+MEMBERSHIP_ENABLED = env_bool("MEMBERSHIP_ENABLED", True)
+MEMBERSHIP_DIR = env_str("MEMBERSHIP_DIR", str(PROJECT_ROOT / "outputs" / "membership"))
+MEMBERSHIP_CAPACITY = env_int("MEMBERSHIP_CAPACITY", 20000)
+MEMBERSHIP_ERROR_RATE = env_float("MEMBERSHIP_ERROR_RATE", 0.001)
+# Filters kept in memory (least recently used are saved and dropped) and seconds between saves (0 = shutdown only)
+MEMBERSHIP_MAX_STORES = env_int("MEMBERSHIP_MAX_STORES", 2000)
+MEMBERSHIP_SAVE_INTERVAL = env_float("MEMBERSHIP_SAVE_INTERVAL", 60)
+
+# Request tracing: spans exported as JSON lines to a file and/or POSTed to a collector
+TRACING_ENABLED = env_bool("TRACING_ENABLED", True)
+TRACE_EXPORT_PATH = env_str("TRACE_EXPORT_PATH", "")
+TRACE_COLLECTOR_URL = env_str("TRACE_COLLECTOR_URL", "")
+TRACE_SAMPLE_RATE = env_float("TRACE_SAMPLE_RATE", 1.0)
+TRACE_EXPORT_QUEUE_SIZE = env_int("TRACE_EXPORT_QUEUE_SIZE", 10000)
+
+# Send all upstream platform traffic to a local mock_upstream.py server (e.g. http://127.0.0.1:9000)
+MOCK_UPSTREAM_URL = env_str("MOCK_UPSTREAM_URL", "").rstrip("/")
+
+# HTTP stack per adapter: requests, cloudscraper, curl (CLI) or curl_multi (pycurl), see app/core/transport.py
+BLINKIT_TRANSPORT = env_str("BLINKIT_TRANSPORT", "cloudscraper")
+INSTAMART_TRANSPORT = env_str("INSTAMART_TRANSPORT", "curl")
+ZEPTO_TRANSPORT = env_str("ZEPTO_TRANSPORT", "requests")
+
+# Event-loop lag monitor: heartbeat lag metrics plus stack samples of the loop thread while it is blocked
+LOOP_MONITOR_ENABLED = env_bool("LOOP_MONITOR_ENABLED", True)
+LOOP_MONITOR_INTERVAL_MS = env_float("LOOP_MONITOR_INTERVAL_MS", 100)
+LOOP_BLOCK_THRESHOLD_MS = env_float("LOOP_BLOCK_THRESHOLD_MS", 100)
+LOOP_STACK_SAMPLE_MS = env_float("LOOP_STACK_SAMPLE_MS", 10)
+LOOP_BLOCK_HISTORY = env_int("LOOP_BLOCK_HISTORY", 100)
+# Also turn on asyncio debug mode, which logs every callback slower than the threshold (costly)
+LOOP_ASYNCIO_DEBUG = env_bool("LOOP_ASYNCIO_DEBUG", False)
+
+# Admin diagnostics (CPU profiles, tracemalloc snapshots, /debug/loop); off unless enabled, token sent as X-Admin-Token
+ADMIN_ENDPOINTS_ENABLED = env_bool("ADMIN_ENDPOINTS_ENABLED", False)
+ADMIN_TOKEN = env_str("ADMIN_TOKEN", "")
+PROFILE_MAX_SECONDS = env_float("PROFILE_MAX_SECONDS", 120)
+MEMORY_SNAPSHOT_HISTORY = env_int("MEMORY_SNAPSHOT_HISTORY", 5)
+
+# Logging: records are queued and written by a background thread (see app/core/logs.py)
+LOG_LEVEL = env_str("LOG_LEVEL", "INFO")
+LOG_FORMAT = env_str("LOG_FORMAT", "text")  # text or json
+LOG_QUEUE_SIZE = env_int("LOG_QUEUE_SIZE", 10000)
+# Default keep rates for DEBUG/INFO records per logger, e.g. "app.api.search_zepto=0.1,app.db=0.5"
+LOG_SAMPLE_RATES = env_str("LOG_SAMPLE_RATES", "")
+LOG_PREVIEW_CHARS = env_int("LOG_PREVIEW_CHARS", 512)
+
+# Warm what is otherwise loaded on first use (see app/core/prewarm.py): "" (off), "background" or "blocking"
+PREWARM = env_str("PREWARM", "").lower()
@@ -1,6 +1,18 @@
 """
 Constants used across the application.
 """
+from .config import MOCK_UPSTREAM_URL
+
+
+def upstream_base_url(platform: str, url: str) -> str:
+    """The platform's real host, or its prefix on the mock upstream when MOCK_UPSTREAM_URL is set"""
+    return f"{MOCK_UPSTREAM_URL}/{platform}" if MOCK_UPSTREAM_URL else url
+
+
+BLINKIT_BASE_URL = upstream_base_url("blinkit", "https://blinkit.com")
+BIGBASKET_BASE_URL = upstream_base_url("bigbasket", "https://www.bigbasket.com")
+SWIGGY_BASE_URL = upstream_base_url("instamart", "https://www.swiggy.com")
+ZEPTO_API_BASE_URL = upstream_base_url("zepto", "https://api.zeptonow.com")
 
 # Instamart API Constants
 INSTAMART_USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36"
@@ -8,6 +20,10 @@ INSTAMART_VERSION_CODE = "1200"
 INSTAMART_BUILD_VERSION = "2.257.0"
 
 INSTAMART_IMAGE_PREFIX = "https://instamart-media-assets.swiggy.com/swiggy/image/upload/fl_lossy,f_auto,q_auto,h_600/"
+INSTAMART_SEARCH_URL = f"{SWIGGY_BASE_URL}/api/instamart/search"
+INSTAMART_HOME_URL = f"{SWIGGY_BASE_URL}/api/instamart/home"
+INSTAMART_CATEGORY_LISTING_URL = f"{SWIGGY_BASE_URL}/api/instamart/category-listing"
+INSTAMART_TAXONOMY_TYPE = "Speciality taxonomy 1"
 
 # Blinkit API Constants
 BLINKIT_USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36"
@@ -0,0 +1,151 @@
+"""
+Resumable per-store catalog crawl state.
+
+A crawl walks a store's categories once: a frontier of pending categories, the category
+in progress with its page cursor, and the variant ids already emitted so products listed
+under several categories are only processed the first time.
+"""
+import os
+import re
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from .config import CRAWL_STATE_DIR
+
+logger = logging.getLogger(__name__)
+
+
+def walk_strings(node: Any) -> Iterator[str]:
+    """Yield every string value in a decoded JSON document (used to find category links)."""
+    if isinstance(node, str):
+        yield node
+    elif isinstance(node, dict):
+        for value in node.values():
+            yield from walk_strings(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from walk_strings(value)
+
+
+class CrawlState:
+    def __init__(self, platform: str, store: str, state_dir: str = CRAWL_STATE_DIR):
+        self.platform = platform
+        self.store = store
+        self.path = os.path.join(state_dir, platform, re.sub(r"[^A-Za-z0-9._-]+", "_", store) + ".json")
+        self.pending: List[Dict[str, Any]] = []
+        self.current: Optional[Dict[str, Any]] = None
+        self.done: List[str] = []
+        self.seen: set = set()
+        self.pages_fetched = 0
+        self.products_total = 0
+        self.crawls_completed = 0
+        self.started_at: Optional[str] = None
+        self.updated_at: Optional[str] = None
+        self.last_error: Optional[str] = None
+
+    @classmethod
+    def load(cls, platform: str, store: str) -> "CrawlState":
+        state = cls(platform, store)
+        if not os.path.exists(state.path):
+            return state
+        try:
+            with open(state.path, encoding="utf-8") as f:
+                payload = json.load(f)
+        except Exception as e:
+            logger.error(f"Could not read crawl state {state.path}, starting over: {str(e)}")
+            return state
+        state.pending = payload.get("pending", [])
+        state.current = payload.get("current")
+        state.done = payload.get("done", [])
+        state.seen = set(payload.get("seen", []))
+        state.pages_fetched = payload.get("pages_fetched", 0)
+        state.products_total = payload.get("products_total", 0)
+        state.crawls_completed = payload.get("crawls_completed", 0)
+        state.started_at = payload.get("started_at")
+        state.updated_at = payload.get("updated_at")
+        state.last_error = payload.get("last_error")
+        return state
+
+    def save(self) -> None:
+        self.updated_at = datetime.now(timezone.utc).isoformat()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        payload = {
+            "platform": self.platform,
+            "store": self.store,
+            "pending": self.pending,
+            "current": self.current,
+            "done": self.done,
+            "seen": sorted(self.seen),
+            "pages_fetched": self.pages_fetched,
+            "products_total": self.products_total,
+            "crawls_completed": self.crawls_completed,
+            "started_at": self.started_at,
+            "updated_at": self.updated_at,
+            "last_error": self.last_error,
+        }
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        os.replace(self.path + ".tmp", self.path)
+
+    @property
+    def started(self) -> bool:
+        return self.started_at is not None
+
+    @property
+    def complete(self) -> bool:
+        return self.started and self.current is None and not self.pending
+
+    def start(self, categories: List[Dict[str, Any]]) -> None:
+        # Keep order but drop categories discovered twice in the tree
+        unique = {category["key"]: category for category in categories}
+        self.pending = list(unique.values())
+        self.current = None
+        self.done = []
+        self.seen = set()
+        self.pages_fetched = 0
+        self.products_total = 0
+        self.last_error = None
+        self.started_at = datetime.now(timezone.utc).isoformat()
+
+    def next_category(self) -> Optional[Dict[str, Any]]:
+        if self.current is None and self.pending:
+            self.current = {"category": self.pending.pop(0), "cursor": None, "pages": 0}
+        return self.current
+
+    def advance(self, next_cursor: Any, max_pages: int) -> None:
+        self.pages_fetched += 1
+        self.current["pages"] += 1
+        self.current["cursor"] = next_cursor
+        if next_cursor is None or self.current["pages"] >= max_pages:
+            self.done.append(self.current["category"]["key"])
+            self.current = None
+            if not self.pending:
+                self.crawls_completed += 1
+
+    def dedupe(self, products: List[Any]) -> List[Any]:
+        fresh = []
+        for product in products:
+            variant_id = str(getattr(product, "variant_id", "") or "")
+            if variant_id and variant_id not in self.seen:
+                self.seen.add(variant_id)
+                fresh.append(product)
+        self.products_total += len(fresh)
+        return fresh
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "platform": self.platform,
+            "store": self.store,
+            "status": "complete" if self.complete else ("in_progress" if self.started else "not_started"),
+            "categories_done": len(self.done),
+            "categories_pending": len(self.pending) + (1 if self.current else 0),
+            "current": self.current,
+            "pages_fetched": self.pages_fetched,
+            "products_total": self.products_total,
+            "crawls_completed": self.crawls_completed,
+            "started_at": self.started_at,
+            "updated_at": self.updated_at,
+            "last_error": self.last_error,
+        }
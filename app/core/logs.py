@@ -0,0 +1,227 @@
+"""
+Logging setup: records go through a bounded in-memory queue to a background listener thread.
+
+Callers only pay for the level check, sampling and building the message; formatting (JSON or
+text) and the stream write happen on the listener thread. When the queue is full, records are
+dropped and counted rather than blocking the caller. Every record carries the current trace id
+as its request id, so log lines can be joined with spans and with each other.
+
+Sampling: a record with `extra={"sample_rate": 0.01}` is kept with that probability, and
+LOG_SAMPLE_RATES sets default rates per logger ("app.api.search_zepto=0.1,app.db=0.5"). Only
+DEBUG and INFO records are sampled; warnings and errors are always kept.
+
+preview() wraps a payload so it is rendered lazily and capped at LOG_PREVIEW_CHARS, which
+keeps full upstream responses out of the log even at DEBUG.
+"""
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from .config import LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_SIZE, LOG_SAMPLE_RATES, LOG_PREVIEW_CHARS
+from .metrics import LOG_RECORDS_DROPPED
+from .tracing import current_trace_id
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+# Attributes every LogRecord has; anything else on a record came from `extra` and goes into the JSON
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "sample_rate"}
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    rates = {}
+    for item in spec.split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class Preview:
+    """A payload rendered as compact JSON-ish text, cut at `limit` characters, only when the record is emitted."""
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: int = LOG_PREVIEW_CHARS):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        if isinstance(self.value, (bytes, bytearray)):
+            head = bytes(self.value[:self.limit]).decode("utf-8", errors="replace")
+            total = len(self.value)
+        elif isinstance(self.value, str):
+            head, total = self.value[:self.limit], len(self.value)
+        else:
+            parts: List[str] = []
+            if not _render(self.value, parts, [self.limit]):
+                return "".join(parts)[:self.limit] + "...(truncated)"
+            return "".join(parts)
+        return head if total <= self.limit else f"{head}...(+{total - self.limit} more)"
+
+    __repr__ = __str__
+
+
+def _render(value: Any, parts: List[str], budget: List[int]) -> bool:
+    """Append `value` to parts until the budget runs out; False once it has. Never walks past the budget."""
+    if budget[0] <= 0:
+        return False
+    if isinstance(value, dict):
+        parts.append("{")
+        budget[0] -= 1
+        for i, (key, item) in enumerate(value.items()):
+            text = ("," if i else "") + json.dumps(str(key)) + ":"
+            parts.append(text)
+            budget[0] -= len(text)
+            if not _render(item, parts, budget):
+                return False
+        parts.append("}")
+        budget[0] -= 1
+    elif isinstance(value, (list, tuple)):
+        parts.append("[")
+        budget[0] -= 1
+        for i, item in enumerate(value):
+            if i:
+                parts.append(",")
+                budget[0] -= 1
+            if not _render(item, parts, budget):
+                return False
+        parts.append("]")
+        budget[0] -= 1
+    else:
+        if isinstance(value, str) and len(value) > budget[0]:
+            value = value[:budget[0] + 1]
+        try:
+            text = json.dumps(value)
+        except (TypeError, ValueError):
+            text = json.dumps(str(value)[:budget[0] + 1])
+        parts.append(text)
+        budget[0] -= len(text)
+    return budget[0] >= 0
+
+
+def preview(value: Any, limit: int = LOG_PREVIEW_CHARS) -> Preview:
+    return Preview(value, limit)
+
+
+class ContextFilter(logging.Filter):
+    """Stamps the request id and applies sampling; runs on the calling thread, where the trace context lives."""
+
+    def __init__(self, rates: Dict[str, float] = None):
+        super().__init__()
+        self.rates = rates or {}
+
+    def _default_rate(self, name: str) -> float:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            rate = getattr(record, "sample_rate", None)
+            if rate is None and self.rates:
+                rate = self._default_rate(record.name)
+            if rate is not None and rate < 1 and random.random() >= rate:
+                LOG_RECORDS_DROPPED.inc(reason="sampled")
+                return False
+        record.request_id = current_trace_id() or "-"
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc(reason="queue_full")
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now (they may change after the call returns); the formatting proper is left to the
+        # listener. The record is not copied first: this handler is the only one on the root logger.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "request_id"):
+            record.request_id = "-"
+        return super().format(record)
+
+
+# uvicorn's loggers have their own stream handlers (the access log writes once per request)
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handlers: Optional[tuple] = None
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream=None) -> None:
+    """Route the root and uvicorn loggers through the queue; idempotent, the listener is stopped at exit."""
+    global _listener, _handlers
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT))
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    handler.addFilter(ContextFilter(parse_sample_rates(LOG_SAMPLE_RATES)))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    for name in UVICORN_LOGGERS:
+        logger = logging.getLogger(name)
+        logger.handlers.clear()
+        logger.propagate = True
+
+    _handlers = (handler, output)
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Flush what is queued and stop the listener; later records are written directly."""
+    global _listener
+    if _listener is None:
+        return
+    handler, output = _handlers
+    root = logging.getLogger()
+    root.removeHandler(handler)
+    _listener.stop()
+    _listener = None
+    output.addFilter(ContextFilter(parse_sample_rates(LOG_SAMPLE_RATES)))
+    root.addHandler(output)
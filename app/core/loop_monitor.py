@@ -0,0 +1,208 @@
+"""
+Event-loop lag and blocking detection.
+
+A heartbeat task sleeps for a fixed interval and records how late it wakes up; that lateness
+is time the loop spent running something else without yielding. A watchdog thread watches the
+heartbeat and, once it is overdue by more than the threshold, samples the loop thread's stack
+until the loop comes back. Each stall becomes a block event with its collapsed stacks and the
+innermost application frame, which is usually the blocking call site.
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+from .config import (
+    PROJECT_ROOT, LOOP_MONITOR_INTERVAL_MS, LOOP_BLOCK_THRESHOLD_MS, LOOP_STACK_SAMPLE_MS, LOOP_BLOCK_HISTORY,
+    LOOP_ASYNCIO_DEBUG,
+)
+from .metrics import LOOP_LAG_SECONDS, LOOP_BLOCKS, LOOP_BLOCKED_SECONDS
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.join(str(PROJECT_ROOT), "app") + os.sep
+MAX_STACK_DEPTH = 60
+# Heartbeat lags kept for percentiles in stats(); 6000 is ten minutes at the default interval
+LAG_WINDOW = 6000
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(str(PROJECT_ROOT)):
+        filename = os.path.relpath(filename, str(PROJECT_ROOT))
+    else:
+        filename = os.path.basename(filename)
+    return f"{filename}:{code.co_name}:{frame.f_lineno}"
+
+
+def collapse_stack(frame) -> List[str]:
+    """Frames from outermost to innermost as "file:function:line" labels."""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+def app_frame(frame) -> Optional[str]:
+    """Innermost frame inside the app package: the application code that made the blocking call."""
+    while frame is not None:
+        if frame.f_code.co_filename.startswith(APP_DIR) and not frame.f_code.co_filename.endswith("loop_monitor.py"):
+            return _frame_label(frame)
+        frame = frame.f_back
+    return None
+
+
+class BlockEvent:
+    def __init__(self, started: float):
+        self.started = started
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.duration = 0.0
+        self.stacks: Counter = Counter()
+        self.app_frames: Counter = Counter()
+        self.samples = 0
+
+    def add_sample(self, frame) -> None:
+        self.samples += 1
+        self.stacks[";".join(collapse_stack(frame))] += 1
+        self.app_frames[app_frame(frame) or "(outside app)"] += 1
+
+    @property
+    def hotspot(self) -> Optional[str]:
+        return self.app_frames.most_common(1)[0][0] if self.app_frames else None
+
+    def to_dict(self, stacks: int = 3) -> Dict[str, Any]:
+        return {
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 1),
+            "samples": self.samples,
+            "hotspot": self.hotspot,
+            "app_frames": dict(self.app_frames.most_common(5)),
+            "stacks": [{"count": count, "frames": stack.split(";")} for stack, count in self.stacks.most_common(stacks)],
+        }
+
+
+class LoopMonitor:
+    def __init__(self, interval_ms: float = LOOP_MONITOR_INTERVAL_MS, threshold_ms: float = LOOP_BLOCK_THRESHOLD_MS,
+                 sample_ms: float = LOOP_STACK_SAMPLE_MS, history: int = LOOP_BLOCK_HISTORY):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.sample_interval = sample_ms / 1000
+        self.events: Deque[BlockEvent] = deque(maxlen=history)
+        self.lags: Deque[float] = deque(maxlen=LAG_WINDOW)
+        self.max_lag = 0.0
+        # hotspot -> [blocks, seconds]; survives events rotating out of the history
+        self.hotspots: Dict[str, List[float]] = {}
+        self._beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        if LOOP_ASYNCIO_DEBUG:
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.threshold
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = loop.create_task(self._heartbeat(), name="loop-monitor")
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Event-loop monitor started (interval {self.interval * 1000:.0f}ms, threshold {self.threshold * 1000:.0f}ms)")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            start = time.monotonic()
+            self._beat = start
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - start - self.interval)
+            LOOP_LAG_SECONDS.observe(lag)
+            with self._lock:
+                self.lags.append(lag)
+                self.max_lag = max(self.max_lag, lag)
+
+    def _watch(self) -> None:
+        event: Optional[BlockEvent] = None
+        poll = max(self.sample_interval, self.threshold / 4)
+        while not self._stop.is_set():
+            overdue = time.monotonic() - self._beat - self.interval
+            if overdue < self.threshold:
+                if event is not None:
+                    self._finish(event)
+                    event = None
+                self._stop.wait(poll)
+                continue
+            if event is None:
+                event = BlockEvent(time.monotonic() - overdue)
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                event.add_sample(frame)
+            event.duration = overdue
+            del frame
+            self._stop.wait(self.sample_interval)
+        if event is not None:
+            self._finish(event)
+
+    def _finish(self, event: BlockEvent) -> None:
+        LOOP_BLOCKS.inc()
+        LOOP_BLOCKED_SECONDS.inc(event.duration)
+        with self._lock:
+            self.events.append(event)
+            entry = self.hotspots.setdefault(event.hotspot or "(unknown)", [0, 0.0])
+            entry[0] += 1
+            entry[1] += event.duration
+        logger.warning(f"Event loop blocked for {event.duration * 1000:.0f}ms at {event.hotspot}")
+
+    def stats(self, limit: int = 20, stacks: int = 3) -> Dict[str, Any]:
+        with self._lock:
+            lags = sorted(self.lags)
+            events = list(self.events)[-limit:]
+            hotspots = sorted(self.hotspots.items(), key=lambda item: -item[1][1])
+
+        def pct(p: float) -> Optional[float]:
+            return round(lags[min(len(lags) - 1, int(p / 100 * len(lags)))] * 1000, 2) if lags else None
+
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms": {"samples": len(lags), "p50": pct(50), "p95": pct(95), "p99": pct(99),
+                       "max": round(self.max_lag * 1000, 2)},
+            "blocks": LOOP_BLOCKS.value(),
+            "hotspots": [{"frame": frame, "blocks": int(count), "blocked_ms": round(seconds * 1000, 1)}
+                         for frame, (count, seconds) in hotspots],
+            "recent": [event.to_dict(stacks) for event in reversed(events)],
+        }
+
+
+loop_monitor = LoopMonitor()
@@ -0,0 +1,268 @@
+"""
+Cross-platform product matching.
+
+Listings are reduced to (brand, pack size, name tokens). Candidates come from MinHash/LSH
+buckets plus an inverted index of rare tokens; the best verified candidate lends its
+canonical id, otherwise the listing founds a new canonical product.
+"""
+import os
+import re
+import gzip
+import json
+import uuid
+import random
+import hashlib
+import logging
+import threading
+import unicodedata
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from .config import MATCH_INDEX_PATH, MATCH_THRESHOLD, MATCH_NUM_PERM, MATCH_BANDS
+from ..utils.quantity_utils import AMOUNT_RE, MULTI_BEFORE_RE, parse_quantity
+
+logger = logging.getLogger(__name__)
+
+STOPWORDS = {
+    "a", "and", "with", "the", "of", "for", "in", "by", "new", "fresh", "pack", "combo", "pouch",
+    "bottle", "jar", "box", "packet", "tetra", "carton", "pc", "pcs", "piece", "pieces", "x",
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Mersenne prime for the universal hash family used by MinHash
+_PRIME = (1 << 61) - 1
+# Postings longer than this are too common to narrow candidates down
+_MAX_POSTING = 256
+# Tolerance when comparing pack sizes, e.g. 1 kg vs 999 g
+_PACK_TOLERANCE = 0.02
+
+Pack = Tuple[str, float]
+VariantKey = Tuple[str, str]
+
+
+def normalize_text(text: Any) -> str:
+    text = unicodedata.normalize("NFKD", str(text or "")).encode("ascii", "ignore").decode("ascii")
+    return " ".join(TOKEN_RE.findall(text.lower().replace("&", " and ")))
+
+
+def normalize_pack(quantity: Any) -> Optional[Pack]:
+    """'2 x 200 ml' -> ('l', 0.4); None when no size can be read."""
+    value, unit = parse_quantity(str(quantity) if quantity else None)
+    return (unit, value) if value else None
+
+
+def normalize_brand(brand: Any) -> str:
+    return normalize_text(brand)
+
+
+def name_tokens(name: Any, brand: str = "") -> FrozenSet[str]:
+    text = AMOUNT_RE.sub(" ", MULTI_BEFORE_RE.sub(" ", str(name or "").lower()))
+    brand_tokens = set(brand.split())
+    return frozenset(
+        token for token in normalize_text(text).split()
+        if len(token) > 1 and token not in STOPWORDS and token not in brand_tokens
+    )
+
+
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def packs_compatible(a: Optional[Pack], b: Optional[Pack]) -> bool:
+    if a is None or b is None:
+        return True
+    return a[0] == b[0] and abs(a[1] - b[1]) <= _PACK_TOLERANCE * max(a[1], b[1])
+
+
+def brands_compatible(a: str, b: str) -> bool:
+    if not a or not b or a == b:
+        return True
+    # "amul" vs "amul dairy"
+    return set(a.split()) <= set(b.split()) or set(b.split()) <= set(a.split())
+
+
+class _Canonical:
+    __slots__ = ("id", "brand", "pack", "tokens", "name", "members", "signature")
+
+    def __init__(self, canonical_id: str, brand: str, pack: Optional[Pack], tokens: FrozenSet[str], name: str):
+        self.id = canonical_id
+        self.brand = brand
+        self.pack = pack
+        self.tokens = tokens
+        self.name = name
+        self.members: Set[VariantKey] = set()
+        self.signature: Tuple[int, ...] = ()
+
+
+class ProductMatcher:
+    """Incrementally assigns canonical product ids to platform variants."""
+
+    def __init__(self, num_perm: int = MATCH_NUM_PERM, bands: int = MATCH_BANDS, threshold: float = MATCH_THRESHOLD):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        rng = random.Random(1)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self._canonicals: Dict[str, _Canonical] = {}
+        self._assignments: Dict[VariantKey, str] = {}
+        self._buckets: Dict[Tuple[int, int], Set[str]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._brands: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def signature(self, tokens: Iterable[str]) -> Tuple[int, ...]:
+        hashes = [_token_hash(token) for token in tokens]
+        if not hashes:
+            return ()
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms)
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> List[Tuple[int, int]]:
+        if not signature:
+            return []
+        return [(band, hash(signature[band * self.rows:(band + 1) * self.rows])) for band in range(self.bands)]
+
+    def _candidates(self, tokens: FrozenSet[str], signature: Tuple[int, ...]) -> Set[str]:
+        candidates: Set[str] = set()
+        for key in self._band_keys(signature):
+            candidates |= self._buckets.get(key, set())
+        # Short names make MinHash noisy, so also probe the two rarest tokens
+        postings = sorted((self._postings.get(token, set()) for token in tokens), key=len)
+        for posting in postings[:2]:
+            if len(posting) <= _MAX_POSTING:
+                candidates |= posting
+        return candidates
+
+    def _infer_brand(self, name: Any) -> str:
+        # Some listings carry the brand only as the leading words of the name
+        words = normalize_text(name).split()
+        for size in (3, 2, 1):
+            prefix = " ".join(words[:size])
+            if len(words) > size and prefix in self._brands:
+                return prefix
+        return ""
+
+    def _index(self, canonical: _Canonical) -> None:
+        if canonical.brand:
+            self._brands.add(canonical.brand)
+        canonical.signature = self.signature(canonical.tokens)
+        for key in self._band_keys(canonical.signature):
+            self._buckets.setdefault(key, set()).add(canonical.id)
+        for token in canonical.tokens:
+            self._postings.setdefault(token, set()).add(canonical.id)
+
+    def _best_match(self, brand: str, pack: Optional[Pack], tokens: FrozenSet[str]) -> Optional[_Canonical]:
+        best, best_score = None, self.threshold
+        for candidate_id in self._candidates(tokens, self.signature(tokens)):
+            candidate = self._canonicals[candidate_id]
+            if not brands_compatible(brand, candidate.brand):
+                continue
+            if not packs_compatible(pack, candidate.pack):
+                continue
+            score = jaccard(tokens, candidate.tokens)
+            # An unknown pack size on either side needs stronger name evidence
+            if pack is None or candidate.pack is None:
+                score -= 0.1
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best
+
+    def assign(self, platform: str, variant_id: str, name: Any, brand: Any = None, quantity: Any = None) -> str:
+        key = (platform, str(variant_id))
+        with self._lock:
+            if key in self._assignments:
+                return self._assignments[key]
+            norm_brand = normalize_brand(brand) or self._infer_brand(name)
+            pack = normalize_pack(quantity) or normalize_pack(name)
+            tokens = name_tokens(name, norm_brand)
+            canonical = self._best_match(norm_brand, pack, tokens) if tokens else None
+            if canonical is None:
+                canonical_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"canonical|{platform}|{variant_id}"))
+                canonical = _Canonical(canonical_id, norm_brand, pack, tokens, str(name or ""))
+                self._canonicals[canonical_id] = canonical
+                self._index(canonical)
+            else:
+                if norm_brand and not canonical.brand:
+                    canonical.brand = norm_brand
+                    self._brands.add(norm_brand)
+                canonical.pack = canonical.pack or pack
+            canonical.members.add(key)
+            self._assignments[key] = canonical.id
+            return canonical.id
+
+    def assign_products(self, products: List[Any]) -> List[str]:
+        """Assign canonical ids and set them on the products as `canonical_id`."""
+        ids = []
+        for product in products:
+            canonical_id = self.assign(
+                getattr(product, "platform", ""),
+                getattr(product, "variant_id", ""),
+                getattr(product, "name", None),
+                getattr(product, "brand", None),
+                getattr(product, "quantity", None),
+            )
+            product.canonical_id = canonical_id
+            ids.append(canonical_id)
+        return ids
+
+    def canonical_id(self, platform: str, variant_id: str) -> Optional[str]:
+        return self._assignments.get((platform, str(variant_id)))
+
+    def describe(self, canonical_id: str) -> Optional[Dict[str, Any]]:
+        canonical = self._canonicals.get(canonical_id)
+        if canonical is None:
+            return None
+        return {
+            "canonical_id": canonical.id,
+            "name": canonical.name,
+            "brand": canonical.brand or None,
+            "pack": {"unit": canonical.pack[0], "amount": canonical.pack[1]} if canonical.pack else None,
+            "members": [{"platform": p, "variant_id": v} for p, v in sorted(canonical.members)],
+        }
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "variants": len(self._assignments),
+                "canonical_products": len(self._canonicals),
+                "cross_platform": sum(1 for c in self._canonicals.values() if len({p for p, _ in c.members}) > 1),
+            }
+
+    def save_state(self, path: str = MATCH_INDEX_PATH) -> None:
+        with self._lock:
+            payload = [
+                [c.id, c.brand, list(c.pack) if c.pack else None, sorted(c.tokens), c.name, [list(m) for m in c.members]]
+                for c in self._canonicals.values()
+            ]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+        logger.info(f"Saved {len(payload)} canonical products to {path}")
+
+    def load_state(self, path: str = MATCH_INDEX_PATH) -> None:
+        if not os.path.exists(path):
+            return
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                payload = json.load(f)
+        except Exception as e:
+            logger.error(f"Could not load matching index from {path}: {str(e)}")
+            return
+        with self._lock:
+            for canonical_id, brand, pack, tokens, name, members in payload:
+                canonical = _Canonical(canonical_id, brand, tuple(pack) if pack else None, frozenset(tokens), name)
+                canonical.members = {tuple(m) for m in members}
+                self._canonicals[canonical_id] = canonical
+                self._assignments.update((m, canonical_id) for m in canonical.members)
+                self._index(canonical)
+        logger.info(f"Loaded {len(payload)} canonical products from {path}")
+
+
+product_matcher = ProductMatcher()
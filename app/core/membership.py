@@ -0,0 +1,232 @@
+"""
+Per-store sets of every variant_id ever listed, for flagging new listings on the hot path.
+
+Each (platform, store) gets a scalable Bloom filter: a list of fixed-size layers where a new,
+larger and stricter layer is added once the current one is full. Lookups are O(1) and never
+miss a known variant; a false positive only means a genuinely new variant goes unflagged.
+Filters are loaded from disk the first time a store is touched and written back when dirty:
+every MEMBERSHIP_SAVE_INTERVAL seconds, on shutdown, and when an idle store is evicted to keep
+at most MEMBERSHIP_MAX_STORES filters in memory.
+"""
+import os
+import re
+import math
+import struct
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .config import MEMBERSHIP_DIR, MEMBERSHIP_CAPACITY, MEMBERSHIP_ERROR_RATE, MEMBERSHIP_MAX_STORES, MEMBERSHIP_SAVE_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Scope markers share the filter with variant ids; the NUL prefix keeps them from colliding
+SCOPE_MARKER = "\x00query:"
+
+FILE_MAGIC = b"BLM1"
+# magic, layer count; then per layer: capacity, count, hash count, bit count, bits
+HEADER = struct.Struct("<4sI")
+LAYER_HEADER = struct.Struct("<IIIQ")
+
+
+class BloomLayer:
+    def __init__(self, capacity: int, error_rate: float, bits: bytearray = None, count: int = 0, hashes: int = None):
+        self.capacity = capacity
+        if bits is None:
+            bits = bytearray((max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2))) + 7) // 8)
+        self.bits = bits
+        self.num_bits = len(bits) * 8
+        self.num_hashes = hashes or max(1, round(self.num_bits / capacity * math.log(2)))
+        self.count = count
+
+    def _positions(self, h1: int, h2: int) -> Iterable[int]:
+        # Kirsch-Mitzenmacher: k positions from two base hashes
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def contains(self, h1: int, h2: int) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(h1, h2))
+
+    def add(self, h1: int, h2: int) -> None:
+        for p in self._positions(h1, h2):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+
+class StoreFilter:
+    def __init__(self, capacity: int = MEMBERSHIP_CAPACITY, error_rate: float = MEMBERSHIP_ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.layers: List[BloomLayer] = []
+        self.dirty = False
+
+    @staticmethod
+    def _hashes(variant_id: str) -> Tuple[int, int]:
+        digest = hashlib.blake2b(variant_id.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        return h1, h2 | 1
+
+    def __len__(self) -> int:
+        return sum(layer.count for layer in self.layers)
+
+    def __contains__(self, variant_id: str) -> bool:
+        h1, h2 = self._hashes(variant_id)
+        return any(layer.contains(h1, h2) for layer in self.layers)
+
+    def add(self, variant_id: str) -> bool:
+        """Add a variant; returns True if it was not (probably) present before."""
+        h1, h2 = self._hashes(variant_id)
+        if any(layer.contains(h1, h2) for layer in self.layers):
+            return False
+        if not self.layers or self.layers[-1].count >= self.layers[-1].capacity:
+            # Each new layer doubles in size and halves its error rate so the overall rate stays bounded
+            depth = len(self.layers)
+            self.layers.append(BloomLayer(self.capacity * 2 ** depth, self.error_rate / 2 ** (depth + 1)))
+        self.layers[-1].add(h1, h2)
+        self.dirty = True
+        return True
+
+    def to_bytes(self) -> bytes:
+        parts = [HEADER.pack(FILE_MAGIC, len(self.layers))]
+        for layer in self.layers:
+            parts.append(LAYER_HEADER.pack(layer.capacity, layer.count, layer.num_hashes, layer.num_bits))
+            parts.append(bytes(layer.bits))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, capacity: int = MEMBERSHIP_CAPACITY, error_rate: float = MEMBERSHIP_ERROR_RATE) -> "StoreFilter":
+        magic, num_layers = HEADER.unpack_from(data, 0)
+        if magic != FILE_MAGIC:
+            raise ValueError("not a membership filter file")
+        store_filter = cls(capacity, error_rate)
+        offset = HEADER.size
+        for _ in range(num_layers):
+            layer_capacity, count, hashes, num_bits = LAYER_HEADER.unpack_from(data, offset)
+            offset += LAYER_HEADER.size
+            size = (num_bits + 7) // 8
+            bits = bytearray(data[offset:offset + size])
+            offset += size
+            store_filter.layers.append(BloomLayer(layer_capacity, error_rate, bits, count, hashes))
+        return store_filter
+
+
+class StoreMembership:
+    """Lazily loaded per-(platform, store) Bloom filters of variant ids."""
+
+    def __init__(self, state_dir: str = MEMBERSHIP_DIR, max_stores: int = MEMBERSHIP_MAX_STORES):
+        self.state_dir = state_dir
+        self.max_stores = max(1, max_stores)
+        self._filters: "OrderedDict[Tuple[str, str], StoreFilter]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._autosave: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def path(self, platform: str, store_id: str) -> str:
+        return os.path.join(self.state_dir, platform, re.sub(r"[^A-Za-z0-9._-]+", "_", store_id) + ".bloom")
+
+    def _write(self, platform: str, store_id: str, data: bytes) -> None:
+        path = self.path(platform, store_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    def _filter(self, platform: str, store_id: str) -> StoreFilter:
+        """The store's filter, loading it if needed; callers hold the lock."""
+        key = (platform, store_id)
+        store_filter = self._filters.get(key)
+        if store_filter is not None:
+            self._filters.move_to_end(key)
+        else:
+            store_filter = StoreFilter()
+            path = self.path(platform, store_id)
+            if os.path.exists(path):
+                try:
+                    with open(path, "rb") as f:
+                        store_filter = StoreFilter.from_bytes(f.read())
+                except Exception as e:
+                    logger.error(f"Could not load membership filter {path}, starting empty: {str(e)}")
+            self._filters[key] = store_filter
+            while len(self._filters) > self.max_stores:
+                # Written under the lock so a reload of the same store cannot read a stale file
+                (old_platform, old_store), evicted = self._filters.popitem(last=False)
+                if evicted.dirty:
+                    self._write(old_platform, old_store, evicted.to_bytes())
+        return store_filter
+
+    def flag_new_listings(self, platform: str, location: str, query: str, products: List[Any], baseline: bool = None,
+                          baselines: Dict[str, bool] = None) -> int:
+        """
+        Record every product's variant in its store's filter and set `new_listing` on each product.
+
+        Products without a store_id are keyed by the scrape location. The first scrape of a query
+        in a store is a baseline (its variants were listed before we looked), tracked with a
+        marker entry in the same filter; `baseline` overrides that check. Callers flagging one
+        result set page by page pass the same `baselines` dict so the decision made on the first
+        page holds for the rest. Returns the number flagged.
+        """
+        marker = SCOPE_MARKER + (query or "").strip().lower()
+        flagged = 0
+        if baselines is None:
+            baselines = {}
+        with self._lock:
+            for product in products:
+                store_id = str(getattr(product, "store_id", "") or location or "")
+                variant_id = str(getattr(product, "variant_id", "") or "")
+                store_filter = self._filter(platform, store_id)
+                if store_id not in baselines:
+                    baselines[store_id] = marker not in store_filter if baseline is None else baseline
+                    store_filter.add(marker)
+                is_new = bool(variant_id) and store_filter.add(variant_id) and not baselines[store_id]
+                product.new_listing = is_new
+                flagged += is_new
+        return flagged
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "stores_loaded": len(self._filters),
+                "variants": sum(len(f) for f in self._filters.values()),
+                "bytes": sum(len(layer.bits) for f in self._filters.values() for layer in f.layers),
+            }
+
+    def save_state(self) -> int:
+        """Write filters changed since the last save; returns how many were written."""
+        # Written under the lock: two concurrent saves could otherwise write their snapshots
+        # out of order and leave an older filter on disk
+        with self._lock:
+            dirty = [(key, f) for key, f in self._filters.items() if f.dirty]
+            for (platform, store_id), store_filter in dirty:
+                self._write(platform, store_id, store_filter.to_bytes())
+                store_filter.dirty = False
+        if dirty:
+            logger.info(f"Saved {len(dirty)} store membership filters to {self.state_dir}")
+        return len(dirty)
+
+    def start_autosave(self, interval: float = MEMBERSHIP_SAVE_INTERVAL) -> None:
+        """Save dirty filters every `interval` seconds from a background thread, so a crash loses at most one interval."""
+        if self._autosave is not None or interval <= 0:
+            return
+        self._stop.clear()
+        self._autosave = threading.Thread(target=self._autosave_loop, args=(interval,), name="membership-autosave", daemon=True)
+        self._autosave.start()
+
+    def stop_autosave(self) -> None:
+        if self._autosave is None:
+            return
+        self._stop.set()
+        self._autosave.join(timeout=10)
+        self._autosave = None
+
+    def _autosave_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.save_state()
+            except Exception as e:
+                logger.error(f"Periodic membership save failed: {str(e)}")
+
+
+store_membership = StoreMembership()
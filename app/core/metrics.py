@@ -0,0 +1,301 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format at /metrics.
+
+Counters, gauges and histograms carry label sets; children are created on first use and
+updated under a per-metric lock, so instrumented code in worker threads and on the event
+loop can share them. Counters and gauges can instead be backed by a callback read at scrape time.
+"""
+import abc
+import time
+import asyncio
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .tracing import span
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+PAGE_BUCKETS = (1, 2, 3, 5, 10, 20, 50)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[str, str] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric(abc.ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abc.abstractmethod
+    def samples(self) -> List[str]:
+        ...
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class _ValueMetric(Metric):
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Callable[[], Any] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        # Read at scrape time instead of stored values: a number, or {label values tuple: number}
+        self.callback = callback
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        if self.callback is not None:
+            try:
+                value = self.callback()
+            except Exception:
+                return []
+            items = sorted(value.items()) if isinstance(value, dict) else [((), value)]
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Counter(_ValueMetric):
+    kind = "counter"
+
+
+class Gauge(_ValueMetric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels: Any) -> Iterator[None]:
+        self.inc(1, **labels)
+        try:
+            yield
+        finally:
+            self.dec(1, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> [per-bucket counts, sum, count]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self, **labels: Any) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return {"buckets": list(entry[0]), "sum": entry[1], "count": entry[2]} if entry else None
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, [list(entry[0]), entry[1], entry[2]]) for key, entry in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = ("le", _format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = (), callback: Callable = None) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, callback))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), callback: Callable = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+registry = Registry()
+
+UPSTREAM_REQUEST_SECONDS = registry.histogram(
+    "scraper_upstream_request_seconds", "Latency of upstream platform API calls", ("platform", "operation"))
+UPSTREAM_REQUESTS = registry.counter(
+    "scraper_upstream_requests_total", "Upstream platform API calls by outcome", ("platform", "operation", "outcome"))
+UPSTREAM_RESPONSES = registry.counter(
+    "scraper_upstream_responses_total", "Upstream HTTP responses by status code", ("platform", "status"))
+UPSTREAM_BYTES = registry.counter(
+    "scraper_upstream_response_bytes_total", "Bytes of upstream response bodies", ("platform",))
+UPSTREAM_INFLIGHT = registry.gauge(
+    "scraper_upstream_requests_in_flight", "Upstream API calls currently running", ("platform",))
+UPSTREAM_RETRIES = registry.counter(
+    "scraper_upstream_retries_total", "Upstream page fetches retried after an error", ("platform",))
+UPSTREAM_BANS = registry.counter(
+    "scraper_upstream_bans_total", "Upstream responses that indicate blocking or rate limiting (403/429)", ("platform",))
+PAGES_PER_QUERY = registry.histogram(
+    "scraper_pages_per_query", "Result pages fetched per search", ("platform",), buckets=PAGE_BUCKETS)
+EXTRACT_SECONDS = registry.histogram(
+    "scraper_extract_seconds", "Time spent turning one upstream response into products", ("platform",), buckets=FAST_BUCKETS)
+EXTRACTED_PRODUCTS = registry.counter(
+    "scraper_extracted_products_total", "Products extracted from upstream responses", ("platform",))
+CACHE_LOOKUPS = registry.counter(
+    "scraper_cache_lookups_total", "Cache lookups by cache and result (hit or miss)", ("platform", "cache", "result"))
+DB_WRITE_SECONDS = registry.histogram(
+    "scraper_db_write_seconds", "Time to write one batch of rows to storage", ("table",))
+DB_ROWS = registry.counter(
+    "scraper_db_rows_total", "Rows handed to storage by outcome", ("table", "outcome"))
+LOOP_LAG_SECONDS = registry.histogram(
+    "scraper_event_loop_lag_seconds", "How late the event-loop heartbeat woke up", buckets=LAG_BUCKETS)
+LOOP_BLOCKS = registry.counter(
+    "scraper_event_loop_blocks_total", "Times the event loop was blocked for longer than the threshold")
+LOOP_BLOCKED_SECONDS = registry.counter(
+    "scraper_event_loop_blocked_seconds_total", "Time the event loop spent blocked beyond the threshold")
+LOG_RECORDS_DROPPED = registry.counter(
+    "scraper_log_records_dropped_total", "Log records not written, by reason (sampled or queue_full)", ("reason",))
+
+BAN_STATUSES = {403, 429}
+
+
+def record_response(platform: str, status: int, body: Optional[bytes] = None) -> None:
+    UPSTREAM_RESPONSES.inc(platform=platform, status=status)
+    if status in BAN_STATUSES:
+        UPSTREAM_BANS.inc(platform=platform)
+    if body:
+        UPSTREAM_BYTES.inc(len(body), platform=platform)
+
+
+def instrument_fetch(platform: str, operation: str = "search") -> Callable:
+    """Time an upstream call and count it by outcome, tracking it as in flight and as a trace span while it runs."""
+    def decorator(fn: Callable) -> Callable:
+        def finish(start: float, outcome: str) -> None:
+            UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - start, platform=platform, operation=operation)
+            UPSTREAM_REQUESTS.inc(platform=platform, operation=operation, outcome=outcome)
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                with UPSTREAM_INFLIGHT.track(platform=platform), span(f"{platform}.{operation}"):
+                    try:
+                        result = await fn(*args, **kwargs)
+                    except Exception:
+                        finish(start, "error")
+                        raise
+                finish(start, "ok")
+                return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            with UPSTREAM_INFLIGHT.track(platform=platform), span(f"{platform}.{operation}"):
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception:
+                    finish(start, "error")
+                    raise
+            finish(start, "ok")
+            return result
+        return wrapper
+    return decorator
+
+
+def instrument_extract(platform: str) -> Callable:
+    """Time an extractor (metric and trace span) and count the products it returns."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with EXTRACT_SECONDS.time(platform=platform), span(f"{platform}.extract") as record:
+                products = fn(*args, **kwargs)
+                if record is not None:
+                    record["attributes"]["products"] = len(products or [])
+            EXTRACTED_PRODUCTS.inc(len(products or []), platform=platform)
+            return products
+        return wrapper
+    return decorator
+
+
+def render() -> str:
+    return registry.render()
@@ -0,0 +1,106 @@
+"""
+Post-extraction stages shared by every platform adapter.
+"""
+import asyncio
+from typing import Any, Dict, List
+
+from .config import CHANGE_DETECTION_ENABLED, CHANGE_PERSIST, MATCHING_ENABLED, MEMBERSHIP_ENABLED
+from .changes import change_detector
+from .broker import change_broker
+from .matching import product_matcher
+from .comparison import comparison_index
+from .membership import store_membership
+from .tracing import span
+from ..db.utils import CHANGES_TABLE
+from ..utils.quantity_utils import set_unit_prices
+from ..utils.format_utils import model_to_dict
+from ..db.writer import enqueue_products, enqueue_products_async, enqueue_rows, enqueue_rows_async
+
+
+def flag_new_listings(platform: str, location: str, query: str, products: List[Any], baseline: bool = None,
+                      baselines: Dict[str, bool] = None) -> None:
+    if MEMBERSHIP_ENABLED and products:
+        store_membership.flag_new_listings(platform, location, query, products, baseline, baselines)
+
+
+def match_products(platform: str, location: str, query: str, products: List[Any]) -> None:
+    if MATCHING_ENABLED and products:
+        product_matcher.assign_products(products)
+        comparison_index.update(platform, location, query, products)
+
+
+def detect_changes(platform: str, location: str, query: str, products: List[Any], **diff_options) -> List[Dict[str, Any]]:
+    # An empty result is far more likely a failed scrape than a fully delisted store
+    if not CHANGE_DETECTION_ENABLED or not products:
+        return []
+    events = change_detector.diff(platform, location, query, products, **diff_options)
+    change_broker.publish(events)
+    return events
+
+
+def _change_rows(events: List[Dict[str, Any]], save_to_db: bool) -> List[Dict[str, Any]]:
+    # Change events are persisted alongside products, never for a plain lookup
+    if not (save_to_db and CHANGE_PERSIST):
+        return []
+    return [{k: v for k, v in event.items() if k != "seq"} for event in events]
+
+
+def _process(platform: str, location: str, query: str, products: List[Any], **diff_options) -> List[Dict[str, Any]]:
+    with span("pipeline.unit_prices"):
+        set_unit_prices(products)
+    with span("pipeline.membership"):
+        flag_new_listings(platform, location, query, products, diff_options.get("baseline"))
+    with span("pipeline.match"):
+        match_products(platform, location, query, products)
+    with span("pipeline.changes"):
+        return detect_changes(platform, location, query, products, **diff_options)
+
+
+class ExportPipeline:
+    """
+    Per-page stages for streamed exports (/{platform}/download and /search/all/download).
+
+    Rows get the same derived columns as a /search response. Change detection and persistence
+    are left out: they need the whole result set, and an export is not a scrape of record.
+    """
+
+    def __init__(self, platform: str, location: str, query: str, exclude_fields: List[str] = ("id", "created_at", "updated_at")):
+        self.platform = platform
+        self.location = location
+        self.query = query
+        self.exclude_fields = list(exclude_fields)
+        # Per-store baseline decisions from the first page, reused for the following ones
+        self.baselines: Dict[str, bool] = {}
+
+    def rows(self, products: List[Any]) -> List[Dict[str, Any]]:
+        if not products:
+            return []
+        with span("pipeline.export", platform=self.platform, products=len(products)):
+            set_unit_prices(products)
+            flag_new_listings(self.platform, self.location, self.query, products, baselines=self.baselines)
+            if MATCHING_ENABLED:
+                # Canonical ids only: the comparison index holds whole result sets, not single pages
+                product_matcher.assign_products(products)
+            return [model_to_dict(product, exclude_fields=self.exclude_fields) for product in products]
+
+
+def handle_scraped_products(platform: str, location: str, query: str, products: List[Any], save_to_db: bool = False, **diff_options) -> List[Dict[str, Any]]:
+    """Run the post-extraction stages from sync code (worker threads)."""
+    with span("pipeline", platform=platform, products=len(products)):
+        events = _process(platform, location, query, products, **diff_options)
+    with span("persist.enqueue", platform=platform):
+        enqueue_rows(_change_rows(events, save_to_db), CHANGES_TABLE)
+        if save_to_db and products:
+            enqueue_products(products, "products")
+    return events
+
+
+async def handle_scraped_products_async(platform: str, location: str, query: str, products: List[Any], save_to_db: bool = False, **diff_options) -> List[Dict[str, Any]]:
+    """Run the post-extraction stages from async routes; matching, membership and the diff run in a worker thread."""
+    with span("pipeline", platform=platform, products=len(products)):
+        events = await asyncio.to_thread(_process, platform, location, query, products, **diff_options)
+    with span("persist.enqueue", platform=platform):
+        await enqueue_rows_async(_change_rows(events, save_to_db), CHANGES_TABLE)
+        if save_to_db and products:
+            await enqueue_products_async(products, "products")
+    return events
@@ -0,0 +1,39 @@
+"""
+Optional warm-up for what the app loads on first use.
+
+Heavy third-party modules (pandas, playwright, cloudscraper, the Supabase SDK) are imported
+inside the functions that need them and the storage backend is created on first write, so a
+worker starts quickly and the first request that needs one of them pays for it. prewarm()
+does that work up front, either before the worker reports ready or in a background thread.
+"""
+import time
+import logging
+import importlib
+from typing import Dict
+
+from .config import STORAGE_BACKEND
+
+logger = logging.getLogger(__name__)
+
+PREWARM_MODULES = ("requests", "cloudscraper", "pycurl", "pandas", "playwright.async_api")
+
+
+def prewarm() -> Dict[str, float]:
+    """Import the deferred modules and create the storage backend; returns milliseconds per step."""
+    from ..db.backends import get_storage_backend
+
+    timings = {}
+    for name in PREWARM_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.debug(f"Prewarm skipped {name}: {e}")
+            continue
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    start = time.perf_counter()
+    get_storage_backend()
+    timings[f"storage:{STORAGE_BACKEND}"] = round((time.perf_counter() - start) * 1000, 1)
+    logger.info(f"Prewarm finished in {sum(timings.values()):.0f}ms: {timings}")
+    return timings
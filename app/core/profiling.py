@@ -0,0 +1,209 @@
+"""
+On-demand diagnostics for a live process: a sampling CPU profiler and tracemalloc snapshots.
+
+The profiler is a thread that reads every other thread's stack with sys._current_frames at a
+fixed rate for a bounded time and counts identical stacks, producing the folded format that
+flamegraph.pl and speedscope read ("thread;outer;...;inner count"). It costs nothing when not
+running. Memory snapshots keep the last few tracemalloc snapshots so two of them can be diffed.
+"""
+import os
+import sys
+import time
+import threading
+import tracemalloc
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import PROJECT_ROOT, PROFILE_MAX_SECONDS, MEMORY_SNAPSHOT_HISTORY
+
+MAX_STACK_DEPTH = 100
+# Leaf frames of threads parked waiting for work; dropped unless idle samples are requested
+IDLE_LEAVES = {
+    ("selectors.py", "select"), ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"), ("thread.py", "_worker"), ("socket.py", "accept"), ("socketserver.py", "serve_forever"),
+}
+
+
+def _relative(filename: str) -> str:
+    """Project files relative to the root, anything else by basename, so no absolute paths leave the process."""
+    if filename.startswith(str(PROJECT_ROOT)):
+        return os.path.relpath(filename, str(PROJECT_ROOT))
+    return os.path.basename(filename)
+
+
+def _label(code) -> Tuple[str, str]:
+    return _relative(code.co_filename), code.co_name
+
+
+class ProfileBusy(RuntimeError):
+    pass
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def run(self, seconds: float, hz: float = 100, include_idle: bool = False, lines: bool = False) -> Dict[str, Any]:
+        """Sample all threads for `seconds` at `hz` from the calling thread; one profile at a time."""
+        seconds = max(0.1, min(seconds, PROFILE_MAX_SECONDS))
+        interval = 1 / max(1.0, min(hz, 1000.0))
+        if not self._lock.acquire(blocking=False):
+            raise ProfileBusy("A CPU profile is already running")
+        try:
+            return self._sample(seconds, interval, include_idle, lines)
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds: float, interval: float, include_idle: bool, lines: bool) -> Dict[str, Any]:
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        functions_self: Counter = Counter()
+        functions_total: Counter = Counter()
+        samples = idle = 0
+        started_at = datetime.now(timezone.utc).isoformat()
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        deadline = start + seconds
+        next_tick = start
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                frames = []
+                while frame is not None and len(frames) < MAX_STACK_DEPTH:
+                    filename, function = _label(frame.f_code)
+                    frames.append(f"{filename}:{function}:{frame.f_lineno}" if lines else f"{filename}:{function}")
+                    if len(frames) == 1:
+                        leaf = (filename, function)
+                    frame = frame.f_back
+                del frame
+                if not frames:
+                    continue
+                if not include_idle and leaf in IDLE_LEAVES:
+                    idle += 1
+                    continue
+                samples += 1
+                frames.reverse()
+                stacks[";".join([names.get(thread_id, str(thread_id)).replace(";", "_")] + frames)] += 1
+                functions_self[frames[-1]] += 1
+                for function in set(frames):
+                    functions_total[function] += 1
+            next_tick += interval
+            time.sleep(max(0.0, next_tick - time.perf_counter()))
+
+        elapsed = time.perf_counter() - start
+        return {
+            "started_at": started_at,
+            "seconds": round(elapsed, 3),
+            "interval_ms": round(interval * 1000, 3),
+            "samples": samples,
+            "idle_samples_dropped": idle,
+            # Process CPU over the window, including the sampler itself
+            "process_cpu_seconds": round(time.process_time() - cpu_start, 3),
+            "folded": "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()),
+            "top_self": [{"function": f, "samples": n, "share": round(n / samples, 4)} for f, n in functions_self.most_common(25)] if samples else [],
+            "top_total": [{"function": f, "samples": n, "share": round(n / samples, 4)} for f, n in functions_total.most_common(25)] if samples else [],
+        }
+
+
+class MemorySnapshots:
+    """tracemalloc control plus the last few snapshots, addressable by id for diffs."""
+
+    def __init__(self, history: int = MEMORY_SNAPSHOT_HISTORY):
+        self.history = history
+        self._snapshots: "OrderedDict[int, Tuple[str, tracemalloc.Snapshot]]" = OrderedDict()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def start(self, frames: int = 25) -> Dict[str, Any]:
+        if tracemalloc.is_tracing():
+            return {"tracing": True, "frames": tracemalloc.get_traceback_limit(), "already_running": True}
+        tracemalloc.start(frames)
+        return {"tracing": True, "frames": frames}
+
+    def stop(self) -> Dict[str, Any]:
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+        return {"tracing": False}
+
+    def status(self) -> Dict[str, Any]:
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        with self._lock:
+            snapshots = [{"id": sid, "taken_at": taken_at} for sid, (taken_at, _) in self._snapshots.items()]
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            "traced_mb": round(current / 2 ** 20, 2),
+            "peak_traced_mb": round(peak / 2 ** 20, 2),
+            "rss_mb": rss_mb(),
+            "snapshots": snapshots,
+        }
+
+    def take(self) -> Tuple[int, tracemalloc.Snapshot]:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running; start it first")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+        with self._lock:
+            sid = self._next_id
+            self._next_id += 1
+            self._snapshots[sid] = (datetime.now(timezone.utc).isoformat(), snapshot)
+            while len(self._snapshots) > self.history:
+                self._snapshots.popitem(last=False)
+        return sid, snapshot
+
+    def get(self, sid: int) -> Optional[tracemalloc.Snapshot]:
+        with self._lock:
+            entry = self._snapshots.get(sid)
+        return entry[1] if entry else None
+
+
+def rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def _where(traceback: tracemalloc.Traceback, frames: int) -> List[str]:
+    return [f"{_relative(frame.filename)}:{frame.lineno}" for frame in list(traceback)[:frames]]
+
+
+def snapshot_top(snapshot: tracemalloc.Snapshot, group_by: str = "lineno", limit: int = 30, frames: int = 5) -> Dict[str, Any]:
+    stats = snapshot.statistics(group_by)
+    return {
+        "total_mb": round(sum(stat.size for stat in stats) / 2 ** 20, 2),
+        "top": [{"where": _where(stat.traceback, frames), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+                for stat in stats[:limit]],
+    }
+
+
+def snapshot_diff(base: tracemalloc.Snapshot, current: tracemalloc.Snapshot, group_by: str = "lineno",
+                  limit: int = 30, frames: int = 5) -> Dict[str, Any]:
+    stats = current.compare_to(base, group_by)
+    return {
+        "growth_mb": round(sum(stat.size_diff for stat in stats) / 2 ** 20, 2),
+        "top": [{"where": _where(stat.traceback, frames), "size_diff_kb": round(stat.size_diff / 1024, 1),
+                 "size_kb": round(stat.size / 1024, 1), "count_diff": stat.count_diff}
+                for stat in stats[:limit]],
+    }
+
+
+cpu_profiler = SamplingProfiler()
+memory_snapshots = MemorySnapshots()
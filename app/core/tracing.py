@@ -0,0 +1,264 @@
+"""
+Lightweight per-request tracing.
+
+The HTTP middleware opens a trace for each incoming request and keeps it in a context
+variable, so spans opened anywhere below (including worker threads started with
+run_in_threadpool / asyncio.to_thread, which copy the context) attach to it. Outside a
+trace, span() is a no-op. Finished traces are exported as JSON lines to a file and/or
+POSTed to a collector by a background thread, so export never blocks a request.
+"""
+import os
+import re
+import json
+import time
+import queue
+import uuid
+import random
+import asyncio
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from fastapi.routing import APIRoute
+
+from .config import TRACING_ENABLED, TRACE_EXPORT_PATH, TRACE_COLLECTOR_URL, TRACE_SAMPLE_RATE, TRACE_EXPORT_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+TRACE_HEADER = "X-Trace-Id"
+DEBUG_TIMING_HEADER = "X-Debug-Timing"
+TRACE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class Trace:
+    def __init__(self, name: str, trace_id: str = None, sampled: bool = True):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.name = name
+        self.sampled = sampled
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.attributes: Dict[str, Any] = {}
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def new_span_id(self) -> int:
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    def add(self, span: Dict[str, Any]) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def finish(self) -> None:
+        self.duration_ms = round((time.perf_counter() - self.start) * 1000, 3)
+
+    def summary(self) -> str:
+        """Total time plus time and count per span name, e.g. "total=812.4ms; blinkit.listing=640.2ms(3)"."""
+        totals: Dict[str, List[float]] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            entry = totals.setdefault(span["name"], [0.0, 0])
+            entry[0] += span["duration_ms"]
+            entry[1] += 1
+        parts = [f"total={self.duration_ms if self.duration_ms is not None else 0:.1f}ms"]
+        for name, (duration, count) in sorted(totals.items(), key=lambda item: -item[1][0]):
+            parts.append(f"{name}={duration:.1f}ms({count})")
+        return "; ".join(parts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "spans": spans,
+        }
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_span_id: ContextVar[Optional[int]] = ContextVar("span_id", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _trace.get()
+    return trace.trace_id if trace else None
+
+
+@contextmanager
+def start_trace(name: str, trace_id: str = None, force: bool = False) -> Iterator[Trace]:
+    sampled = force or TRACE_SAMPLE_RATE >= 1 or random.random() < TRACE_SAMPLE_RATE
+    trace = Trace(name, trace_id, sampled)
+    trace_token = _trace.set(trace)
+    span_token = _span_id.set(None)
+    try:
+        yield trace
+    finally:
+        trace.finish()
+        _span_id.reset(span_token)
+        _trace.reset(trace_token)
+        if trace.sampled:
+            exporter.export(trace)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Dict[str, Any]]]:
+    """Time a block as a child of the current span; yields the span dict so callers can add attributes."""
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+    record = {
+        "span_id": trace.new_span_id(),
+        "parent_id": _span_id.get(),
+        "name": name,
+        "offset_ms": round((time.perf_counter() - trace.start) * 1000, 3),
+        "thread": threading.current_thread().name,
+        "attributes": attributes,
+    }
+    token = _span_id.set(record["span_id"])
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = f"{type(e).__name__}: {e}"[:500]
+        raise
+    finally:
+        record["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        _span_id.reset(token)
+        trace.add(record)
+
+
+def traced(name: str, **attributes: Any) -> Callable:
+    """Decorator form of span() for sync and async functions."""
+    def decorator(fn: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, **attributes):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TracedRoute(APIRoute):
+    """
+    Splits each route into "route" (request validation, endpoint and response serialization)
+    and "endpoint" (the handler alone); the difference is FastAPI/pydantic overhead.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs: Any):
+        # include_router re-creates routes from already wrapped endpoints
+        if not getattr(endpoint, "_traced_endpoint", False):
+            endpoint = traced("endpoint", path=path)(endpoint)
+            endpoint._traced_endpoint = True
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        path = self.path
+
+        async def traced_handler(request):
+            with span("route", path=path):
+                return await handler(request)
+        return traced_handler
+
+
+class TraceExporter:
+    def __init__(self, path: str = TRACE_EXPORT_PATH, collector_url: str = TRACE_COLLECTOR_URL,
+                 queue_size: int = TRACE_EXPORT_QUEUE_SIZE):
+        self.path = path
+        self.collector_url = collector_url
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path or self.collector_url)
+
+    def export(self, trace: Trace) -> None:
+        if not self.enabled:
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(trace.to_dict())
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 100:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                logger.error(f"Could not export {len(batch)} traces: {str(e)}")
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                for trace in batch:
+                    f.write(json.dumps(trace, default=str) + "\n")
+        if self.collector_url:
+            import requests
+            requests.post(self.collector_url, json={"traces": batch}, timeout=5)
+
+    def flush(self, timeout: float = 5) -> None:
+        """Wait briefly for queued traces to be written (used at shutdown)."""
+        deadline = time.monotonic() + timeout
+        while not self._queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+
+exporter = TraceExporter()
+
+
+async def tracing_middleware(request, call_next):
+    if not TRACING_ENABLED:
+        return await call_next(request)
+    debug = request.headers.get(DEBUG_TIMING_HEADER, "").lower() in ("1", "true", "yes")
+    # Continue the caller's trace id when it sent a sane one
+    trace_id = request.headers.get(TRACE_HEADER)
+    trace_id = trace_id if trace_id and TRACE_ID_RE.match(trace_id) else None
+    with start_trace(f"{request.method} {request.url.path}", trace_id, force=debug) as trace:
+        trace.attributes.update({"method": request.method, "path": request.url.path, "query": str(request.url.query)})
+        response = await call_next(request)
+        trace.attributes["status"] = response.status_code
+    response.headers[TRACE_HEADER] = trace.trace_id
+    if debug:
+        response.headers[DEBUG_TIMING_HEADER] = trace.summary()
+    return response
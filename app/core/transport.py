@@ -0,0 +1,332 @@
+"""
+Interchangeable HTTP transports for upstream calls.
+
+Every backend takes the same request and returns a TransportResponse, so an adapter can switch
+stacks through config: requests and cloudscraper (thread-local sessions), the curl CLI (one
+process per request) and pycurl's CurlMulti, which drives a whole batch of transfers from the
+calling thread. request_many sends a batch; backends without a multi interface fan it out over
+a small thread pool instead.
+"""
+import abc
+import json
+import logging
+import threading
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlencode
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_MAX_IN_FLIGHT = 16
+
+
+class TransportError(Exception):
+    """The request got no HTTP response (connection failure, timeout, curl error)."""
+
+
+class TransportRequest:
+    __slots__ = ("method", "url", "headers", "params", "data", "timeout")
+
+    def __init__(self, method: str, url: str, headers: Dict[str, str] = None, params: Dict[str, Any] = None,
+                 data: Union[str, bytes, None] = None, timeout: float = DEFAULT_TIMEOUT):
+        self.method = method.upper()
+        self.url = url
+        self.headers = headers or {}
+        self.params = params
+        self.data = data.encode("utf-8") if isinstance(data, str) else data
+        self.timeout = timeout
+
+    def full_url(self) -> str:
+        if not self.params:
+            return self.url
+        return self.url + ("&" if "?" in self.url else "?") + urlencode(self.params)
+
+
+class TransportResponse:
+    def __init__(self, status_code: int, headers: List[Tuple[str, str]], content: bytes, url: str):
+        self.status_code = status_code
+        # (name, value) pairs in the order received; names are lower-cased
+        self.header_list = headers
+        self.headers = {name: value for name, value in headers}
+        self.content = content
+        self.url = url
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    @property
+    def cookies(self) -> Dict[str, str]:
+        jar = SimpleCookie()
+        for name, value in self.header_list:
+            if name == "set-cookie":
+                try:
+                    jar.load(value)
+                except Exception:
+                    continue
+        return {key: morsel.value for key, morsel in jar.items()}
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+def _parse_header_lines(lines: Sequence[str]) -> Tuple[int, List[Tuple[str, str]]]:
+    """Status and headers of the final response in raw header lines, skipping 1xx interim responses."""
+    status, headers = 0, []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line.startswith("HTTP/"):
+            parts = line.split(" ", 2)
+            status, headers = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0, []
+        elif ":" in line:
+            name, value = line.split(":", 1)
+            headers.append((name.strip().lower(), value.strip()))
+    return status, headers
+
+
+def _is_connect_reply(status_line: str, status: int) -> bool:
+    """A proxy's reply to CONNECT, which curl reports ahead of the tunnelled response."""
+    return 200 <= status < 300 and "connection established" in status_line.lower()
+
+
+class Transport(abc.ABC):
+    name = "base"
+
+    @abc.abstractmethod
+    def send(self, request: TransportRequest) -> TransportResponse:
+        pass
+
+    def request(self, method: str, url: str, headers: Dict[str, str] = None, params: Dict[str, Any] = None,
+                data: Union[str, bytes, None] = None, timeout: float = DEFAULT_TIMEOUT) -> TransportResponse:
+        return self.send(TransportRequest(method, url, headers, params, data, timeout))
+
+    def request_many(self, requests: Sequence[TransportRequest],
+                     max_in_flight: int = DEFAULT_MAX_IN_FLIGHT) -> List[Union[TransportResponse, TransportError]]:
+        """Send a batch; results are in request order, with a TransportError in place of failed requests."""
+        def send(request: TransportRequest) -> Union[TransportResponse, TransportError]:
+            try:
+                return self.send(request)
+            except TransportError as e:
+                return e
+
+        if len(requests) <= 1:
+            return [send(request) for request in requests]
+        with ThreadPoolExecutor(max_workers=min(max_in_flight, len(requests)), thread_name_prefix=f"{self.name}-batch") as pool:
+            return list(pool.map(send, requests))
+
+    def close(self) -> None:
+        pass
+
+
+class RequestsTransport(Transport):
+    """requests with one pooled session per thread; cookies are not carried between requests."""
+
+    name = "requests"
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _new_session(self):
+        import requests
+        return requests.Session()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._new_session()
+        return session
+
+    def send(self, request: TransportRequest) -> TransportResponse:
+        import requests
+        session = self._session()
+        try:
+            response = session.request(request.method, request.url, headers=request.headers, params=request.params,
+                                        data=request.data, timeout=request.timeout)
+        except requests.exceptions.RequestException as e:
+            raise TransportError(str(e)) from e
+        finally:
+            session.cookies.clear()
+        # urllib3 keeps repeated headers (Set-Cookie) apart; response.headers joins them
+        raw_headers = getattr(response.raw, "headers", None)
+        items = raw_headers.iteritems() if hasattr(raw_headers, "iteritems") else response.headers.items()
+        headers = [(name.lower(), value) for name, value in items]
+        return TransportResponse(response.status_code, headers, response.content, response.url)
+
+
+class CloudscraperTransport(RequestsTransport):
+    """cloudscraper sessions, which answer Cloudflare's JavaScript challenges."""
+
+    name = "cloudscraper"
+
+    def _new_session(self):
+        import cloudscraper
+        return cloudscraper.create_scraper()
+
+
+class CurlCliTransport(Transport):
+    """One curl process per request: the most browser-like TLS fingerprint of the backends, and the slowest."""
+
+    name = "curl"
+
+    def __init__(self, binary: str = "curl"):
+        self.binary = binary
+
+    def send(self, request: TransportRequest) -> TransportResponse:
+        url = request.full_url()
+        command = [self.binary, "-sS", "--compressed", "-D", "-", "-X", request.method, url,
+                   "--max-time", str(request.timeout)]
+        for name, value in request.headers.items():
+            command += ["-H", f"{name}: {value}"]
+        if request.data is not None:
+            # The body goes through stdin, so it is not limited by the argument list size
+            command += ["--data-binary", "@-"]
+        process = subprocess.run(command, input=request.data, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if process.returncode != 0:
+            raise TransportError(f"curl exited with {process.returncode}: {process.stderr.decode('utf-8', errors='replace').strip()}")
+
+        # -D - writes every header block ahead of the body: 1xx interim responses and, through a
+        # proxy, the "200 Connection established" reply to CONNECT
+        output, status, headers = process.stdout, 0, []
+        while output.startswith(b"HTTP/"):
+            head, _, output = output.partition(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            status, headers = _parse_header_lines(lines)
+            if status >= 200 and not _is_connect_reply(lines[0], status):
+                break
+        return TransportResponse(status, headers, output, url)
+
+
+class CurlMultiTransport(Transport):
+    """
+    pycurl CurlMulti: a batch runs as concurrent transfers on the calling thread, reusing easy
+    handles and the multi handle's connection cache between batches (both kept per thread).
+    """
+
+    name = "curl_multi"
+
+    def __init__(self, max_in_flight: int = 64):
+        import pycurl  # noqa: F401 - fail on selection rather than on first request
+        self.max_in_flight = max_in_flight
+        self._local = threading.local()
+
+    def _state(self):
+        import pycurl
+        state = getattr(self._local, "state", None)
+        if state is None:
+            multi = pycurl.CurlMulti()
+            multi.setopt(pycurl.M_MAX_HOST_CONNECTIONS, self.max_in_flight)
+            state = self._local.state = (multi, [])
+        return state
+
+    @staticmethod
+    def _prepare(handle, request: TransportRequest, body: List[bytes], header_lines: List[str]) -> None:
+        import pycurl
+        handle.setopt(pycurl.URL, request.full_url())
+        handle.setopt(pycurl.NOSIGNAL, 1)
+        handle.setopt(pycurl.TIMEOUT_MS, int(request.timeout * 1000))
+        handle.setopt(pycurl.ACCEPT_ENCODING, "")  # every encoding libcurl can decode, like --compressed
+        handle.setopt(pycurl.HTTPHEADER, [f"{name}: {value}" for name, value in request.headers.items()])
+        handle.setopt(pycurl.WRITEFUNCTION, body.append)
+        handle.setopt(pycurl.HEADERFUNCTION, lambda line: header_lines.append(line.decode("latin-1")))
+        if request.data is not None:
+            handle.setopt(pycurl.POSTFIELDS, request.data)
+        if request.method not in ("GET", "POST") or (request.method == "POST" and request.data is None):
+            handle.setopt(pycurl.CUSTOMREQUEST, request.method)
+
+    def send(self, request: TransportRequest) -> TransportResponse:
+        result = self.request_many([request])[0]
+        if isinstance(result, TransportError):
+            raise result
+        return result
+
+    def request_many(self, requests: Sequence[TransportRequest],
+                     max_in_flight: int = None) -> List[Union[TransportResponse, TransportError]]:
+        import pycurl
+        multi, free_handles = self._state()
+        limit = max_in_flight or self.max_in_flight
+        results: List[Optional[Union[TransportResponse, TransportError]]] = [None] * len(requests)
+        pending = deque(enumerate(requests))
+        active: Dict[Any, Tuple[int, List[bytes], List[str]]] = {}
+
+        def release(handle) -> Tuple[int, List[bytes], List[str]]:
+            multi.remove_handle(handle)
+            entry = active.pop(handle)
+            handle.reset()
+            free_handles.append(handle)
+            return entry
+
+        try:
+            while pending or active:
+                while pending and len(active) < limit:
+                    index, request = pending.popleft()
+                    handle = free_handles.pop() if free_handles else pycurl.Curl()
+                    body: List[bytes] = []
+                    header_lines: List[str] = []
+                    self._prepare(handle, request, body, header_lines)
+                    active[handle] = (index, body, header_lines)
+                    multi.add_handle(handle)
+
+                while multi.perform()[0] == pycurl.E_CALL_MULTI_PERFORM:
+                    pass
+
+                while True:
+                    queued, succeeded, failed = multi.info_read()
+                    for handle in succeeded:
+                        url = handle.getinfo(pycurl.EFFECTIVE_URL)
+                        index, body, header_lines = release(handle)
+                        status, headers = _parse_header_lines(header_lines)
+                        results[index] = TransportResponse(status, headers, b"".join(body), url)
+                    for handle, errno, message in failed:
+                        index, _, _ = release(handle)
+                        results[index] = TransportError(f"curl error {errno}: {message}")
+                    if not queued:
+                        break
+
+                if active:
+                    multi.select(0.5)
+        finally:
+            # Leave the per-thread multi handle clean if a callback raised mid-batch
+            for handle in list(active):
+                release(handle)
+        return results
+
+    def close(self) -> None:
+        state = getattr(self._local, "state", None)
+        if state is not None:
+            multi, free_handles = state
+            for handle in free_handles:
+                handle.close()
+            multi.close()
+            self._local.state = None
+
+
+TRANSPORTS = {
+    "requests": RequestsTransport,
+    "cloudscraper": CloudscraperTransport,
+    "curl": CurlCliTransport,
+    "curl_multi": CurlMultiTransport,
+}
+
+_instances: Dict[str, Transport] = {}
+_instances_lock = threading.Lock()
+
+
+def get_transport(name: str) -> Transport:
+    """Shared instance of a backend by name (requests, cloudscraper, curl or curl_multi)."""
+    transport = _instances.get(name)
+    if transport is None:
+        if name not in TRANSPORTS:
+            raise ValueError(f"Unknown transport '{name}', expected one of {', '.join(TRANSPORTS)}")
+        with _instances_lock:
+            transport = _instances.get(name)
+            if transport is None:
+                transport = _instances[name] = TRANSPORTS[name]()
+    return transport
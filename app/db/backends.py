@@ -0,0 +1,395 @@
+import io
+import os
+import abc
+import csv
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+from sqlalchemy import ARRAY, JSON, Boolean, DateTime, Float, Integer
+
+from .models import Base
+from ..core.config import (
+    STORAGE_BACKEND,
+    DATABASE_URL,
+    DATABASE_POOL_MIN,
+    DATABASE_POOL_MAX,
+    STORAGE_PATH,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class StorageBackend(abc.ABC):
+    """
+    Common contract for product storage.
+
+    write_rows inserts rows, or upserts them when conflict_columns names a unique key.
+    select supports the equality / IN / range filters the API needs and returns plain dicts;
+    order_by takes one column or several (for keyset pagination with a tie-breaker).
+    """
+
+    name = "base"
+
+    @abc.abstractmethod
+    def write_rows(self, table: str, rows: List[Dict[str, Any]], conflict_columns: Sequence[str] = None) -> bool:
+        ...
+
+    @abc.abstractmethod
+    def select(
+        self,
+        table: str,
+        columns: Sequence[str] = None,
+        eq: Dict[str, Any] = None,
+        in_: Dict[str, Iterable[Any]] = None,
+        gte: Dict[str, Any] = None,
+        lte: Dict[str, Any] = None,
+        order_by: Union[str, Sequence[str]] = None,
+        descending: bool = False,
+        limit: int = None,
+        gt: Dict[str, Any] = None,
+    ) -> List[Dict[str, Any]]:
+        ...
+
+    def ensure_partition(self, table: str, day: str) -> None:
+        """Create the day partition of a partitioned table, where the backend supports it."""
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class SupabaseBackend(StorageBackend):
+    name = "supabase"
+
+    def __init__(self, client):
+        self.client = client
+
+    def write_rows(self, table, rows, conflict_columns=None):
+        query = self.client.table(table)
+        if conflict_columns:
+            result = query.upsert(rows, on_conflict=",".join(conflict_columns)).execute()
+        else:
+            result = query.insert(rows).execute()
+        if hasattr(result, 'error') and result.error:
+            logger.error(f"Error saving rows to {table}: {result.error}")
+            return False
+        return True
+
+    def select(self, table, columns=None, eq=None, in_=None, gte=None, lte=None, order_by=None, descending=False, limit=None, gt=None):
+        query = self.client.table(table).select(",".join(columns) if columns else "*")
+        for column, value in (eq or {}).items():
+            query = query.eq(column, value)
+        for column, values in (in_ or {}).items():
+            query = query.in_(column, list(values))
+        for column, value in (gte or {}).items():
+            query = query.gte(column, value)
+        for column, value in (lte or {}).items():
+            query = query.lte(column, value)
+        for column, value in (gt or {}).items():
+            query = query.gt(column, value)
+        for column in _order_columns(order_by):
+            query = query.order(column, desc=descending)
+        if limit:
+            query = query.limit(limit)
+        return query.execute().data or []
+
+    def ensure_partition(self, table, day):
+        self.client.rpc(f"create_{table}_partition", {"day": day}).execute()
+
+
+def _order_columns(order_by: Union[str, Sequence[str], None]) -> List[str]:
+    if not order_by:
+        return []
+    return [order_by] if isinstance(order_by, str) else list(order_by)
+
+
+def _where_clause(eq, in_, gte, lte, placeholder: str, gt=None):
+    clauses, params = [], []
+    for column, value in (eq or {}).items():
+        clauses.append(f'"{column}" = {placeholder}')
+        params.append(value)
+    for column, values in (in_ or {}).items():
+        values = list(values)
+        if not values:
+            clauses.append("1 = 0")
+            continue
+        clauses.append(f'"{column}" IN ({", ".join([placeholder] * len(values))})')
+        params.extend(values)
+    for column, value in (gte or {}).items():
+        clauses.append(f'"{column}" >= {placeholder}')
+        params.append(value)
+    for column, value in (lte or {}).items():
+        clauses.append(f'"{column}" <= {placeholder}')
+        params.append(value)
+    for column, value in (gt or {}).items():
+        clauses.append(f'"{column}" > {placeholder}')
+        params.append(value)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _select_sql(table, columns, eq, in_, gte, lte, order_by, descending, limit, placeholder, gt=None):
+    column_sql = ", ".join(f'"{c}"' for c in columns) if columns else "*"
+    where, params = _where_clause(eq, in_, gte, lte, placeholder, gt)
+    sql = f'SELECT {column_sql} FROM "{table}"{where}'
+    if order_by:
+        direction = "DESC" if descending else "ASC"
+        sql += " ORDER BY " + ", ".join(f'"{column}" {direction}' for column in _order_columns(order_by))
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return sql, params
+
+
+class PostgresBackend(StorageBackend):
+    """Direct connection pool; rows are bulk loaded with COPY into a temp table, then merged."""
+
+    name = "postgres"
+
+    def __init__(self, dsn: str, min_connections: int = DATABASE_POOL_MIN, max_connections: int = DATABASE_POOL_MAX):
+        try:
+            from psycopg2.pool import ThreadedConnectionPool
+            from psycopg2.extras import RealDictCursor
+        except ImportError:
+            raise RuntimeError("The postgres storage backend requires the 'psycopg2' package")
+        if not dsn:
+            raise RuntimeError("DATABASE_URL must be set for the postgres storage backend")
+        self._dict_cursor = RealDictCursor
+        self.pool = ThreadedConnectionPool(min_connections, max_connections, dsn)
+
+    @staticmethod
+    def _copy_value(value: Any) -> Any:
+        if value is None:
+            return r"\N"
+        if isinstance(value, bool):
+            return "t" if value else "f"
+        if isinstance(value, (list, tuple)):
+            escaped = [str(v).replace("\\", "\\\\").replace('"', '\\"') for v in value]
+            return "{" + ",".join(f'"{v}"' for v in escaped) + "}"
+        if isinstance(value, dict):
+            return json.dumps(value)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+    def write_rows(self, table, rows, conflict_columns=None):
+        if not rows:
+            return True
+        columns = list(dict.fromkeys(column for row in rows for column in row))
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([self._copy_value(row.get(column)) for column in columns])
+        buffer.seek(0)
+
+        column_sql = ", ".join(f'"{c}"' for c in columns)
+        merge_sql = f'INSERT INTO "{table}" ({column_sql}) SELECT {column_sql} FROM _stage'
+        if conflict_columns:
+            updates = [c for c in columns if c not in conflict_columns]
+            conflict_sql = ", ".join(f'"{c}"' for c in conflict_columns)
+            if updates:
+                merge_sql += f" ON CONFLICT ({conflict_sql}) DO UPDATE SET " + ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in updates)
+            else:
+                merge_sql += f" ON CONFLICT ({conflict_sql}) DO NOTHING"
+
+        connection = self.pool.getconn()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'CREATE TEMP TABLE _stage (LIKE "{table}" INCLUDING DEFAULTS) ON COMMIT DROP')
+                cursor.copy_expert(f"COPY _stage ({column_sql}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+                cursor.execute(merge_sql)
+            connection.commit()
+            return True
+        except Exception as e:
+            connection.rollback()
+            logger.error(f"COPY into {table} failed: {str(e)}")
+            return False
+        finally:
+            self.pool.putconn(connection)
+
+    def select(self, table, columns=None, eq=None, in_=None, gte=None, lte=None, order_by=None, descending=False, limit=None, gt=None):
+        sql, params = _select_sql(table, columns, eq, in_, gte, lte, order_by, descending, limit, "%s", gt)
+        connection = self.pool.getconn()
+        try:
+            with connection.cursor(cursor_factory=self._dict_cursor) as cursor:
+                cursor.execute(sql, params)
+                return [dict(row) for row in cursor.fetchall()]
+        finally:
+            connection.rollback()
+            self.pool.putconn(connection)
+
+    def ensure_partition(self, table, day):
+        connection = self.pool.getconn()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT create_{table}_partition(%s)", (day,))
+            connection.commit()
+        finally:
+            self.pool.putconn(connection)
+
+    def close(self):
+        self.pool.closeall()
+
+
+class _FileBackend(StorageBackend):
+    """Shared logic for the embedded SQLite and DuckDB files; tables are created from the SQLAlchemy models."""
+
+    placeholder = "?"
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._created = set()
+        self.connection = self._connect(path)
+
+    @abc.abstractmethod
+    def _connect(self, path: str):
+        ...
+
+    @staticmethod
+    def _column_type(column) -> str:
+        if isinstance(column.type, Boolean):
+            return "BOOLEAN"
+        if isinstance(column.type, Integer):
+            return "INTEGER"
+        if isinstance(column.type, Float):
+            return "DOUBLE"
+        return "TEXT"
+
+    def _json_columns(self, table: str) -> set:
+        model_table = Base.metadata.tables.get(table)
+        if model_table is None:
+            return set()
+        return {c.name for c in model_table.columns if isinstance(c.type, (ARRAY, JSON))}
+
+    def _ensure_table(self, table: str) -> None:
+        if table in self._created:
+            return
+        model_table = Base.metadata.tables.get(table)
+        if model_table is None:
+            raise RuntimeError(f"No model is defined for table '{table}'")
+        columns = [f'"{c.name}" {self._column_type(c)}' for c in model_table.columns]
+        primary = [c.name for c in model_table.primary_key.columns]
+        if primary:
+            columns.append("PRIMARY KEY (" + ", ".join(f'"{c}"' for c in primary) + ")")
+        for constraint in model_table.constraints:
+            names = [c.name for c in getattr(constraint, "columns", [])]
+            if constraint.__class__.__name__ == "UniqueConstraint" and names:
+                columns.append("UNIQUE (" + ", ".join(f'"{c}"' for c in names) + ")")
+        self.connection.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({", ".join(columns)})')
+        for index in model_table.indexes:
+            index_columns = ", ".join(f'"{c.name}"' for c in index.columns)
+            self.connection.execute(f'CREATE INDEX IF NOT EXISTS "{index.name}" ON "{table}" ({index_columns})')
+        self._created.add(table)
+
+    @staticmethod
+    def _to_db(value: Any) -> Any:
+        if isinstance(value, (list, tuple, dict)):
+            return json.dumps(value)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+    def write_rows(self, table, rows, conflict_columns=None):
+        if not rows:
+            return True
+        columns = list(dict.fromkeys(column for row in rows for column in row))
+        column_sql = ", ".join(f'"{c}"' for c in columns)
+        sql = f'INSERT INTO "{table}" ({column_sql}) VALUES ({", ".join([self.placeholder] * len(columns))})'
+        if conflict_columns:
+            updates = [c for c in columns if c not in conflict_columns]
+            conflict_sql = ", ".join(f'"{c}"' for c in conflict_columns)
+            if updates:
+                sql += f" ON CONFLICT ({conflict_sql}) DO UPDATE SET " + ", ".join(f'"{c}" = excluded."{c}"' for c in updates)
+            else:
+                sql += f" ON CONFLICT ({conflict_sql}) DO NOTHING"
+        values = [tuple(self._to_db(row.get(column)) for column in columns) for row in rows]
+        with self._lock:
+            try:
+                self._ensure_table(table)
+                self.connection.executemany(sql, values)
+                self.connection.commit()
+                return True
+            except Exception as e:
+                self.connection.rollback()
+                logger.error(f"Writing {len(rows)} rows to {self.name} table {table} failed: {str(e)}")
+                return False
+
+    def select(self, table, columns=None, eq=None, in_=None, gte=None, lte=None, order_by=None, descending=False, limit=None, gt=None):
+        sql, params = _select_sql(table, columns, eq, in_, gte, lte, order_by, descending, limit, self.placeholder, gt)
+        json_columns = self._json_columns(table)
+        with self._lock:
+            self._ensure_table(table)
+            cursor = self.connection.execute(sql, params)
+            names = [d[0] for d in cursor.description]
+            records = cursor.fetchall()
+        rows = []
+        for record in records:
+            row = dict(zip(names, record))
+            for column in json_columns & row.keys():
+                if isinstance(row[column], str):
+                    try:
+                        row[column] = json.loads(row[column])
+                    except ValueError:
+                        pass
+            rows.append(row)
+        return rows
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+
+class SQLiteBackend(_FileBackend):
+    name = "sqlite"
+
+    def _connect(self, path):
+        import sqlite3
+        connection = sqlite3.connect(path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+
+class DuckDBBackend(_FileBackend):
+    name = "duckdb"
+
+    def _connect(self, path):
+        try:
+            import duckdb
+        except ImportError:
+            raise RuntimeError("The duckdb storage backend requires the 'duckdb' package")
+        return duckdb.connect(path)
+
+
+_backend: Optional[StorageBackend] = None
+_backend_lock = threading.Lock()
+
+
+def create_storage_backend(kind: str = STORAGE_BACKEND) -> Optional[StorageBackend]:
+    if kind == "postgres":
+        return PostgresBackend(DATABASE_URL)
+    if kind == "sqlite":
+        return SQLiteBackend(STORAGE_PATH)
+    if kind == "duckdb":
+        return DuckDBBackend(os.path.splitext(STORAGE_PATH)[0] + ".duckdb")
+    if kind == "supabase":
+        from .client import supabase
+        return SupabaseBackend(supabase) if supabase else None
+    raise RuntimeError(f"Unknown STORAGE_BACKEND '{kind}'")
+
+
+def get_storage_backend() -> Optional[StorageBackend]:
+    """Return the configured backend, created on first use; None when it is unavailable."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                try:
+                    _backend = create_storage_backend()
+                except Exception as e:
+                    logger.error(f"Could not initialise the {STORAGE_BACKEND} storage backend: {str(e)}")
+                    return None
+    return _backend
@@ -54,6 +54,13 @@ CREATE INDEX IF NOT EXISTS idx_products_product_id ON products(product_id);
 CREATE INDEX IF NOT EXISTS idx_products_store_id ON products(store_id);
 CREATE INDEX IF NOT EXISTS idx_products_variant_id ON products(variant_id);
 
+-- Natural key for idempotent upserts: one row per variant, store and snapshot bucket
+ALTER TABLE products ADD COLUMN IF NOT EXISTS snapshot_bucket TIMESTAMP WITH TIME ZONE;
+ALTER TABLE products ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_products_snapshot
+    ON products(platform, store_id, variant_id, snapshot_bucket);
+
 -- Function to update the updated_at timestamp
 CREATE OR REPLACE FUNCTION trigger_set_timestamp()
 RETURNS TRIGGER AS $$
@@ -68,3 +75,126 @@ CREATE TRIGGER set_timestamp
 BEFORE UPDATE ON products
 FOR EACH ROW
 EXECUTE FUNCTION trigger_set_timestamp();
+
+-- Price/stock history, partitioned by day on scraped_at
+CREATE TABLE IF NOT EXISTS product_snapshots (
+    platform TEXT NOT NULL,
+    store_id TEXT NOT NULL,
+    variant_id TEXT NOT NULL,
+    scraped_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    price DECIMAL,
+    mrp DECIMAL,
+    in_stock BOOLEAN,
+    inventory INTEGER,
+    organic_rank INTEGER,
+    PRIMARY KEY (platform, store_id, variant_id, scraped_at)
+) PARTITION BY RANGE (scraped_at);
+
+CREATE INDEX IF NOT EXISTS idx_snapshots_variant_store_time
+    ON product_snapshots(platform, variant_id, store_id, scraped_at);
+
+-- Catches rows for days whose partition has not been created yet
+CREATE TABLE IF NOT EXISTS product_snapshots_default PARTITION OF product_snapshots DEFAULT;
+
+-- Creates the partition for one day; called by the writer before the first write of each day and
+-- for the following day ahead of time. Rows that already landed in the default partition for that
+-- day are moved into the new partition before it is attached, since Postgres refuses to attach a
+-- range the default partition holds rows for.
+CREATE OR REPLACE FUNCTION create_product_snapshots_partition(day DATE)
+RETURNS VOID AS $$
+DECLARE
+  partition_name TEXT := 'product_snapshots_' || to_char(day, 'YYYYMMDD');
+BEGIN
+  -- Serialises concurrent writers creating the same day
+  PERFORM pg_advisory_xact_lock(hashtext(partition_name));
+  IF to_regclass(partition_name) IS NOT NULL THEN
+    RETURN;
+  END IF;
+  EXECUTE format(
+    'CREATE TABLE %I (LIKE product_snapshots INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+    partition_name
+  );
+  EXECUTE format(
+    'WITH moved AS (DELETE FROM product_snapshots_default WHERE scraped_at >= %L AND scraped_at < %L RETURNING *) '
+    'INSERT INTO %I SELECT * FROM moved',
+    day, day + 1, partition_name
+  );
+  EXECUTE format(
+    'ALTER TABLE product_snapshots ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+    partition_name, day, day + 1
+  );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Change log written by the diff stage between consecutive scrapes
+CREATE TABLE IF NOT EXISTS product_changes (
+    id TEXT PRIMARY KEY,
+    detected_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    change_type TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    store_id TEXT,
+    variant_id TEXT,
+    product_id TEXT,
+    search_query TEXT,
+    location TEXT,
+    name TEXT,
+    brand TEXT,
+    category TEXT,
+    old_price DECIMAL,
+    new_price DECIMAL,
+    old_in_stock BOOLEAN,
+    new_in_stock BOOLEAN,
+    old_rank INTEGER,
+    new_rank INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS idx_changes_platform_store_time ON product_changes(platform, store_id, detected_at);
+CREATE INDEX IF NOT EXISTS idx_changes_detected_at ON product_changes(detected_at);
+
+
+-- Cross-platform canonical product id assigned by the matching stage
+ALTER TABLE products ADD COLUMN IF NOT EXISTS canonical_id TEXT;
+CREATE INDEX IF NOT EXISTS idx_products_canonical_id ON products(canonical_id);
+
+-- Parsed pack size and price per kg / litre / piece
+ALTER TABLE products ADD COLUMN IF NOT EXISTS quantity_value DECIMAL;
+ALTER TABLE products ADD COLUMN IF NOT EXISTS quantity_unit TEXT;
+ALTER TABLE products ADD COLUMN IF NOT EXISTS unit_price DECIMAL;
+
+-- Normalized layout: static attributes once per variant version, volatile fields stay in product_snapshots
+CREATE TABLE IF NOT EXISTS product_dim (
+    platform TEXT NOT NULL,
+    variant_id TEXT NOT NULL,
+    product_id TEXT,
+    name TEXT,
+    brand TEXT,
+    quantity TEXT,
+    quantity_value DECIMAL,
+    quantity_unit TEXT,
+    category TEXT,
+    sub_category TEXT,
+    images TEXT[],
+    rating DECIMAL,
+    canonical_id TEXT,
+    attr_hash TEXT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (platform, variant_id, attr_hash)
+);
+
+-- A version per attr_hash: stores list one variant with different names or images at the same time,
+-- and each snapshot references the version it was scraped with
+DELETE FROM product_dim WHERE attr_hash IS NULL;
+ALTER TABLE product_dim ALTER COLUMN attr_hash SET NOT NULL;
+ALTER TABLE product_dim DROP CONSTRAINT IF EXISTS product_dim_pkey;
+ALTER TABLE product_dim ADD PRIMARY KEY (platform, variant_id, attr_hash);
+ALTER TABLE product_snapshots ADD COLUMN IF NOT EXISTS attr_hash TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_product_dim_canonical_id ON product_dim(canonical_id);
+
+CREATE TABLE IF NOT EXISTS image_prefixes (
+    id TEXT PRIMARY KEY,
+    prefix TEXT NOT NULL
+);
+
+-- Set on the first scrape that lists a variant in a store
+ALTER TABLE products ADD COLUMN IF NOT EXISTS new_listing BOOLEAN DEFAULT FALSE;
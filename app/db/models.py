@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, JSON, ARRAY
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, JSON, ARRAY, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime, timezone
 
@@ -7,8 +7,11 @@ Base = declarative_base()
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        UniqueConstraint("platform", "store_id", "variant_id", "snapshot_bucket", name="uq_products_snapshot"),
+    )
     
-    id = Column(String, primary_key=True, nullable=False, default=str(uuid.uuid4()))
+    id = Column(String, primary_key=True, nullable=False, default=lambda: str(uuid.uuid4()))
     platform = Column(String, nullable=False)  # 'zepto', 'blinkit', 'instamart'
     search_query = Column(String)
     
@@ -29,6 +32,9 @@ class Product(Base):
     
     # Quantity and inventory
     quantity = Column(String)
+    quantity_value = Column(Float)  # normalized to kg, l or pc
+    quantity_unit = Column(String)
+    unit_price = Column(Float)  # price per kg / litre / piece
     in_stock = Column(Boolean, default=False)
     inventory = Column(Integer)
     max_allowed_quantity = Column(Integer)
@@ -49,9 +55,99 @@ class Product(Base):
 
     # Platform-specific details
     platform_specific_details = Column(JSON)
+
+    # Snapshot key and hash of the volatile fields (price/stock/rank)
+    snapshot_bucket = Column(DateTime(timezone=True))
+    content_hash = Column(String)
+
+    # Shared id for the same SKU across platforms, assigned by app.core.matching
+    canonical_id = Column(String, index=True)
+
+    # First time this variant was seen in the store, set by app.core.membership
+    new_listing = Column(Boolean, default=False)
     
-    created_at = Column(DateTime, default=datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     
     def __repr__(self):
-        return f"<Product(variant_id={self.variant_id}, platform='{self.platform}', name='{self.name}')>"
\ No newline at end of file
+        return f"<Product(variant_id={self.variant_id}, platform='{self.platform}', name='{self.name}')>"
+
+class ProductSnapshot(Base):
+    """Narrow price/stock time series, one row per variant, store and snapshot bucket."""
+    __tablename__ = "product_snapshots"
+    __table_args__ = (
+        Index("idx_snapshots_variant_store_time", "platform", "variant_id", "store_id", "scraped_at"),
+    )
+
+    platform = Column(String, primary_key=True)
+    store_id = Column(String, primary_key=True)
+    variant_id = Column(String, primary_key=True)
+    scraped_at = Column(DateTime(timezone=True), primary_key=True)
+
+    price = Column(Float)
+    mrp = Column(Float)
+    in_stock = Column(Boolean)
+    inventory = Column(Integer)
+    organic_rank = Column(Integer)
+
+    attr_hash = Column(String)  # product_dim version, in the normalized layout
+
+class ProductDim(Base):
+    """Static product attributes, one row per platform variant and attribute version (attr_hash)."""
+    __tablename__ = "product_dim"
+
+    platform = Column(String, primary_key=True)
+    variant_id = Column(String, primary_key=True)
+    attr_hash = Column(String, primary_key=True)
+
+    product_id = Column(String)
+    name = Column(String)
+    brand = Column(String)
+    quantity = Column(String)
+    quantity_value = Column(Float)
+    quantity_unit = Column(String)
+    category = Column(String)
+    sub_category = Column(String)
+    images = Column(ARRAY(String))  # interned references, see app.utils.image_utils
+    rating = Column(Float)
+    canonical_id = Column(String, index=True)
+
+    updated_at = Column(DateTime(timezone=True))
+
+class ImagePrefix(Base):
+    """Interned image URL prefixes referenced as "@<id>/<file>" from product_dim.images."""
+    __tablename__ = "image_prefixes"
+
+    id = Column(String, primary_key=True)
+    prefix = Column(String, nullable=False)
+
+class ProductChange(Base):
+    """Change events emitted by the diff stage between consecutive scrapes."""
+    __tablename__ = "product_changes"
+    __table_args__ = (
+        Index("idx_changes_platform_store_time", "platform", "store_id", "detected_at"),
+        Index("idx_changes_detected_at", "detected_at"),
+    )
+
+    id = Column(String, primary_key=True, nullable=False, default=lambda: str(uuid.uuid4()))
+    detected_at = Column(DateTime(timezone=True), nullable=False)
+    change_type = Column(String, nullable=False)  # new_listing, delisted, price_up, price_down, stock_in, stock_out, rank_move
+
+    platform = Column(String, nullable=False)
+    store_id = Column(String)
+    variant_id = Column(String)
+    product_id = Column(String)
+    search_query = Column(String)
+    location = Column(String)
+
+    name = Column(String)
+    brand = Column(String)
+    category = Column(String)
+
+    old_price = Column(Float)
+    new_price = Column(Float)
+    old_in_stock = Column(Boolean)
+    new_in_stock = Column(Boolean)
+    old_rank = Column(Integer)
+    new_rank = Column(Integer)
+
@@ -1,56 +1,321 @@
+import time
 import logging
 import uuid
-from typing import List, Dict, Any, Type, Optional, Union
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Type, Optional, Union, Tuple
 from sqlalchemy.ext.declarative import DeclarativeMeta
-from datetime import datetime
-import json
+from datetime import date, datetime, timedelta, timezone
 
-from .client import supabase
+from .models import Product
+from .backends import get_storage_backend
+from ..core.config import SNAPSHOT_BUCKET_MINUTES, DB_SKIP_UNCHANGED, DB_HASH_CACHE_SIZE, SNAPSHOT_HISTORY_ENABLED, STORAGE_LAYOUT
+from ..core.metrics import DB_WRITE_SECONDS, DB_ROWS
+from ..core.tracing import span
+from ..utils.format_utils import dimension_row
+from ..core.logs import preview
 
-def save_products_to_db(products: List[Any], table_name: str, exclude_fields: List[str] = None) -> bool:
-    if not supabase:
-        logging.warning(f"Supabase client not initialized. Products will not be saved to {table_name}.")
+logger = logging.getLogger(__name__)
+
+PRODUCT_COLUMNS = set(Product.__table__.columns.keys())
+
+NATURAL_KEY = ("platform", "store_id", "variant_id", "snapshot_bucket")
+# Stored in place of a missing store_id: the unique index treats NULLs as distinct, so rows
+# without a store would never conflict there while sharing one primary key
+NO_STORE_ID = "-"
+HASH_FIELDS = ("price", "mrp", "in_stock", "inventory", "organic_rank")
+
+SNAPSHOT_TABLE = "product_snapshots"
+SNAPSHOT_KEY = ("platform", "store_id", "variant_id", "scraped_at")
+SNAPSHOT_FIELDS = ("price", "mrp", "in_stock", "inventory", "organic_rank")
+
+CHANGES_TABLE = "product_changes"
+
+DIM_TABLE = "product_dim"
+# One row per attribute version: stores can list a variant with different names or images at once
+DIM_KEY = ("platform", "variant_id", "attr_hash")
+IMAGE_PREFIX_TABLE = "image_prefixes"
+
+STORAGE_LAYOUTS = ("wide", "normalized", "both")
+
+# Tables holding full product rows (natural-key upsert, hashing, snapshots); others are written as-is
+PRODUCT_TABLES = {"products"}
+TABLE_CONFLICT_KEYS = {SNAPSHOT_TABLE: SNAPSHOT_KEY, CHANGES_TABLE: ("id",), DIM_TABLE: DIM_KEY, IMAGE_PREFIX_TABLE: ("id",)}
+
+_partitioned_days = set()
+
+# Last written content_hash per (platform, store_id, variant_id)
+_last_hashes: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+_last_hashes_lock = threading.Lock()
+
+# (platform, variant_id, attr_hash) versions and image prefixes already stored (both under _last_hashes_lock)
+_dim_versions: "OrderedDict[Tuple[str, str, str], None]" = OrderedDict()
+_saved_prefixes = set()
+
+def snapshot_bucket(moment: datetime = None, minutes: int = SNAPSHOT_BUCKET_MINUTES) -> str:
+    moment = moment or datetime.now(timezone.utc)
+    epoch_minutes = int(moment.timestamp() // 60)
+    bucket_start = epoch_minutes - epoch_minutes % max(1, minutes)
+    return datetime.fromtimestamp(bucket_start * 60, tz=timezone.utc).isoformat()
+
+def content_hash(row: Dict[str, Any]) -> str:
+    payload = "|".join(str(row.get(field)) for field in HASH_FIELDS)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=8).hexdigest()
+
+def natural_key_id(row: Dict[str, Any]) -> str:
+    """uuid5 of the natural key; rows must already carry the same key values the unique index sees."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, "|".join(str(row.get(field)) for field in NATURAL_KEY)))
+
+def product_to_row(product: Any, exclude_fields: List[str] = None, bucket: str = None) -> Dict[str, Any]:
+    exclude_fields = exclude_fields or []
+    product_dict = {}
+    for key, value in product.__dict__.items():
+        if not key.startswith('_') and key in PRODUCT_COLUMNS and key not in exclude_fields:
+            product_dict[key] = value
+
+    if product_dict.get('store_id') in (None, ''):
+        product_dict['store_id'] = NO_STORE_ID
+    product_dict['snapshot_bucket'] = bucket or snapshot_bucket()
+    product_dict['content_hash'] = content_hash(product_dict)
+    # Deterministic id so re-saving the same snapshot is idempotent
+    product_dict['id'] = natural_key_id(product_dict)
+
+    return product_dict
+
+def _variant_key(row: Dict[str, Any]) -> Tuple[str, str, str]:
+    return (str(row.get('platform') or ''), str(row.get('store_id') or ''), str(row.get('variant_id') or ''))
+
+def _remember_hashes(rows: List[Dict[str, Any]]) -> None:
+    with _last_hashes_lock:
+        for row in rows:
+            key = _variant_key(row)
+            _last_hashes[key] = row.get('content_hash')
+            _last_hashes.move_to_end(key)
+        while len(_last_hashes) > DB_HASH_CACHE_SIZE:
+            _last_hashes.popitem(last=False)
+
+def _load_last_hashes(backend, rows: List[Dict[str, Any]], table_name: str) -> None:
+    """Fill the hash cache for variants it has not seen, one query per (platform, store)."""
+    with _last_hashes_lock:
+        missing: Dict[Tuple[str, str], List[str]] = {}
+        for row in rows:
+            key = _variant_key(row)
+            if key not in _last_hashes:
+                missing.setdefault(key[:2], []).append(key[2])
+
+    for (platform, store_id), variant_ids in missing.items():
+        try:
+            stored_rows = backend.select(
+                table_name,
+                columns=["variant_id", "content_hash", "snapshot_bucket"],
+                eq={"platform": platform, "store_id": store_id},
+                in_={"variant_id": set(variant_ids)},
+                order_by="snapshot_bucket",
+                descending=True,
+            )
+        except Exception as e:
+            logger.warning(f"Could not load last hashes for {platform}/{store_id}: {str(e)}")
+            continue
+        latest = {}
+        for stored in stored_rows:
+            latest.setdefault(stored['variant_id'], stored.get('content_hash'))
+        _remember_hashes([
+            {'platform': platform, 'store_id': store_id, 'variant_id': variant_id, 'content_hash': stored_hash}
+            for variant_id, stored_hash in latest.items()
+        ])
+
+def filter_unchanged(backend, rows: List[Dict[str, Any]], table_name: str) -> List[Dict[str, Any]]:
+    """Drop rows whose price/stock/rank hash matches the last value stored for that variant."""
+    _load_last_hashes(backend, rows, table_name)
+    with _last_hashes_lock:
+        return [row for row in rows if _last_hashes.get(_variant_key(row)) != row.get('content_hash')]
+
+def dedupe_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # An upsert cannot touch the same key twice in one statement; the last scrape wins
+    unique = {}
+    for row in rows:
+        unique[tuple(row.get(field) for field in NATURAL_KEY)] = row
+    return list(unique.values())
+
+def _row_key(row: Dict[str, Any]) -> Tuple:
+    return tuple(row.get(field) for field in NATURAL_KEY)
+
+def snapshot_rows(rows: List[Dict[str, Any]], attr_hashes: Dict[Tuple, str] = None) -> List[Dict[str, Any]]:
+    snapshots = []
+    for row in rows:
+        snapshot = {
+            'platform': row.get('platform') or '',
+            'store_id': str(row.get('store_id') or ''),
+            'variant_id': str(row.get('variant_id') or ''),
+            'scraped_at': row.get('snapshot_bucket'),
+        }
+        for field in SNAPSHOT_FIELDS:
+            snapshot[field] = row.get(field)
+        if attr_hashes is not None:
+            # The product_dim version this row was scraped with
+            snapshot['attr_hash'] = attr_hashes.get(_row_key(row))
+        snapshots.append(snapshot)
+    return snapshots
+
+def save_snapshots(backend, rows: List[Dict[str, Any]], attr_hashes: Dict[Tuple, str] = None) -> bool:
+    snapshots = snapshot_rows(rows, attr_hashes)
+    days = {str(s['scraped_at'])[:10] for s in snapshots if s['scraped_at']}
+    # The next day too, so the first writes after midnight do not land in the default partition
+    days |= {(date.fromisoformat(day) + timedelta(days=1)).isoformat() for day in days}
+    for day in sorted(days - _partitioned_days):
+        try:
+            backend.ensure_partition(SNAPSHOT_TABLE, day)
+            _partitioned_days.add(day)
+        except Exception as e:
+            logger.warning(f"Could not create {SNAPSHOT_TABLE} partition for {day}: {str(e)}")
+    return backend.write_rows(SNAPSHOT_TABLE, snapshots, conflict_columns=SNAPSHOT_KEY)
+
+def dim_rows(rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, str], Dict[Tuple, str]]:
+    """
+    Static attribute versions with interned image URLs, the prefixes they reference, and the
+    attr_hash of each row keyed by its natural key.
+    """
+    dims = {}
+    prefixes: Dict[str, str] = {}
+    attr_hashes: Dict[Tuple, str] = {}
+    for row in rows:
+        dim, used = dimension_row(row)
+        prefixes.update(used)
+        dim['updated_at'] = row.get('snapshot_bucket')
+        dims[(dim['platform'], dim['variant_id'], dim['attr_hash'])] = dim
+        attr_hashes[_row_key(row)] = dim['attr_hash']
+    return list(dims.values()), prefixes, attr_hashes
+
+def _version_key(dim: Dict[str, Any]) -> Tuple[str, str, str]:
+    return (dim['platform'], dim['variant_id'], dim.get('attr_hash'))
+
+def _changed_dims(backend, dims: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Attribute versions not stored yet; a variant's known versions are loaded once per cache miss."""
+    with _last_hashes_lock:
+        missing: Dict[str, List[str]] = {}
+        for dim in dims:
+            if _version_key(dim) not in _dim_versions:
+                missing.setdefault(dim['platform'], []).append(dim['variant_id'])
+
+    for platform, variant_ids in missing.items():
+        try:
+            stored = backend.select(DIM_TABLE, columns=["variant_id", "attr_hash"], eq={"platform": platform}, in_={"variant_id": set(variant_ids)})
+        except Exception as e:
+            logger.warning(f"Could not load {DIM_TABLE} hashes for {platform}: {str(e)}")
+            continue
+        _remember_dims([{'platform': platform, **row} for row in stored])
+
+    with _last_hashes_lock:
+        return [dim for dim in dims if _version_key(dim) not in _dim_versions]
+
+def _remember_dims(dims: List[Dict[str, Any]]) -> None:
+    with _last_hashes_lock:
+        for dim in dims:
+            key = _version_key(dim)
+            _dim_versions[key] = None
+            _dim_versions.move_to_end(key)
+        while len(_dim_versions) > DB_HASH_CACHE_SIZE:
+            _dim_versions.popitem(last=False)
+
+def save_dimensions(backend, dims: List[Dict[str, Any]], prefixes: Dict[str, str]) -> bool:
+    """Insert the product_dim versions (and image prefixes) that are not stored yet."""
+    with _last_hashes_lock:
+        new_prefixes = [{'id': pid, 'prefix': prefix} for pid, prefix in prefixes.items() if pid not in _saved_prefixes]
+    if new_prefixes:
+        if not backend.write_rows(IMAGE_PREFIX_TABLE, new_prefixes, conflict_columns=("id",)):
+            return False
+        with _last_hashes_lock:
+            _saved_prefixes.update(p['id'] for p in new_prefixes)
+
+    changed = _changed_dims(backend, dims)
+    if not changed:
+        return True
+    logger.info(f"Writing {len(changed)} new of {len(dims)} product dimension versions to {DIM_TABLE}")
+    if not backend.write_rows(DIM_TABLE, changed, conflict_columns=DIM_KEY):
         return False
-    
-    if not products:
-        logging.warning(f"No products to save to {table_name}.")
+    _remember_dims(changed)
+    return True
+
+def _save_wide_rows(backend, rows: List[Dict[str, Any]], table_name: str, skip_unchanged: bool, attr_hashes: Dict[Tuple, str] = None) -> bool:
+    if skip_unchanged:
+        rows = filter_unchanged(backend, rows, table_name)
+        if not rows:
+            logger.info(f"All products unchanged, nothing to write to {table_name}")
+            return True
+
+    logger.info(f"Attempting to upsert {len(rows)} products to {backend.name} table '{table_name}'")
+    logger.debug("First product sample: %s", preview(rows[0], 200))
+
+    if not backend.write_rows(table_name, rows, conflict_columns=NATURAL_KEY):
+        logger.error(f"Error saving products to {table_name}")
+        return False
+
+    if SNAPSHOT_HISTORY_ENABLED and not save_snapshots(backend, rows, attr_hashes):
+        logger.error(f"Error saving snapshot history for {len(rows)} products")
+        return False
+
+    _remember_hashes(rows)
+    logger.info(f"Successfully saved {len(rows)} products to {table_name}")
+    return True
+
+def save_rows_to_db(product_dicts: List[Dict[str, Any]], table_name: str, skip_unchanged: bool = DB_SKIP_UNCHANGED) -> bool:
+    start = time.perf_counter()
+    with span("db.save", table=table_name, rows=len(product_dicts or [])):
+        saved = _save_rows_to_db(product_dicts, table_name, skip_unchanged)
+    DB_WRITE_SECONDS.observe(time.perf_counter() - start, table=table_name)
+    DB_ROWS.inc(len(product_dicts or []), table=table_name, outcome="saved" if saved else "failed")
+    return saved
+
+def _save_rows_to_db(product_dicts: List[Dict[str, Any]], table_name: str, skip_unchanged: bool) -> bool:
+    backend = get_storage_backend()
+    if not backend:
+        logger.warning(f"Storage backend not initialized. Products will not be saved to {table_name}.")
+        return False
+
+    if not product_dicts:
         return True
-    
-    exclude_fields = exclude_fields or []
-    
+
+    if table_name not in PRODUCT_TABLES:
+        try:
+            return backend.write_rows(table_name, product_dicts, conflict_columns=TABLE_CONFLICT_KEYS.get(table_name))
+        except Exception as e:
+            logger.error(f"Exception saving rows to {table_name}: {str(e)}")
+            return False
+
+    if STORAGE_LAYOUT not in STORAGE_LAYOUTS:
+        logger.error(f"Unknown STORAGE_LAYOUT '{STORAGE_LAYOUT}'; expected one of {STORAGE_LAYOUTS}")
+        return False
+
     try:
-        product_dicts = []
-        
-        for product in products:
-            product_dict = {}
-            for key, value in product.__dict__.items():
-                if not key.startswith('_') and key not in exclude_fields:
-                    if key == 'id' and (value is None or value == ''):
-                        product_dict[key] = str(uuid.uuid4())
-                    else:
-                        product_dict[key] = value
-            
-            # If id wasn't in the dict at all, add it
-            if 'id' not in product_dict:
-                product_dict['id'] = str(uuid.uuid4())
-            
-            product_dicts.append(product_dict)
-        
-        logging.info(f"Attempting to save {len(product_dicts)} products to Supabase table '{table_name}'")
-        logging.info(f"First product sample: {json.dumps(product_dicts[0], default=str)[:200]}...")
-        
-        result = supabase.table(table_name).insert(product_dicts).execute()
-        
-        if hasattr(result, 'error') and result.error:
-            logging.error(f"Error saving products to {table_name}: {result.error}")
+        rows = dedupe_rows(product_dicts)
+        dims, prefixes, attr_hashes = dim_rows(rows) if STORAGE_LAYOUT in ("normalized", "both") else ([], {}, None)
+        if STORAGE_LAYOUT in ("wide", "both") and not _save_wide_rows(backend, rows, table_name, skip_unchanged, attr_hashes):
             return False
-            
-        if hasattr(result, 'data'):
-            logging.info(f"Supabase response data: {json.dumps(result.data)[:200]}...")
-        
-        logging.info(f"Successfully saved {len(products)} products to {table_name}")
+
+        if STORAGE_LAYOUT in ("normalized", "both"):
+            if not save_dimensions(backend, dims, prefixes):
+                logger.error(f"Error saving {DIM_TABLE} rows")
+                return False
+            # The wide path already wrote the fact rows when history is enabled
+            if (STORAGE_LAYOUT == "normalized" or not SNAPSHOT_HISTORY_ENABLED) and not save_snapshots(backend, rows, attr_hashes):
+                logger.error(f"Error saving snapshot facts for {len(rows)} products")
+                return False
+            logger.info(f"Saved {len(rows)} product facts in the normalized layout")
         return True
     except Exception as e:
-        logging.error(f"Exception saving products to {table_name}: {str(e)}")
-        logging.exception("Detailed error:")
+        logger.error(f"Exception saving products to {table_name}: {str(e)}")
+        logger.exception("Detailed error:")
+        return False
+
+def save_products_to_db(products: List[Any], table_name: str, exclude_fields: List[str] = None, skip_unchanged: bool = DB_SKIP_UNCHANGED) -> bool:
+    if not get_storage_backend():
+        logger.warning(f"Storage backend not initialized. Products will not be saved to {table_name}.")
         return False
+
+    if not products:
+        logger.warning(f"No products to save to {table_name}.")
+        return True
+
+    bucket = snapshot_bucket()
+    return save_rows_to_db([product_to_row(product, exclude_fields, bucket) for product in products], table_name, skip_unchanged)
@@ -0,0 +1,234 @@
+import os
+import json
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from .utils import product_to_row, save_rows_to_db, snapshot_bucket
+from ..core.config import (
+    DB_WRITER_ENABLED,
+    DB_WRITER_QUEUE_SIZE,
+    DB_WRITER_BATCH_SIZE,
+    DB_WRITER_CONCURRENCY,
+    DB_WRITER_MAX_RETRIES,
+    DB_WRITER_RETRY_BACKOFF,
+    DB_WRITER_SPILL_PATH,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundDBWriter:
+    """
+    Persists product rows off the request path.
+
+    Adapters put row chunks on a bounded queue (awaiting when it is full, which is the
+    backpressure), workers coalesce them into batches of up to batch_size rows, write them
+    concurrently with retries and append anything that still fails to a local NDJSON spill
+    file that is replayed on the next start. A replay interrupted by a crash or a shutdown
+    leaves its file behind, and the next start replays it again (upserts make that safe).
+    """
+
+    def __init__(
+        self,
+        queue_size: int = DB_WRITER_QUEUE_SIZE,
+        batch_size: int = DB_WRITER_BATCH_SIZE,
+        concurrency: int = DB_WRITER_CONCURRENCY,
+        max_retries: int = DB_WRITER_MAX_RETRIES,
+        retry_backoff: float = DB_WRITER_RETRY_BACKOFF,
+        spill_path: str = DB_WRITER_SPILL_PATH,
+    ):
+        self.queue_size = queue_size
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max(1, max_retries)
+        self.retry_backoff = retry_backoff
+        self.spill_path = spill_path
+        self.stats = {"rows_written": 0, "batches_written": 0, "retries": 0, "rows_spilled": 0}
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers: List[asyncio.Task] = []
+        self._pending = set()
+        self._replay: Optional[asyncio.Task] = None
+        self._spill_lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._queue is not None
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._replay = asyncio.create_task(self.replay_spill())
+        self._pending.add(self._replay)
+        self._replay.add_done_callback(self._pending.discard)
+        logger.info(f"DB writer started with {self.concurrency} workers, batch size {self.batch_size}")
+
+    async def stop(self, timeout: float = 30) -> None:
+        """Drain pending submissions and the queue within `timeout` seconds in total, then spill the rest."""
+        if not self.running:
+            return
+        deadline = self._loop.time() + timeout
+        try:
+            await asyncio.wait_for(asyncio.gather(*self._pending, return_exceptions=True), timeout)
+            await asyncio.wait_for(self._queue.join(), max(0.0, deadline - self._loop.time()))
+        except asyncio.TimeoutError:
+            logger.warning("DB writer did not drain before shutdown, spilling remaining rows")
+        if self._replay and not self._replay.done():
+            # Its file stays on disk and is replayed on the next start
+            self._replay.cancel()
+            await asyncio.gather(self._replay, return_exceptions=True)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        while not self._queue.empty():
+            table_name, rows = self._queue.get_nowait()
+            self._spill(table_name, rows)
+        self._queue = None
+        self._workers = []
+
+    async def submit(self, rows: List[Dict[str, Any]], table_name: str) -> None:
+        for start in range(0, len(rows), self.batch_size):
+            await self._queue.put((table_name, rows[start:start + self.batch_size]))
+
+    def submit_threadsafe(self, rows: List[Dict[str, Any]], table_name: str) -> None:
+        try:
+            on_loop_thread = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop_thread = False
+        if on_loop_thread:
+            # Blocking here would deadlock the loop, so queue without waiting
+            task = self._loop.create_task(self.submit(rows, table_name))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+            return
+        asyncio.run_coroutine_threadsafe(self.submit(rows, table_name), self._loop).result()
+
+    async def _worker(self) -> None:
+        while True:
+            items = [await self._queue.get()]
+            total = len(items[0][1])
+            # Coalesce small submissions into full-size batches
+            while total < self.batch_size and not self._queue.empty():
+                items.append(self._queue.get_nowait())
+                total += len(items[-1][1])
+            grouped: Dict[str, List[Dict[str, Any]]] = {}
+            for table_name, rows in items:
+                grouped.setdefault(table_name, []).extend(rows)
+            batches = [(table_name, rows[start:start + self.batch_size])
+                       for table_name, rows in grouped.items() for start in range(0, len(rows), self.batch_size)]
+            try:
+                while batches:
+                    table_name, batch = batches[0]
+                    try:
+                        await self._write(table_name, batch)
+                    except Exception as e:
+                        logger.error(f"DB writer failed on a batch for {table_name}: {str(e)}")
+                        self._spill(table_name, batch)
+                    batches.pop(0)
+            except asyncio.CancelledError:
+                # stop() timed out: these rows are off the queue, so spill them or they are lost. The
+                # batch being written may still land from its thread; replaying it is an idempotent upsert.
+                for table_name, batch in batches:
+                    self._spill(table_name, batch)
+                raise
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+    async def _write(self, table_name: str, rows: List[Dict[str, Any]]) -> None:
+        for attempt in range(self.max_retries):
+            if await asyncio.to_thread(save_rows_to_db, rows, table_name):
+                self.stats["rows_written"] += len(rows)
+                self.stats["batches_written"] += 1
+                return
+            if attempt < self.max_retries - 1:
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+        self._spill(table_name, rows)
+
+    def _spill(self, table_name: str, rows: List[Dict[str, Any]]) -> None:
+        with self._spill_lock:
+            os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"table": table_name, "rows": rows}, default=str) + "\n")
+        self.stats["rows_spilled"] += len(rows)
+        logger.warning(f"Spilled {len(rows)} rows for {table_name} to {self.spill_path}")
+
+    async def replay_spill(self) -> int:
+        """Re-queue rows spilled by a previous run; rows that fail again are spilled anew."""
+        replay_path = self.spill_path + ".replay"
+        with self._spill_lock:
+            if os.path.exists(self.spill_path):
+                if os.path.exists(replay_path):
+                    # An earlier replay was interrupted: replay its file together with the newer spills
+                    with open(self.spill_path, encoding="utf-8") as src, open(replay_path, "a", encoding="utf-8") as dst:
+                        # Its last line may have been cut short; keep it apart from the first appended one
+                        dst.write("\n")
+                        dst.writelines(src)
+                    os.remove(self.spill_path)
+                else:
+                    os.replace(self.spill_path, replay_path)
+        if not os.path.exists(replay_path):
+            return 0
+        replayed = 0
+        with open(replay_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash mid-append
+                    logger.error(f"Skipping an unreadable line in {replay_path}")
+                    continue
+                await self.submit(entry["rows"], entry["table"])
+                replayed += len(entry["rows"])
+        os.remove(replay_path)
+        logger.info(f"Re-queued {replayed} spilled rows from {self.spill_path}")
+        return replayed
+
+
+db_writer = BackgroundDBWriter()
+
+
+def _rows(products: List[Any]) -> List[Dict[str, Any]]:
+    bucket = snapshot_bucket()
+    return [product_to_row(product, bucket=bucket) for product in products]
+
+
+async def enqueue_rows_async(rows: List[Dict[str, Any]], table_name: str) -> None:
+    if not rows:
+        return
+    if DB_WRITER_ENABLED and db_writer.running:
+        await db_writer.submit(rows, table_name)
+    else:
+        await asyncio.to_thread(save_rows_to_db, rows, table_name)
+
+
+def enqueue_rows(rows: List[Dict[str, Any]], table_name: str) -> None:
+    if not rows:
+        return
+    if DB_WRITER_ENABLED and db_writer.running:
+        db_writer.submit_threadsafe(rows, table_name)
+    else:
+        save_rows_to_db(rows, table_name)
+
+
+async def enqueue_products_async(products: List[Any], table_name: str = "products") -> None:
+    """Hand products to the background writer from async code; awaits only when the queue is full."""
+    if products:
+        await enqueue_rows_async(_rows(products), table_name)
+
+
+def enqueue_products(products: List[Any], table_name: str = "products") -> None:
+    """Hand products to the background writer from sync code running in a worker thread."""
+    if products:
+        enqueue_rows(_rows(products), table_name)
@@ -1,15 +1,51 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
-import json
-import uuid
 
-from .api import search_instamart, search_blinkit, search_zepto, search_all, search_bigbasket
+from .api import search_instamart, search_blinkit, search_zepto, search_all, search_bigbasket, download, history, changes, compare, crawl, metrics, debug, admin
+from .db.writer import db_writer
+from .core.changes import change_detector
+from .core.matching import product_matcher
+from .core.membership import store_membership
+from .core.tracing import exporter, tracing_middleware
+from .core.loop_monitor import loop_monitor
+from .core.logs import setup_logging, stop_logging
+from .core.prewarm import prewarm
+from .core.config import LOOP_MONITOR_ENABLED, PREWARM
 
-logging.basicConfig(level=logging.INFO)
+setup_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI(docs_url="/")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    change_detector.load_state()
+    product_matcher.load_state()
+    await db_writer.start()
+    store_membership.start_autosave()
+    if LOOP_MONITOR_ENABLED:
+        await loop_monitor.start()
+    app.state.prewarm_task = None
+    if PREWARM == "blocking":
+        await asyncio.to_thread(prewarm)
+    elif PREWARM == "background":
+        app.state.prewarm_task = asyncio.create_task(asyncio.to_thread(prewarm))
+    yield
+    if app.state.prewarm_task is not None and not app.state.prewarm_task.done():
+        # Stops waiting on it; the worker thread still finishes its current import before exit
+        app.state.prewarm_task.cancel()
+        await asyncio.gather(app.state.prewarm_task, return_exceptions=True)
+    await loop_monitor.stop()
+    await db_writer.stop()
+    change_detector.save_state()
+    product_matcher.save_state()
+    store_membership.stop_autosave()
+    store_membership.save_state()
+    exporter.flush()
+    stop_logging()
+
+app = FastAPI(docs_url="/", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,11 +55,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.middleware("http")(tracing_middleware)
+
 app.include_router(search_instamart.router)
 app.include_router(search_blinkit.router)
 app.include_router(search_zepto.router)
 app.include_router(search_all.router)
 app.include_router(search_bigbasket.router)
+app.include_router(download.router)
+app.include_router(history.router)
+app.include_router(changes.router)
+app.include_router(compare.router)
+app.include_router(crawl.router)
+app.include_router(metrics.router)
+app.include_router(debug.router)
+app.include_router(admin.router)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,356 @@
+import os
+import re
+import uuid
+import shutil
+import logging
+from datetime import date as date_type, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .export_utils import EXPORT_FIELDS, parquet_type, coerce_value
+from .quantity_utils import unit_columns
+from .format_utils import DIM_FIELDS, dimension_row
+from ..core.config import DATASET_LAYOUT
+
+logger = logging.getLogger(__name__)
+
+PARTITION_KEYS = ["platform", "date", "city", "query"]
+
+# platform lives in the partition path, coordinates record the centroid the batch scripts scraped
+DATASET_FIELDS = [f for f in EXPORT_FIELDS if f != "platform"] + ["coordinates"]
+
+# Normalized layout: narrow facts under facts/, one row per variant version under dims/. A version is
+# identified by the hash of its attributes (stores can list one variant with different images or
+# names on the same day), and every fact carries the hash of the version it was scraped with.
+FACT_FIELDS = [f for f in DATASET_FIELDS if f not in DIM_FIELDS or f == "variant_id"] + ["attr_hash"]
+DIM_DATASET_FIELDS = ["variant_id"] + list(DIM_FIELDS) + ["attr_hash"]
+DATASET_LAYOUTS = ("wide", "normalized")
+
+DICTIONARY_FIELDS = {
+    "search_query", "store_id", "brand", "quantity", "category", "sub_category", "coordinates"
+}
+
+DEFAULT_ROWS_PER_FILE = 200000
+
+# Hidden directories _replace_partition swaps through, named after the partition they replace
+SWAP_DIR_RE = re.compile(r"^\.(?P<name>.+)\.(?P<stage>compacting|retired)-(?P<token>[0-9a-f]{8})$")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        return pa, pq
+    except ImportError:
+        raise RuntimeError("The partitioned dataset store requires the 'pyarrow' package")
+
+
+def partition_value(value: Any) -> str:
+    text = str(value or "unknown").strip().lower()
+    return re.sub(r"[^a-z0-9._-]+", "-", text).strip("-") or "unknown"
+
+
+def dataset_schema(pa, columns: List[str] = None):
+    fields = []
+    for field in columns or DATASET_FIELDS:
+        if field in DICTIONARY_FIELDS:
+            fields.append((field, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append((field, parquet_type(pa, field)))
+    return pa.schema(fields)
+
+
+class ParquetDatasetSink:
+    """
+    Appends product rows to a Parquet dataset partitioned by platform/date/city/query.
+
+    The normalized layout writes only volatile columns under facts/ and each variant's static
+    attributes under dims/ whenever they change, with image URL prefixes interned.
+    """
+
+    def __init__(self, root: str, rows_per_file: int = DEFAULT_ROWS_PER_FILE, layout: str = DATASET_LAYOUT):
+        if layout not in DATASET_LAYOUTS:
+            raise ValueError(f"Unknown dataset layout '{layout}'; expected one of {DATASET_LAYOUTS}")
+        self.pa, self.pq = _require_pyarrow()
+        self.root = root
+        self.layout = layout
+        self.rows_per_file = rows_per_file
+        self.fields = FACT_FIELDS if layout == "normalized" else DATASET_FIELDS
+        self.schema = dataset_schema(self.pa, self.fields)
+        self._buffers: Dict[Tuple[str, str, str, str], List[Dict[str, Any]]] = {}
+        self._dims: Dict[str, List[Dict[str, Any]]] = {}
+        self._dim_versions: set = set()
+        self._prefixes: Dict[str, str] = {}
+        self.rows_written = 0
+        self.files_written = 0
+        self.dims_written = 0
+        os.makedirs(root, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def append(
+        self,
+        products: List[Dict[str, Any]],
+        platform: str,
+        query: str,
+        city: str = None,
+        scrape_date: Optional[date_type] = None,
+        coordinates: str = None
+    ) -> None:
+        if not products:
+            return
+        scrape_date = scrape_date or datetime.now().date()
+        key = (partition_value(platform), scrape_date.isoformat(), partition_value(city), partition_value(query))
+        buffer = self._buffers.setdefault(key, [])
+        rows = [{field: coerce_value(field, product.get(field)) for field in DATASET_FIELDS} for product in products]
+        # Older CSV exports predate the parsed pack-size columns; they are parsed as one column
+        unparsed = [row for row in rows if row["quantity_value"] is None and row["quantity"]]
+        if unparsed:
+            columns = unit_columns([row["quantity"] for row in unparsed], [row["price"] for row in unparsed])
+            for field, values in columns.items():
+                for row, value in zip(unparsed, values):
+                    row[field] = value
+        for row in rows:
+            if coordinates and not row["coordinates"]:
+                row["coordinates"] = coordinates
+            if self.layout == "normalized":
+                attr_hash = self._add_dimension(key[0], row)
+                row = {field: row.get(field) for field in FACT_FIELDS}
+                row["attr_hash"] = attr_hash
+            buffer.append(row)
+        if len(buffer) >= self.rows_per_file:
+            self._flush_partition(key)
+
+    def _add_dimension(self, platform: str, row: Dict[str, Any]) -> str:
+        """Queue the row's attribute version unless this sink already wrote it; returns its attr_hash."""
+        dim, prefixes = dimension_row(row)
+        version = (platform, dim["variant_id"], dim["attr_hash"])
+        if version not in self._dim_versions:
+            self._dim_versions.add(version)
+            self._prefixes.update(prefixes)
+            self._dims.setdefault(platform, []).append({field: dim[field] for field in DIM_DATASET_FIELDS})
+        return dim["attr_hash"]
+
+    def flush(self) -> None:
+        for key in list(self._buffers):
+            self._flush_partition(key)
+        self._flush_dimensions()
+
+    def close(self) -> None:
+        self.flush()
+
+    def partition_dir(self, key: Tuple[str, str, str, str]) -> str:
+        base = os.path.join(self.root, "facts") if self.layout == "normalized" else self.root
+        return os.path.join(base, *[f"{name}={value}" for name, value in zip(PARTITION_KEYS, key)])
+
+    def _write(self, directory: str, rows: List[Dict[str, Any]], schema) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet")
+        self.pq.write_table(self.pa.Table.from_pylist(rows, schema=schema), path, compression="zstd", use_dictionary=True)
+        self.files_written += 1
+        return path
+
+    def _flush_dimensions(self) -> None:
+        for platform, dims in list(self._dims.items()):
+            if dims:
+                self._write(os.path.join(self.root, "dims", f"platform={platform}"), dims, dataset_schema(self.pa, DIM_DATASET_FIELDS))
+                self.dims_written += len(dims)
+        self._dims = {}
+        if self._prefixes:
+            rows = [{"id": pid, "prefix": prefix} for pid, prefix in self._prefixes.items()]
+            schema = self.pa.schema([("id", self.pa.string()), ("prefix", self.pa.string())])
+            self._write(os.path.join(self.root, "image_prefixes"), rows, schema)
+            self._prefixes = {}
+
+    def _flush_partition(self, key: Tuple[str, str, str, str]) -> None:
+        rows = self._buffers.pop(key, None)
+        if not rows:
+            return
+        path = self._write(self.partition_dir(key), rows, self.schema)
+        self.rows_written += len(rows)
+        logger.info(f"Wrote {len(rows)} rows to {path}")
+
+
+def compact_partitions(root: str) -> int:
+    """Rewrite every partition that holds more than one part file as a single file."""
+    pa, pq = _require_pyarrow()
+    _recover_partitions(root)
+    compacted = 0
+    # Deepest directories first, and from a snapshot: compaction swaps directories while walking
+    for directory, _, files in reversed(list(os.walk(root))):
+        parts = sorted(f for f in files if f.endswith(".parquet"))
+        if len(parts) < 2 or os.path.basename(directory).startswith("."):
+            continue
+        # Part files written before a column was added lack it; promotion fills it with nulls
+        table = pa.concat_tables([pq.read_table(os.path.join(directory, f)) for f in parts], promote_options="default")
+        if os.path.relpath(directory, root).split(os.sep)[0] == "dims":
+            # Dimension partitions only need one row per (variant, attributes) version
+            table = _dedupe(table, ["variant_id", "attr_hash"])
+        elif os.path.basename(directory) == "image_prefixes":
+            table = _dedupe(table, ["id"])
+        _replace_partition(pq, directory, table, parts)
+        compacted += 1
+        logger.info(f"Compacted {len(parts)} files in {directory}")
+    return compacted
+
+
+def _replace_partition(pq, directory: str, table, parts: List[str]) -> None:
+    """
+    Write the compacted file into a hidden staging directory, then swap it in with renames.
+
+    Dataset readers ignore the hidden directories. A crash between the two renames leaves the
+    partition missing, and one after them can leave nested entries behind in the retired
+    directory; _recover_partitions completes or undoes the swap on the next compaction.
+    """
+    parent, name = os.path.split(os.path.normpath(directory))
+    token = uuid.uuid4().hex[:8]
+    staging = os.path.join(parent, f".{name}.compacting-{token}")
+    retired = os.path.join(parent, f".{name}.retired-{token}")
+    os.makedirs(staging)
+    pq.write_table(table, os.path.join(staging, f"part-compacted-{token}.parquet"), compression="zstd", use_dictionary=True)
+    os.rename(directory, retired)
+    os.rename(staging, directory)
+    # Anything besides the merged part files (nested partitions, sidecar files) moves across unchanged
+    for entry in os.listdir(retired):
+        if entry not in parts:
+            os.rename(os.path.join(retired, entry), os.path.join(directory, entry))
+    shutil.rmtree(retired)
+
+
+def _recover_partitions(root: str) -> None:
+    """Finish or undo partition swaps a crash interrupted, keyed by the token of each swap."""
+    for parent, dirs, _ in os.walk(root):
+        swaps: Dict[Tuple[str, str], Dict[str, str]] = {}
+        for entry in dirs:
+            match = SWAP_DIR_RE.match(entry)
+            if match:
+                swaps.setdefault((match["name"], match["token"]), {})[match["stage"]] = os.path.join(parent, entry)
+        for (name, _), paths in swaps.items():
+            directory = os.path.join(parent, name)
+            retired = paths.get("retired")
+            if retired and "compacting" in paths:
+                # The compacted file never replaced the partition: the retired files are the live data
+                _merge_into(retired, directory, lambda entry: True)
+            elif retired:
+                # The swap happened; only nested entries still need to move across
+                _merge_into(retired, directory, lambda entry: not entry.endswith(".parquet"))
+            if "compacting" in paths:
+                shutil.rmtree(paths["compacting"])
+            logger.warning(f"Recovered an interrupted compaction of {directory}")
+        # Swap directories have been handled above; the rest of the walk skips them
+        dirs[:] = [d for d in dirs if not SWAP_DIR_RE.match(d)]
+
+
+def _merge_into(source: str, target: str, keep) -> None:
+    os.makedirs(target, exist_ok=True)
+    for entry in os.listdir(source):
+        path, destination = os.path.join(source, entry), os.path.join(target, entry)
+        if not keep(entry):
+            continue
+        if os.path.isdir(path) and os.path.isdir(destination):
+            _merge_into(path, destination, lambda _: True)
+        elif not os.path.exists(destination):
+            os.rename(path, destination)
+    shutil.rmtree(source)
+
+
+def _dedupe(table, keys: List[str]):
+    """Keep the last row for each key, in original order."""
+    import pyarrow.compute as pc
+
+    indexed = table.select(keys).append_column("_row", _row_index(table.num_rows))
+    last = indexed.group_by(keys, use_threads=False).aggregate([("_row", "max")])["_row_max"]
+    return table.take(pc.take(last, pc.sort_indices(last)))
+
+
+def _row_index(n: int):
+    pa, _ = _require_pyarrow()
+    return pa.array(range(n), type=pa.int64())
+
+
+def _partition_filter(filters: Dict[str, str], keys=PARTITION_KEYS):
+    import pyarrow.dataset as ds
+
+    expression = None
+    for name, value in filters.items():
+        if name not in keys or value is None:
+            continue
+        value = value if name == "date" else partition_value(value)
+        condition = ds.field(name) == value
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def load_dataset(root: str, **filters: str):
+    """Load a dataset (optionally filtered by partition keys, e.g. platform/date) as one Arrow table."""
+    _require_pyarrow()
+    import pyarrow.dataset as ds
+
+    if os.path.isdir(os.path.join(root, "facts")):
+        return _load_normalized(root, filters)
+    dataset = ds.dataset(root, format="parquet", partitioning="hive")
+    return dataset.to_table(filter=_partition_filter(filters))
+
+
+def _load_normalized(root: str, filters: Dict[str, str]):
+    """Join facts back to the dimension version they were scraped with so callers get the same columns as the wide layout."""
+    pa, pq = _require_pyarrow()
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    facts = ds.dataset(os.path.join(root, "facts"), format="parquet", partitioning="hive").to_table(filter=_partition_filter(filters))
+    dims_root = os.path.join(root, "dims")
+    if not os.path.isdir(dims_root):
+        return facts
+    dims = ds.dataset(dims_root, format="parquet", partitioning="hive").to_table(
+        filter=_partition_filter(filters, keys=("platform",))
+    )
+    # Facts written before they carried attr_hash fall back to the variant's latest version
+    keys = ["platform", "variant_id"] + (["attr_hash"] if "attr_hash" in facts.column_names else [])
+    dims = _dedupe(dims, keys)
+    dims = dims.set_column(dims.schema.get_field_index("platform"), "platform", pc.cast(dims["platform"], pa.string()))
+
+    # Arrow joins cannot carry list columns, so join on keys only and gather dimension rows by index
+    index = dims.select(keys).append_column("_dim_row", _row_index(dims.num_rows))
+    facts = facts.append_column("_fact_row", _row_index(facts.num_rows))
+    probe = facts.select(keys + ["_fact_row"])
+    probe = probe.set_column(0, "platform", pc.cast(probe["platform"], pa.string()))
+    joined = probe.join(index, keys, join_type="left outer").sort_by("_fact_row")
+    facts = facts.drop_columns(["_fact_row"] + (["attr_hash"] if "attr_hash" in facts.column_names else []))
+    matched = dims.drop_columns(["platform", "variant_id", "attr_hash"]).take(joined["_dim_row"])
+
+    prefixes = _load_prefixes(root)
+    for name in matched.column_names:
+        column = matched[name]
+        if name == "images" and prefixes:
+            column = _expand_image_column(column.combine_chunks(), prefixes)
+        facts = facts.append_column(name, column)
+    order = [f for f in DATASET_FIELDS if f in facts.column_names]
+    return facts.select(order + [c for c in facts.column_names if c not in order])
+
+
+def _load_prefixes(root: str) -> Dict[str, str]:
+    _, pq = _require_pyarrow()
+    directory = os.path.join(root, "image_prefixes")
+    prefixes: Dict[str, str] = {}
+    if not os.path.isdir(directory):
+        return prefixes
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".parquet"):
+            table = pq.read_table(os.path.join(directory, name))
+            prefixes.update(zip(table["id"].to_pylist(), table["prefix"].to_pylist()))
+    return prefixes
+
+
+def _expand_image_column(column, prefixes: Dict[str, str]):
+    """Rewrite "@id/file" references to full URLs on the flattened values, then rebuild the lists."""
+    pa, _ = _require_pyarrow()
+    import pyarrow.compute as pc
+
+    values = column.values
+    for pid, prefix in prefixes.items():
+        values = pc.replace_substring_regex(values, pattern=f"^@{pid}/", replacement=prefix.replace("\\", "\\\\"))
+    return pa.ListArray.from_arrays(column.offsets, values, mask=column.is_null())
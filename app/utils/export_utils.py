@@ -0,0 +1,291 @@
+import io
+import csv
+import json
+import gzip
+from typing import Any, AsyncIterable, Dict, Iterable, Iterator, List, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+EXPORT_FIELDS = [
+    'platform', 'search_query', 'store_id', 'product_id', 'variant_id',
+    'name', 'brand', 'mrp', 'price', 'quantity', 'quantity_value', 'quantity_unit',
+    'unit_price', 'in_stock', 'inventory',
+    'max_allowed_quantity', 'category', 'sub_category', 'images',
+    'organic_rank', 'rating', 'canonical_id', 'new_listing'
+]
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+EXPORT_COMPRESSIONS = ("none", "gzip", "zstd")
+
+DEFAULT_BATCH_SIZE = 5000
+
+FLOAT_FIELDS = {"mrp", "price", "rating", "quantity_value", "unit_price"}
+INT_FIELDS = {"inventory", "max_allowed_quantity", "organic_rank", "page"}
+BOOL_FIELDS = {"in_stock", "new_listing"}
+LIST_FIELDS = {"images"}
+
+
+def resolve_columns(columns: Optional[str]) -> List[str]:
+    if not columns:
+        return list(EXPORT_FIELDS)
+    selected = [c.strip() for c in columns.split(',') if c.strip()]
+    unknown = [c for c in selected if c not in EXPORT_FIELDS]
+    if unknown or not selected:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown export columns: {unknown}. Allowed: {EXPORT_FIELDS}"
+        )
+    return selected
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back written bytes in chunks while keeping tell() absolute."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer.extend(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+class CsvEncoder:
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+        self._output = io.StringIO()
+        self._writer = csv.writer(self._output)
+
+    def header(self) -> bytes:
+        self._writer.writerow(self.columns)
+        return self._take()
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        for row in rows:
+            values = []
+            for field in self.columns:
+                value = row.get(field)
+                if value is None:
+                    value = ''
+                elif isinstance(value, list):
+                    value = ';'.join(str(v) for v in value)
+                values.append(value)
+            self._writer.writerow(values)
+        return self._take()
+
+    def finish(self) -> bytes:
+        return b""
+
+    def _take(self) -> bytes:
+        data = self._output.getvalue().encode('utf-8')
+        self._output.seek(0)
+        self._output.truncate(0)
+        return data
+
+
+class NdjsonEncoder:
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        lines = [
+            json.dumps({field: row.get(field) for field in self.columns}, default=str, ensure_ascii=False)
+            for row in rows
+        ]
+        return ("\n".join(lines) + "\n").encode('utf-8') if lines else b""
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class ParquetEncoder:
+    """Writes every batch as one Parquet row group."""
+
+    def __init__(self, columns: List[str]):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise HTTPException(status_code=400, detail="Parquet export requires the 'pyarrow' package")
+        self.columns = columns
+        self._pa = pa
+        self._schema = pa.schema([(field, parquet_type(pa, field)) for field in columns])
+        self._sink = _ChunkSink()
+        self._writer = pq.ParquetWriter(self._sink, self._schema, compression="zstd")
+
+    def header(self) -> bytes:
+        return self._sink.drain()
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        if not rows:
+            return b""
+        table = self._pa.Table.from_pylist(
+            [{field: coerce_value(field, row.get(field)) for field in self.columns} for row in rows],
+            schema=self._schema
+        )
+        self._writer.write_table(table, row_group_size=len(rows))
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+def parquet_type(pa, field: str):
+    if field in FLOAT_FIELDS:
+        return pa.float64()
+    if field in INT_FIELDS:
+        return pa.int64()
+    if field in BOOL_FIELDS:
+        return pa.bool_()
+    if field in LIST_FIELDS:
+        return pa.list_(pa.string())
+    return pa.string()
+
+
+def coerce_value(field: str, value: Any) -> Any:
+    if value is None or value == '':
+        return None
+    try:
+        if field in FLOAT_FIELDS:
+            return float(value)
+        if field in INT_FIELDS:
+            return int(value)
+        if field in BOOL_FIELDS:
+            return value if isinstance(value, bool) else str(value).lower() == 'true'
+        if field in LIST_FIELDS:
+            return [str(v) for v in value] if isinstance(value, list) else [v for v in str(value).split(';') if v]
+    except (ValueError, TypeError):
+        return None
+    return str(value)
+
+
+class _Compressor:
+    def __init__(self, compression: str):
+        self.compression = compression
+        if compression == "gzip":
+            self._buffer = io.BytesIO()
+            self._gzip = gzip.GzipFile(fileobj=self._buffer, mode="wb", compresslevel=6)
+        elif compression == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                raise HTTPException(status_code=400, detail="zstd compression requires the 'zstandard' package")
+            self._zstd = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        if not data or self.compression == "none":
+            return data
+        if self.compression == "gzip":
+            self._gzip.write(data)
+            return self._take_gzip()
+        return self._zstd.compress(data)
+
+    def flush(self) -> bytes:
+        if self.compression == "gzip":
+            self._gzip.close()
+            return self._take_gzip()
+        if self.compression == "zstd":
+            return self._zstd.flush()
+        return b""
+
+    def _take_gzip(self) -> bytes:
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate(0)
+        return data
+
+
+def _make_encoder(fmt: str, columns: List[str]):
+    if fmt == "csv":
+        return CsvEncoder(columns)
+    if fmt == "ndjson":
+        return NdjsonEncoder(columns)
+    return ParquetEncoder(columns)
+
+
+def _iter_export(rows: Iterable[Dict[str, Any]], encoder, compressor: _Compressor, batch_size: int) -> Iterator[bytes]:
+    chunk = compressor.compress(encoder.header())
+    if chunk:
+        yield chunk
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            chunk = compressor.compress(encoder.encode(batch))
+            batch = []
+            if chunk:
+                yield chunk
+    chunk = compressor.compress(encoder.encode(batch) + encoder.finish()) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+async def _aiter_export(rows: AsyncIterable[Dict[str, Any]], encoder, compressor: _Compressor, batch_size: int):
+    chunk = compressor.compress(encoder.header())
+    if chunk:
+        yield chunk
+    batch = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            chunk = compressor.compress(encoder.encode(batch))
+            batch = []
+            if chunk:
+                yield chunk
+    chunk = compressor.compress(encoder.encode(batch) + encoder.finish()) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def export_response(
+    rows,
+    filename: str,
+    fmt: str = "csv",
+    columns: Optional[str] = None,
+    compression: str = "none",
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> StreamingResponse:
+    """Stream product dicts (sync or async iterable) as CSV, NDJSON or Parquet in batches."""
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{fmt}'. Allowed: {list(EXPORT_FORMATS)}")
+    if compression not in EXPORT_COMPRESSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported compression '{compression}'. Allowed: {list(EXPORT_COMPRESSIONS)}")
+    if batch_size < 1:
+        raise HTTPException(status_code=400, detail="batch_size must be positive")
+
+    selected = resolve_columns(columns)
+    encoder = _make_encoder(fmt, selected)
+    compressor = _Compressor(compression)
+    media_type, extension = EXPORT_FORMATS[fmt]
+
+    if hasattr(rows, "__aiter__"):
+        body = _aiter_export(rows, encoder, compressor, batch_size)
+    else:
+        body = _iter_export(rows, encoder, compressor, batch_size)
+
+    headers = {"Content-Disposition": f"attachment; filename={filename}.{extension}"}
+    if compression != "none":
+        headers["Content-Encoding"] = compression
+    return StreamingResponse(body, media_type=media_type, headers=headers)
@@ -1,8 +1,11 @@
 import os
 import json
+import logging
 from datetime import datetime
 from typing import Any, Dict, List, Union
 
+logger = logging.getLogger(__name__)
+
 def write_to_output_file(data: Union[Dict, List, str], filename: str = None, prefix: str = None) -> str:
     # Get project root directory (two levels up from this file)
     current_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
@@ -29,8 +32,8 @@ def write_to_output_file(data: Union[Dict, List, str], filename: str = None, pre
             with open(file_path, 'w', encoding='utf-8') as f:
                 f.write(str(data))
         
-        print(f"Data written to {file_path}")
+        logger.info(f"Data written to {file_path}")
         return file_path
     except Exception as e:
-        print(f"Error writing to output file: {str(e)}")
+        logger.error(f"Error writing to output file: {str(e)}")
         return None
\ No newline at end of file
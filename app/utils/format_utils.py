@@ -1,6 +1,16 @@
-from typing import Any, Dict, List
+import json
+import hashlib
+from typing import Any, Dict, List, Tuple
 from datetime import datetime
 
+from .image_utils import intern_images
+
+# Attributes that rarely change between scrapes; everything else is a per-snapshot fact
+DIM_FIELDS = (
+    "product_id", "name", "brand", "quantity", "quantity_value", "quantity_unit",
+    "category", "sub_category", "images", "rating", "canonical_id",
+)
+
 def model_to_dict(model: Any, exclude_fields: List[str] = None) -> Dict[str, Any]:
     if model is None:
         return {}
@@ -16,3 +26,16 @@ def model_to_dict(model: Any, exclude_fields: List[str] = None) -> Dict[str, Any
                 result[key] = value
                 
     return result
+
+def dimension_row(row: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Static attributes of one product row with interned images and an attr_hash over them."""
+    dim = {'platform': row.get('platform') or '', 'variant_id': str(row.get('variant_id') or '')}
+    for field in DIM_FIELDS:
+        dim[field] = row.get(field)
+    images = dim['images']
+    if isinstance(images, str):
+        images = [image for image in images.split(';') if image]
+    dim['images'], prefixes = intern_images(images)
+    payload = json.dumps([dim.get(field) for field in DIM_FIELDS], default=str)
+    dim['attr_hash'] = hashlib.blake2b(payload.encode('utf-8'), digest_size=8).hexdigest()
+    return dim, prefixes
@@ -0,0 +1,54 @@
+import re
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Interned image references look like "@1a2b3c4d/file.jpg"; the id is derived from the prefix
+# itself so every process and every storage target agrees on it without a lookup.
+IMAGE_REF_RE = re.compile(r"^@([0-9a-f]{8})/(.*)$", re.DOTALL)
+
+# Prefixes seen by this process, id -> prefix
+_prefixes: Dict[str, str] = {}
+
+
+def prefix_id(prefix: str) -> str:
+    return hashlib.blake2b(prefix.encode("utf-8"), digest_size=4).hexdigest()
+
+
+def intern_image(url: str) -> Tuple[str, Optional[Tuple[str, str]]]:
+    """Replace the directory part of an absolute image URL with a short id; returns (ref, (id, prefix))."""
+    if not isinstance(url, str) or not url.startswith(("http://", "https://")):
+        return url, None
+    cut = url.rfind("/") + 1
+    prefix = url[:cut]
+    pid = prefix_id(prefix)
+    _prefixes.setdefault(pid, prefix)
+    return f"@{pid}/{url[cut:]}", (pid, prefix)
+
+
+def intern_images(urls: Optional[Iterable[str]]) -> Tuple[List[str], Dict[str, str]]:
+    refs = []
+    used: Dict[str, str] = {}
+    for url in urls or []:
+        ref, prefix = intern_image(url)
+        refs.append(ref)
+        if prefix:
+            used[prefix[0]] = prefix[1]
+    return refs, used
+
+
+def expand_image(ref: str, prefixes: Dict[str, str] = None) -> str:
+    match = IMAGE_REF_RE.match(ref) if isinstance(ref, str) else None
+    if not match:
+        return ref
+    pid, rest = match.groups()
+    prefix = (prefixes or {}).get(pid) or _prefixes.get(pid)
+    return prefix + rest if prefix else ref
+
+
+def expand_images(refs: Optional[Iterable[str]], prefixes: Dict[str, str] = None) -> List[str]:
+    return [expand_image(ref, prefixes) for ref in refs or []]
+
+
+def register_prefixes(prefixes: Dict[str, str]) -> None:
+    """Teach this process prefixes loaded from storage so expand_image works without passing them."""
+    _prefixes.update(prefixes)
@@ -0,0 +1,102 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Sizes are normalized to kg, l or pc so unit price is always per kg / per litre / per piece
+UNITS = {
+    "mg": ("kg", 0.000001), "g": ("kg", 0.001), "gm": ("kg", 0.001), "gms": ("kg", 0.001),
+    "gram": ("kg", 0.001), "grams": ("kg", 0.001), "kg": ("kg", 1.0), "kgs": ("kg", 1.0),
+    "ml": ("l", 0.001), "l": ("l", 1.0), "lt": ("l", 1.0), "ltr": ("l", 1.0), "ltrs": ("l", 1.0),
+    "litre": ("l", 1.0), "litres": ("l", 1.0), "liter": ("l", 1.0), "liters": ("l", 1.0),
+    "pc": ("pc", 1.0), "pcs": ("pc", 1.0), "piece": ("pc", 1.0), "pieces": ("pc", 1.0),
+    "unit": ("pc", 1.0), "units": ("pc", 1.0), "n": ("pc", 1.0), "nos": ("pc", 1.0),
+    "sheets": ("pc", 1.0), "tablets": ("pc", 1.0), "bags": ("pc", 1.0),
+}
+_UNIT = "(" + "|".join(sorted(map(re.escape, UNITS), key=len, reverse=True)) + r")\b"
+_NUMBER = r"(\d+(?:\.\d+)?)"
+
+# "2 x 200 ml"
+MULTI_BEFORE_RE = re.compile(r"(\d+)\s*[x×*]\s*" + _NUMBER + r"\s*" + _UNIT)
+# "200 ml x 2"
+MULTI_AFTER_RE = re.compile(_NUMBER + r"\s*" + _UNIT + r"\s*[x×*]\s*(\d+)")
+# "500 g", "1.5kg"
+AMOUNT_RE = re.compile(_NUMBER + r"\s*" + _UNIT)
+# "Pack of 6", "Combo of 2", "Set of 3"
+PACK_OF_RE = re.compile(r"(?:pack|combo|set|box)\s+of\s+(\d+)")
+
+Quantity = Tuple[Optional[float], Optional[str]]
+
+
+@lru_cache(maxsize=65536)
+def parse_quantity(text: Optional[str]) -> Quantity:
+    """Parse a free-text pack size into (value, unit) with unit one of kg, l, pc; (None, None) if unreadable."""
+    if not text:
+        return None, None
+    text = str(text).lower().replace(",", "")
+
+    match = MULTI_BEFORE_RE.search(text)
+    if match:
+        count, amount, unit = match.groups()
+        return _scaled(float(amount) * int(count), unit)
+
+    match = MULTI_AFTER_RE.search(text)
+    if match:
+        amount, unit, count = match.groups()
+        return _scaled(float(amount) * int(count), unit)
+
+    match = AMOUNT_RE.search(text)
+    pack_of = PACK_OF_RE.search(text)
+    if match:
+        amount, unit = match.groups()
+        # "Pack of 2 (200 g each)" is two packs; a plain "Pack of 6 (6 pcs)" already counts pieces
+        count = int(pack_of.group(1)) if pack_of and "each" in text and UNITS[unit][0] != "pc" else 1
+        return _scaled(float(amount) * count, unit)
+
+    if pack_of:
+        return float(pack_of.group(1)), "pc"
+    return None, None
+
+
+def _scaled(amount: float, unit: str) -> Quantity:
+    base, factor = UNITS[unit]
+    return round(amount * factor, 6), base
+
+
+def unit_price(price: Any, quantity_value: Optional[float]) -> Optional[float]:
+    try:
+        return round(float(price) / quantity_value, 2) if price is not None and quantity_value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def quantity_fields(quantity: Any, price: Any) -> dict:
+    """quantity_value, quantity_unit and unit_price for one record."""
+    value, unit = parse_quantity(str(quantity) if quantity is not None else None)
+    return {"quantity_value": value, "quantity_unit": unit, "unit_price": unit_price(price, value)}
+
+
+def parse_quantities(quantities: Iterable[Any]) -> Tuple[List[Optional[float]], List[Optional[str]]]:
+    """
+    Column mode: pack sizes repeat heavily across stores and days, so the column is dictionary
+    encoded, each distinct string is parsed once and the results are mapped back by code.
+    """
+    codes: Dict[Optional[str], int] = {}
+    indices = [codes.setdefault(str(q) if q is not None else None, len(codes)) for q in quantities]
+    parsed = [parse_quantity(text) for text in codes]
+    return [parsed[i][0] for i in indices], [parsed[i][1] for i in indices]
+
+
+def unit_columns(quantities: List[Any], prices: List[Any]) -> Dict[str, List[Any]]:
+    """quantity_value, quantity_unit and unit_price columns for whole columns of quantities and prices."""
+    values, units = parse_quantities(quantities)
+    return {"quantity_value": values, "quantity_unit": units,
+            "unit_price": [unit_price(price, value) for price, value in zip(prices, values)]}
+
+
+def set_unit_prices(products: List[Any]) -> None:
+    """Fill quantity_value, quantity_unit and unit_price on product models in place."""
+    columns = unit_columns([getattr(p, "quantity", None) for p in products], [getattr(p, "price", None) for p in products])
+    for field, values in columns.items():
+        for product, value in zip(products, values):
+            setattr(product, field, value)
+
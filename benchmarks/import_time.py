@@ -0,0 +1,144 @@
+"""
+Cold-start budget for `import app.main`: what every uvicorn worker pays on start and on reload.
+
+Each run imports the app in a fresh interpreter with -X importtime. The script reports the
+median wall time and the slowest imports, and exits non-zero when the median exceeds the
+budget or when a module that should load lazily was imported eagerly. That makes it usable
+as a CI gate.
+
+The budget is relative: the median recorded in benchmarks/import_time_baseline.json plus
+--tolerance, since absolute import times vary several-fold between machines. Record a
+baseline on the machine that runs the gate with --save-baseline, or pass --budget-ms.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --save-baseline --runs 9
+    python -m benchmarks.import_time --budget-ms 1500 --runs 7 --top 25
+    python -m benchmarks.import_time --module app.api.search_zepto
+"""
+import os
+import sys
+import json
+import argparse
+import platform
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_time_baseline.json")
+
+# Loaded on first use (see app/core/prewarm.py); importing app.main must not pull these in
+DEFERRED_MODULES = ("pandas", "playwright", "supabase", "cloudscraper", "pycurl", "pyarrow", "duckdb", "zstandard")
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def run_once(module: str, env: Dict[str, str]) -> Tuple[float, List[str], List[Tuple[int, int, str]]]:
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE.format(module=module)],
+                             cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if process.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{process.stderr[-2000:]}")
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    rows = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        own, total, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(own), int(total), name.rstrip()))
+    return result["seconds"], result["modules"], rows
+
+
+def slowest_imports(rows: List[Tuple[int, int, str]]) -> List[Dict[str, Any]]:
+    """Cumulative time per app module and per top-level package, slowest first."""
+    totals: Dict[str, int] = {}
+    for _, total, name in rows:
+        name = name.strip()
+        if name.startswith("app.") or "." not in name:
+            totals[name] = max(totals.get(name, 0), total)
+    return [{"module": name, "ms": round(us / 1000, 1)} for name, us in sorted(totals.items(), key=lambda item: -item[1])]
+
+
+def machine() -> str:
+    return f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs, Python {platform.python_version()}"
+
+
+def load_baseline(path: str, module: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get(module, {})
+
+
+def save_baseline(path: str, module: str, median: float, modules: int) -> None:
+    baselines = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            baselines = json.load(f)
+    baselines[module] = {"median_ms": round(median, 1), "modules": modules, "machine": machine(),
+                         "recorded_at": datetime.now(timezone.utc).isoformat()}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baselines, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time of the app against a budget")
+    parser.add_argument("--module", default="app.main", help="Module to import")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time (the median is reported)")
+    parser.add_argument("--budget-ms", type=float, help="Fail when the median import exceeds this (default: baseline plus tolerance)")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Allowed growth over the baseline median")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file to compare against or save to")
+    parser.add_argument("--save-baseline", action="store_true", help="Record this median as the module's baseline")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    parser.add_argument("--allow", default="", help="Comma separated deferred modules allowed to load eagerly")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    run_once(args.module, env)  # compile bytecode and warm the page cache
+    timings, modules, rows = [], [], []
+    for _ in range(args.runs):
+        seconds, modules, rows = run_once(args.module, env)
+        timings.append(seconds * 1000)
+
+    median = statistics.median(timings)
+    baseline = load_baseline(args.baseline, args.module)
+    budget = args.budget_ms
+    if budget is None and baseline:
+        budget = baseline["median_ms"] * (1 + args.tolerance)
+        if baseline.get("machine") != machine():
+            print(f"Baseline was recorded on {baseline.get('machine')}, this is {machine()}; re-record it with --save-baseline")
+    allowed = {name.strip() for name in args.allow.split(",") if name.strip()}
+    eager = [name for name in DEFERRED_MODULES if name in modules and name not in allowed]
+    slowest = slowest_imports(rows)[:args.top]
+
+    budget_text = f"budget {budget:.0f}ms" if budget is not None else "no baseline or budget"
+    print(f"import {args.module}: median {median:.0f}ms over {args.runs} runs "
+          f"(min {min(timings):.0f}ms, max {max(timings):.0f}ms), {budget_text}, {len(modules)} modules")
+    for entry in slowest:
+        print(f"  {entry['ms']:>8.1f}ms  {entry['module']}")
+    if eager:
+        print(f"Deferred modules imported eagerly: {', '.join(eager)}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"module": args.module, "median_ms": round(median, 1), "runs_ms": [round(t, 1) for t in timings],
+                       "budget_ms": budget, "eager_deferred": eager, "slowest": slowest}, f, indent=2)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, args.module, median, len(modules))
+        print(f"Saved {median:.0f}ms as the {args.module} baseline in {args.baseline}")
+    elif budget is None:
+        print(f"No baseline for {args.module} in {args.baseline}; run with --save-baseline or pass --budget-ms")
+    if (budget is not None and not args.save_baseline and median > budget) or eager:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
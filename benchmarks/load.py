@@ -0,0 +1,345 @@
+"""
+Closed-loop load generator for the API, for finding where endpoints saturate.
+
+Each step runs --concurrency workers against one request mix for --duration seconds and
+reports throughput, p50/p95/p99 latency, error rate, event-loop lag and server RSS. Lag is
+estimated from a probe that GETs a trivial endpoint every --probe-interval: its latency above
+the idle baseline is time the request waited for the server's event loop. RSS is read from
+/proc/<pid>/status, so it needs --pid (or --spawn) and a Linux host.
+
+    python -m benchmarks.load --spawn --mix blinkit,zepto,all,download --concurrency 1,4,16,64
+    python -m benchmarks.load --url http://127.0.0.1:8000 --pid 4242 --mix all --duration 60
+
+--spawn starts mock_upstream.py and the app (pointed at it through MOCK_UPSTREAM_URL) on free
+ports and stops both afterwards. Both run in a temporary directory that also holds every state
+file, the raw archive and the Zepto request templates, so a run leaves nothing in the checkout.
+Results are written as JSON to --output (by default a timestamped file in the system temp dir).
+"""
+import os
+import sys
+import math
+import json
+import time
+import random
+import shlex
+import socket
+import asyncio
+import argparse
+import tempfile
+import statistics
+import subprocess
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROBE_PATH = "/changes/stream/stats"
+
+COORDINATES = "28.4511202,77.0965147"
+INSTAMART_STORE = "1401254"
+ZEPTO_STORE = "7f1d4c5e-mock-store"
+
+RequestSpec = Tuple[str, str, Dict[str, Any], Optional[Dict[str, Any]]]
+
+
+def search_all_body(query: str) -> Dict[str, Any]:
+    return {
+        "queries": [query],
+        "instamart_store_ids": [INSTAMART_STORE],
+        "zepto_store_ids": [ZEPTO_STORE],
+        "blinkit_coordinates": [COORDINATES],
+        "save_to_db": False,
+    }
+
+
+# name -> [(weight, request builder)]; builders take a query and return (method, path, params, json body)
+MIXES: Dict[str, List[Tuple[float, Callable[[str], RequestSpec]]]] = {
+    "blinkit": [(1, lambda q: ("GET", "/blinkit/search", {"query": q, "coordinates": COORDINATES}, None))],
+    "zepto": [(1, lambda q: ("GET", "/zepto/search", {"query": q, "store_id": ZEPTO_STORE}, None))],
+    "instamart": [(1, lambda q: ("GET", "/instamart/search", {"query": q, "store_id": INSTAMART_STORE}, None))],
+    "all": [(1, lambda q: ("POST", "/search/all", {}, search_all_body(q)))],
+    "download": [
+        (1, lambda q: ("GET", "/blinkit/download", {"query": q, "coordinates": COORDINATES, "format": "csv"}, None)),
+        (1, lambda q: ("GET", "/zepto/download", {"query": q, "store_id": ZEPTO_STORE, "format": "csv"}, None)),
+        (1, lambda q: ("POST", "/search/all/download", {"format": "ndjson"}, search_all_body(q))),
+    ],
+    "mixed": [
+        (4, lambda q: ("GET", "/zepto/search", {"query": q, "store_id": ZEPTO_STORE}, None)),
+        (3, lambda q: ("GET", "/instamart/search", {"query": q, "store_id": INSTAMART_STORE}, None)),
+        (2, lambda q: ("GET", "/blinkit/search", {"query": q, "coordinates": COORDINATES}, None)),
+        (1, lambda q: ("POST", "/search/all", {}, search_all_body(q))),
+    ],
+}
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    # Nearest rank
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return round(ordered[index], 2)
+
+
+def read_rss_mb(pid: Optional[int]) -> Optional[float]:
+    if not pid:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url, timeout=2)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.25)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def spawn(args: argparse.Namespace, state_dir: str) -> Tuple[str, int, List[subprocess.Popen]]:
+    """Start the mock upstream and the app; returns the app URL, its pid and both processes."""
+    mock_port, app_port = free_port(), free_port()
+    mock = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "mock_upstream.py"), "--port", str(mock_port)] + shlex.split(args.mock_args),
+        cwd=state_dir,
+    )
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])),
+        "MOCK_UPSTREAM_URL": f"http://127.0.0.1:{mock_port}",
+        "STORAGE_BACKEND": "sqlite",
+        "STORAGE_PATH": os.path.join(state_dir, "products.db"),
+        "DB_WRITER_SPILL_PATH": os.path.join(state_dir, "db_spill.ndjson"),
+        "CHANGE_STATE_PATH": os.path.join(state_dir, "change_state.json.gz"),
+        "MATCH_INDEX_PATH": os.path.join(state_dir, "match_index.json.gz"),
+        "MEMBERSHIP_DIR": os.path.join(state_dir, "membership"),
+        "CRAWL_STATE_DIR": os.path.join(state_dir, "crawl"),
+        "RAW_ARCHIVE_DIR": os.path.join(state_dir, "raw_archive"),
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(app_port),
+         "--log-level", "warning"] + shlex.split(args.app_args),
+        cwd=state_dir, env=env,
+    )
+    return f"http://127.0.0.1:{app_port}", server.pid, [server, mock]
+
+
+async def probe_loop(client: httpx.AsyncClient, interval: float, pid: Optional[int],
+                     probes: List[float], rss: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await client.get(PROBE_PATH)
+            probes.append((time.perf_counter() - start) * 1000)
+        except httpx.HTTPError:
+            pass
+        value = read_rss_mb(pid)
+        if value is not None:
+            rss.append(value)
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def worker(client: httpx.AsyncClient, mix: List[Tuple[float, Callable[[str], RequestSpec]]], queries: List[str],
+                 deadline: float, rng: random.Random, latencies: List[float], statuses: Counter, totals: Counter) -> None:
+    weights = [weight for weight, _ in mix]
+    while time.monotonic() < deadline:
+        build = rng.choices([builder for _, builder in mix], weights)[0]
+        method, path, params, body = build(rng.choice(queries))
+        start = time.perf_counter()
+        try:
+            # Streamed so download mixes are timed to the last byte, like a real client
+            async with client.stream(method, path, params=params, json=body) as response:
+                async for chunk in response.aiter_raw():
+                    totals["bytes"] += len(chunk)
+            statuses[str(response.status_code)] += 1
+            if response.status_code >= 400:
+                totals["errors"] += 1
+        except httpx.HTTPError as e:
+            statuses[type(e).__name__] += 1
+            totals["errors"] += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+        totals["requests"] += 1
+
+
+async def run_step(url: str, mix_name: str, concurrency: int, args: argparse.Namespace, pid: Optional[int],
+                   idle_probe_ms: float) -> Dict[str, Any]:
+    latencies: List[float] = []
+    probes: List[float] = []
+    rss: List[float] = []
+    statuses: Counter = Counter()
+    totals: Counter = Counter()
+    limits = httpx.Limits(max_connections=concurrency + 1, max_keepalive_connections=concurrency + 1)
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+        stop = asyncio.Event()
+        rss_start = read_rss_mb(pid)
+        prober = asyncio.create_task(probe_loop(client, args.probe_interval, pid, probes, rss, stop))
+        start = time.monotonic()
+        deadline = start + args.duration
+        await asyncio.gather(*(
+            worker(client, MIXES[mix_name], args.queries, deadline, random.Random(args.seed + i),
+                   latencies, statuses, totals)
+            for i in range(concurrency)
+        ))
+        elapsed = time.monotonic() - start
+        stop.set()
+        await prober
+
+    lags = [max(0.0, probe - idle_probe_ms) for probe in probes]
+    return {
+        "mix": mix_name,
+        "concurrency": concurrency,
+        # Workers finish their in-flight request after the deadline, so elapsed can exceed --duration
+        "elapsed_s": round(elapsed, 2),
+        "requests": totals["requests"],
+        "errors": totals["errors"],
+        "error_rate": round(totals["errors"] / totals["requests"], 4) if totals["requests"] else None,
+        "statuses": dict(statuses),
+        "throughput_rps": round(totals["requests"] / elapsed, 3) if elapsed else None,
+        "bytes": totals["bytes"],
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies), 2) if latencies else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": round(max(latencies), 2) if latencies else None,
+        },
+        "probe_ms": {"p50": percentile(probes, 50), "p99": percentile(probes, 99), "samples": len(probes)},
+        "loop_lag_ms": {"p50": percentile(lags, 50), "p99": percentile(lags, 99), "max": round(max(lags), 2) if lags else None},
+        "rss_mb": {"start": rss_start, "max": max(rss) if rss else None, "end": rss[-1] if rss else None},
+    }
+
+
+async def idle_probe(url: str, samples: int = 20) -> float:
+    """Median probe latency with no load, the baseline that loop lag is measured against."""
+    timings = []
+    async with httpx.AsyncClient(base_url=url, timeout=10) as client:
+        for _ in range(samples):
+            start = time.perf_counter()
+            await client.get(PROBE_PATH)
+            timings.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0.02)
+    return statistics.median(timings)
+
+
+async def sweep(url: str, pid: Optional[int], args: argparse.Namespace) -> Dict[str, Any]:
+    await wait_ready(url + PROBE_PATH)
+    idle_probe_ms = await idle_probe(url)
+    print(f"Idle probe {idle_probe_ms:.2f} ms against {url}")
+    print(f"{'mix':<10} {'conc':>5} {'req':>7} {'rps':>8} {'err%':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'lag p99':>8} {'rss MB':>8}")
+
+    steps = []
+    for mix_name in args.mix:
+        for concurrency in args.concurrency:
+            step = await run_step(url, mix_name, concurrency, args, pid, idle_probe_ms)
+            steps.append(step)
+            latency = step["latency_ms"]
+            print(f"{mix_name:<10} {concurrency:>5} {step['requests']:>7} {step['throughput_rps'] or 0:>8.2f} "
+                  f"{(step['error_rate'] or 0) * 100:>6.1f} {latency['p50'] or 0:>9.1f} {latency['p95'] or 0:>9.1f} "
+                  f"{latency['p99'] or 0:>9.1f} {step['loop_lag_ms']['p99'] or 0:>8.1f} {step['rss_mb']['max'] or 0:>8.1f}")
+            if args.cooldown:
+                await asyncio.sleep(args.cooldown)
+
+    return {
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "target": url,
+        "spawned": args.spawn,
+        "mock_args": args.mock_args if args.spawn else None,
+        "duration_s": args.duration,
+        "queries": args.queries,
+        "idle_probe_ms": round(idle_probe_ms, 2),
+        "steps": steps,
+        "saturation": saturation_points(steps),
+    }
+
+
+def saturation_points(steps: List[Dict[str, Any]], min_gain: float = 0.1) -> Dict[str, Optional[int]]:
+    """Per mix, the first concurrency after which raising concurrency adds less than min_gain throughput."""
+    points: Dict[str, Optional[int]] = {}
+    for mix_name in dict.fromkeys(step["mix"] for step in steps):
+        series = [step for step in steps if step["mix"] == mix_name]
+        points[mix_name] = None
+        for previous, current in zip(series, series[1:]):
+            if (current["throughput_rps"] or 0) < (previous["throughput_rps"] or 0) * (1 + min_gain):
+                points[mix_name] = previous["concurrency"]
+                break
+    return points
+
+
+def csv_list(cast: Callable[[str], Any]) -> Callable[[str], List[Any]]:
+    return lambda value: [cast(item.strip()) for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep concurrency and request mixes against the API")
+    parser.add_argument("--url", help="Base URL of a running app (ignored with --spawn)")
+    parser.add_argument("--pid", type=int, help="Server process id, for RSS sampling")
+    parser.add_argument("--spawn", action="store_true", help="Start mock_upstream.py and the app for the run")
+    parser.add_argument("--mock-args", default="--pages 3 --latency-ms 80 --jitter-ms 40",
+                        help="Extra mock_upstream.py arguments with --spawn")
+    parser.add_argument("--app-args", default="", help="Extra uvicorn arguments with --spawn (e.g. '--workers 2')")
+    parser.add_argument("--mix", type=csv_list(str), default=["zepto", "all"], help=f"Comma separated, of {', '.join(MIXES)}")
+    parser.add_argument("--concurrency", type=csv_list(int), default=[1, 4, 16, 32], help="Comma separated worker counts")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds per step")
+    parser.add_argument("--cooldown", type=float, default=2, help="Pause between steps")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout")
+    parser.add_argument("--probe-interval", type=float, default=0.25, help="Seconds between loop-lag probes")
+    parser.add_argument("--queries", type=csv_list(str), default=["milk", "bread", "eggs", "atta", "chocolate"])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=os.path.join(tempfile.gettempdir(), f"loadtest-{time.strftime('%Y%m%d-%H%M%S')}.json"),
+                        help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.mix if name not in MIXES]
+    if unknown:
+        parser.error(f"unknown mix {', '.join(unknown)}; choose from {', '.join(MIXES)}")
+    if not args.spawn and not args.url:
+        parser.error("give --url of a running app or --spawn")
+
+    processes: List[subprocess.Popen] = []
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as state_dir:
+        try:
+            if args.spawn:
+                url, pid, processes = spawn(args, state_dir)
+            else:
+                url, pid = args.url.rstrip("/"), args.pid
+            report = asyncio.run(sweep(url, pid, args))
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                try:
+                    process.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saturation (concurrency beyond which throughput grows <10%): {report['saturation']}")
+    print(f"Wrote {len(report['steps'])} steps to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
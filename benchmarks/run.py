@@ -0,0 +1,226 @@
+"""
+Offline benchmarks for the per-product hot path, driven by the payloads in sample_responses/.
+
+For each platform it times extraction, model_to_dict, JSON response encoding, CSV export
+streaming and DB row preparation on the sample payload replicated --replicas times, and
+measures peak and retained memory with tracemalloc in a separate pass.
+
+    python -m benchmarks.run                    # compare against benchmarks/baselines.json
+    python -m benchmarks.run --save-baseline    # record the current numbers as the baseline
+    python -m benchmarks.run --only extract     # cases whose name contains "extract"
+
+Exits with status 1 when a case is slower or uses more memory than its baseline by more
+than --threshold, and with status 2 when the baseline was recorded with a different
+workload (--replicas, --repeat or sample payloads), since its numbers are not comparable.
+"""
+import argparse
+import gc
+import json
+import hashlib
+import os
+import platform as host_platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLES_DIR = os.path.join(ROOT, "sample_responses")
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+SAMPLES = {
+    "blinkit": "blinkit_search_sample_response.json",
+    "instamart": "swiggy_search_sample_response.json",
+    "zepto": "zepto_search_sample_response.json",
+}
+EXCLUDE_FIELDS = ["id", "created_at", "updated_at"]
+
+
+def extractor(platform: str) -> Callable[[Dict[str, Any]], List[Any]]:
+    if platform == "blinkit":
+        from app.api.search_blinkit import extract_products
+        return extract_products
+    if platform == "instamart":
+        from app.api.search_instamart import extract_products
+        return extract_products
+    from app.api.search_zepto import extract_products
+    return lambda data: extract_products(data, "benchmark")
+
+
+def build_cases(replicas: int) -> List[Tuple[str, Callable[[], Any], int]]:
+    """(name, zero-argument callable, products processed per call) for every platform and stage."""
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from app.utils.format_utils import model_to_dict
+    from app.utils.export_utils import EXPORT_FIELDS, DEFAULT_BATCH_SIZE, CsvEncoder, _Compressor, _iter_export
+    from app.db.utils import product_to_row, dedupe_rows, snapshot_bucket
+
+    cases = []
+    for platform, filename in SAMPLES.items():
+        with open(os.path.join(SAMPLES_DIR, filename), encoding="utf-8") as f:
+            payload = json.load(f)
+        extract = extractor(platform)
+        products = extract(payload) * replicas
+        rows = [model_to_dict(product, EXCLUDE_FIELDS) for product in products]
+        count = len(products)
+        bucket = snapshot_bucket()
+
+        def run_extract(extract=extract, payload=payload):
+            for _ in range(replicas):
+                extract(payload)
+
+        def run_model_to_dict(products=products):
+            return [model_to_dict(product, EXCLUDE_FIELDS) for product in products]
+
+        def run_json_response(rows=rows):
+            # What FastAPI does for an endpoint returning a list of dicts without a response_model
+            return JSONResponse(jsonable_encoder(rows)).body
+
+        def run_csv_stream(rows=rows):
+            return b"".join(_iter_export(rows, CsvEncoder(list(EXPORT_FIELDS)), _Compressor("none"), DEFAULT_BATCH_SIZE))
+
+        def run_db_rows(products=products, bucket=bucket):
+            return dedupe_rows([product_to_row(product, bucket=bucket) for product in products])
+
+        cases += [
+            (f"extract.{platform}", run_extract, count),
+            (f"model_to_dict.{platform}", run_model_to_dict, count),
+            (f"json_response.{platform}", run_json_response, count),
+            (f"csv_stream.{platform}", run_csv_stream, count),
+            (f"db_rows.{platform}", run_db_rows, count),
+        ]
+    return cases
+
+
+def workload(replicas: int, repeat: int) -> Dict[str, Any]:
+    """Parameters that change what a case measures; baselines only compare under the same ones."""
+    samples = {}
+    for platform, filename in SAMPLES.items():
+        with open(os.path.join(SAMPLES_DIR, filename), "rb") as f:
+            samples[platform] = hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+    return {"replicas": replicas, "repeat": repeat, "samples": samples}
+
+
+def workload_mismatch(recorded: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    return [f"{key}: baseline {recorded.get(key)!r}, now {value!r}" for key, value in current.items() if recorded.get(key) != value]
+
+
+def measure(fn: Callable[[], Any], products: int, repeat: int) -> Dict[str, Any]:
+    fn()  # warm caches (lru_caches, lazy imports) outside the timed runs
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    result = fn()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    median = statistics.median(timings)
+    return {
+        "products": products,
+        "median_ms": round(median * 1000, 3),
+        "min_ms": round(min(timings) * 1000, 3),
+        "us_per_product": round(median / max(products, 1) * 1e6, 3),
+        "peak_kb": round((peak - before) / 1024, 1),
+        "retained_kb": round((after - before) / 1024, 1),
+    }
+
+
+def compare(results: Dict[str, Dict[str, Any]], baselines: Dict[str, Dict[str, Any]], threshold: float) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if not baseline:
+            continue
+        for metric in ("us_per_product", "peak_kb"):
+            old, new = baseline.get(metric), result[metric]
+            if old and new > old * (1 + threshold):
+                regressions.append(f"{name}: {metric} {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extraction, serialization and export on sample_responses")
+    parser.add_argument("--replicas", type=int, default=20, help="Times each sample payload is replicated")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case (the median is reported)")
+    parser.add_argument("--only", help="Run only cases whose name contains this text")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file to compare against or save to")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown / memory growth before flagging")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    # Keep benchmark runs off the network, disk state and storage backends
+    os.environ.setdefault("RAW_ARCHIVE_ENABLED", "false")
+    os.environ.setdefault("TRACING_ENABLED", "false")
+    sys.path.insert(0, ROOT)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for name, fn, products in build_cases(args.replicas):
+        if args.only and args.only not in name:
+            continue
+        results[name] = measure(fn, products, args.repeat)
+        r = results[name]
+        print(f"{name:<28} {r['products']:>7} products  {r['median_ms']:>10.2f} ms  "
+              f"{r['us_per_product']:>9.2f} us/product  peak {r['peak_kb']:>9.1f} KiB  retained {r['retained_kb']:>9.1f} KiB")
+
+    current = workload(args.replicas, args.repeat)
+    baselines, mismatch = {}, []
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            saved = json.load(f)
+        baselines = saved.get("cases", {})
+        mismatch = workload_mismatch(saved.get("workload", {}), current)
+
+    report = {
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "machine": f"{host_platform.system()} {host_platform.machine()}",
+        "workload": current,
+        "cases": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        if args.only and baselines:
+            if mismatch:
+                print(f"Not merging into {args.baseline}, it was recorded with a different workload "
+                      f"({'; '.join(mismatch)}); save the full baseline without --only")
+                sys.exit(2)
+            report["cases"] = {**baselines, **results}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline for {len(results)} cases to {args.baseline}")
+        return
+
+    if baselines and mismatch:
+        print(f"Baseline {args.baseline} was recorded with a different workload, not comparing:")
+        for line in mismatch:
+            print(f"  {line}")
+        sys.exit(2)
+    regressions = compare(results, baselines, args.threshold)
+    if not baselines:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+    elif regressions:
+        print(f"{len(regressions)} regressions beyond {args.threshold * 100:.0f}%:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    else:
+        print(f"No regressions beyond {args.threshold * 100:.0f}% against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Compare the upstream transports (app/core/transport.py) on throughput and client CPU per request.
+
+Each backend sends --requests requests as request_many batches with --concurrency in flight
+against a local keep-alive HTTP server running in a separate process, so only client-side work
+is measured. CPU includes child processes, which is where the curl CLI backend spends it.
+
+    python -m benchmarks.transport
+    python -m benchmarks.transport --backends requests,curl_multi --requests 2000 --concurrency 64
+    python -m benchmarks.transport --url http://127.0.0.1:9000/zepto/api/v3/search --method POST
+
+The stdlib server answers a few thousand requests per second; when every backend reports about
+the same throughput, the server is the bottleneck and CPU per request is the number to compare.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import statistics
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def serve(port: int, size: int, ready) -> None:
+    payload = json.dumps({"data": "x" * max(0, size - 12)}).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = do_POST = _reply
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    ready.set()
+    server.serve_forever()
+
+
+def cpu_seconds() -> float:
+    usage = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return sum(u.ru_utime + u.ru_stime for u in usage)
+
+
+def run_backend(name: str, url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    from app.core.transport import get_transport, TransportRequest, TransportError
+
+    transport = get_transport(name)
+    body = args.body if args.method == "POST" else None
+    requests = [TransportRequest(args.method, url, {"content-type": "application/json"}, data=body, timeout=30)
+                for _ in range(args.requests)]
+    transport.request_many(requests[:args.concurrency], args.concurrency)  # warm connections and sessions
+
+    walls, cpus, errors, received = [], [], 0, 0
+    for _ in range(args.repeat):
+        cpu_start, start = cpu_seconds(), time.perf_counter()
+        results = []
+        for offset in range(0, len(requests), args.batch):
+            results += transport.request_many(requests[offset:offset + args.batch], args.concurrency)
+        walls.append(time.perf_counter() - start)
+        cpus.append(cpu_seconds() - cpu_start)
+        errors = sum(1 for r in results if isinstance(r, TransportError) or r.status_code != 200)
+        received = sum(len(r.content) for r in results if not isinstance(r, TransportError))
+    transport.close()
+
+    wall, cpu = statistics.median(walls), statistics.median(cpus)
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "errors": errors,
+        "bytes": received,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(args.requests / wall, 1),
+        "cpu_ms_per_request": round(cpu / args.requests * 1000, 3),
+        "cpu_utilisation": round(cpu / wall, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTTP transport backends against a local server")
+    parser.add_argument("--backends", default="requests,cloudscraper,curl,curl_multi", help="Comma separated backends")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per run")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight")
+    parser.add_argument("--batch", type=int, default=1000, help="Requests per request_many call")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per backend (the median is reported)")
+    parser.add_argument("--size", type=int, default=20000, help="Response size in bytes from the local server")
+    parser.add_argument("--url", help="Target URL instead of the local server (e.g. a mock_upstream.py endpoint)")
+    parser.add_argument("--method", default="GET", choices=["GET", "POST"])
+    parser.add_argument("--body", default='{"query": "milk", "pageNumber": 0}', help="Request body for POST")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+    sys.path.insert(0, ROOT)
+
+    server = None
+    url = args.url
+    if not url:
+        import socket
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        ready = multiprocessing.Event()
+        server = multiprocessing.Process(target=serve, args=(port, args.size, ready), daemon=True)
+        server.start()
+        ready.wait(10)
+        url = f"http://127.0.0.1:{port}/bench"
+
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        for name in [b.strip() for b in args.backends.split(",") if b.strip()]:
+            try:
+                results[name] = run_backend(name, url, args)
+            except ImportError as e:
+                print(f"{name:<13} skipped: {e}")
+                continue
+            r = results[name]
+            print(f"{name:<13} {r['throughput_rps']:>9.1f} req/s  {r['cpu_ms_per_request']:>8.3f} ms CPU/req  "
+                  f"CPU {r['cpu_utilisation']:>5.2f}  errors {r['errors']}")
+    finally:
+        if server is not None:
+            server.terminate()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"url": url, "method": args.method, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
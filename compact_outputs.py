@@ -0,0 +1,128 @@
+import argparse
+import csv
+import io
+import os
+import json
+import re
+import zipfile
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import DATASET_LAYOUT
+from app.utils.dataset_utils import DATASET_LAYOUTS, ParquetDatasetSink, compact_partitions
+
+# Sources already written to a dataset, so re-running a conversion does not append their rows twice
+# (the leading underscore keeps the file out of dataset reads)
+MANIFEST_NAME = "_converted.json"
+
+# blinkit_vegetables_12.85_77.62.csv (scrape_blinkit2.py) or Vegetables/blinkit_12.85_77.62.csv (zipped exports)
+FILENAME_PATTERN = re.compile(r"^(?P<platform>[a-z]+)_(?:(?P<query>.+?)_)?(?P<lat>-?\d+(?:\.\d+)?)_(?P<lon>-?\d+(?:\.\d+)?)\.csv$")
+
+
+def parse_output_name(path: str) -> Optional[Tuple[str, str, str]]:
+    match = FILENAME_PATTERN.match(os.path.basename(path))
+    if not match:
+        return None
+    query = match.group("query") or os.path.basename(os.path.dirname(path)) or "unknown"
+    return match.group("platform"), query, f"{match.group('lat')},{match.group('lon')}"
+
+
+def iter_csv_sources(inputs: List[str]) -> Iterator[Tuple[str, datetime, io.TextIOBase]]:
+    for source in inputs:
+        if zipfile.is_zipfile(source):
+            with zipfile.ZipFile(source) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or not info.filename.endswith(".csv"):
+                        continue
+                    with archive.open(info) as raw:
+                        yield info.filename, datetime(*info.date_time), io.TextIOWrapper(raw, encoding="utf-8")
+        elif os.path.isdir(source):
+            for directory, _, files in os.walk(source):
+                for name in sorted(files):
+                    if not name.endswith(".csv"):
+                        continue
+                    path = os.path.join(directory, name)
+                    with open(path, newline="", encoding="utf-8") as f:
+                        yield path, datetime.fromtimestamp(os.path.getmtime(path)), f
+        elif source.endswith(".csv"):
+            with open(source, newline="", encoding="utf-8") as f:
+                yield source, datetime.fromtimestamp(os.path.getmtime(source)), f
+
+
+def source_key(name: str, modified: datetime) -> str:
+    return f"{name}@{modified.isoformat()}"
+
+
+def load_manifest(dataset_root: str) -> Dict[str, int]:
+    path = os.path.join(dataset_root, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(dataset_root: str, manifest: Dict[str, int]) -> None:
+    path = os.path.join(dataset_root, MANIFEST_NAME)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def convert(inputs: List[str], dataset_root: str, city: str, scrape_date: Optional[str] = None, layout: str = DATASET_LAYOUT) -> Dict[str, int]:
+    stats = {"files": 0, "skipped": 0, "already_converted": 0, "rows": 0}
+    fixed_date = datetime.strptime(scrape_date, "%Y-%m-%d").date() if scrape_date else None
+    manifest = load_manifest(dataset_root)
+    converted: Dict[str, int] = {}
+
+    with ParquetDatasetSink(dataset_root, layout=layout) as sink:
+        for name, modified, handle in iter_csv_sources(inputs):
+            parsed = parse_output_name(name)
+            if not parsed:
+                print(f"Skipping {name}: unrecognised file name")
+                stats["skipped"] += 1
+                continue
+            key = source_key(name, modified)
+            if key in manifest:
+                stats["already_converted"] += 1
+                continue
+            platform, query, coordinates = parsed
+            rows = list(csv.DictReader(handle))
+            sink.append(
+                rows,
+                platform=platform,
+                query=rows[0].get("search_query") or query if rows else query,
+                city=city,
+                scrape_date=fixed_date or modified.date(),
+                coordinates=coordinates
+            )
+            converted[key] = len(rows)
+            stats["files"] += 1
+            stats["rows"] += len(rows)
+    # Recorded only once the sink has flushed, so an interrupted run converts the same sources again
+    if converted:
+        save_manifest(dataset_root, {**manifest, **converted})
+    stats["parquet_files"] = sink.files_written
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert per-(query, centroid) CSV outputs into the partitioned Parquet dataset")
+    parser.add_argument("inputs", nargs="*", help="CSV files, directories of CSVs or zip archives")
+    parser.add_argument("--dataset-root", default="dataset", help="Root directory of the Parquet dataset")
+    parser.add_argument("--city", default="unknown", help="City partition for the converted files")
+    parser.add_argument("--date", help="Scrape date (YYYY-MM-DD); defaults to each file's modification date")
+    parser.add_argument("--layout", choices=DATASET_LAYOUTS, default=DATASET_LAYOUT, help="wide rows, or facts plus deduplicated product dimensions")
+    parser.add_argument("--compact", action="store_true", help="Merge partitions holding several part files into one")
+    args = parser.parse_args()
+
+    if args.inputs:
+        stats = convert(args.inputs, args.dataset_root, args.city, args.date, args.layout)
+        print(f"Converted {stats['files']} CSV files ({stats['rows']} rows) into {stats['parquet_files']} Parquet files, "
+              f"skipped {stats['skipped']}, {stats['already_converted']} already converted")
+    if args.compact:
+        print(f"Compacted {compact_partitions(args.dataset_root)} partitions")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,157 @@
--- Table creation for Blinkit products
-CREATE TABLE IF NOT EXISTS blinkit_products (
-    id VARCHAR PRIMARY KEY,
-    search_query VARCHAR,
-    product_id VARCHAR NOT NULL,
-    product_name VARCHAR NOT NULL,
-    display_name VARCHAR,
-    price FLOAT NOT NULL,
-    mrp FLOAT,
-    unit VARCHAR,
-    quantity FLOAT,
+-- Current schema for a fresh Postgres / Supabase database.
+-- app/db/migrations.sql applies the same tables incrementally to an existing database;
+-- keep both in step when a table changes.
+
+-- Latest scraped row per variant, store and snapshot bucket
+CREATE TABLE IF NOT EXISTS products (
+    id TEXT PRIMARY KEY,
+    platform TEXT NOT NULL,
+    search_query TEXT,
+    store_id TEXT,
+    product_id TEXT NOT NULL,
+    variant_id TEXT,
+    name TEXT NOT NULL,
+    brand TEXT,
+    mrp DECIMAL,
+    price DECIMAL NOT NULL,
+    quantity TEXT,
+    quantity_value DECIMAL,  -- normalized to kg, l or pc
+    quantity_unit TEXT,
+    unit_price DECIMAL,      -- price per kg / litre / piece
+    in_stock BOOLEAN DEFAULT FALSE,
     inventory INTEGER,
-    brand VARCHAR,
-    merchant_id VARCHAR,
-    merchant_type VARCHAR,
-    group_id VARCHAR,
-    is_sold_out BOOLEAN DEFAULT FALSE,
-    product_state VARCHAR,
-    is_variant BOOLEAN DEFAULT FALSE,
+    max_allowed_quantity INTEGER,
+    category TEXT,
+    sub_category TEXT,
+    images TEXT[],
+    organic_rank INTEGER,
+    page INTEGER,
+    rating DECIMAL,
+    platform_specific_details JSONB,
+    snapshot_bucket TIMESTAMP WITH TIME ZONE,
+    content_hash TEXT,
+    canonical_id TEXT,
+    new_listing BOOLEAN DEFAULT FALSE,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
--- Create index on product_id for faster lookups
-CREATE INDEX IF NOT EXISTS idx_blinkit_products_product_id ON blinkit_products(product_id);
+CREATE INDEX IF NOT EXISTS idx_products_platform ON products(platform);
+CREATE INDEX IF NOT EXISTS idx_products_product_id ON products(product_id);
+CREATE INDEX IF NOT EXISTS idx_products_store_id ON products(store_id);
+CREATE INDEX IF NOT EXISTS idx_products_variant_id ON products(variant_id);
+CREATE INDEX IF NOT EXISTS idx_products_canonical_id ON products(canonical_id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_products_snapshot
+    ON products(platform, store_id, variant_id, snapshot_bucket);
 
--- Create a trigger to automatically update the updated_at timestamp
-CREATE OR REPLACE FUNCTION update_updated_at_column()
+CREATE OR REPLACE FUNCTION trigger_set_timestamp()
 RETURNS TRIGGER AS $$
 BEGIN
-    NEW.updated_at = CURRENT_TIMESTAMP;
-    RETURN NEW;
+  NEW.updated_at = CURRENT_TIMESTAMP;
+  RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
 
-CREATE TRIGGER trigger_update_blinkit_products_updated_at
-BEFORE UPDATE ON blinkit_products
+CREATE TRIGGER set_timestamp
+BEFORE UPDATE ON products
 FOR EACH ROW
-EXECUTE FUNCTION update_updated_at_column();
+EXECUTE FUNCTION trigger_set_timestamp();
 
--- Function to automatically set UUID for new records if not provided
-CREATE OR REPLACE FUNCTION set_uuid_if_not_provided()
-RETURNS TRIGGER AS $$
+-- Price/stock history, partitioned by day on scraped_at
+CREATE TABLE IF NOT EXISTS product_snapshots (
+    platform TEXT NOT NULL,
+    store_id TEXT NOT NULL,
+    variant_id TEXT NOT NULL,
+    scraped_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    price DECIMAL,
+    mrp DECIMAL,
+    in_stock BOOLEAN,
+    inventory INTEGER,
+    organic_rank INTEGER,
+    attr_hash TEXT,  -- product_dim version the row was scraped with
+    PRIMARY KEY (platform, store_id, variant_id, scraped_at)
+) PARTITION BY RANGE (scraped_at);
+
+CREATE INDEX IF NOT EXISTS idx_snapshots_variant_store_time
+    ON product_snapshots(platform, variant_id, store_id, scraped_at);
+
+-- Catches rows for days whose partition has not been created yet
+CREATE TABLE IF NOT EXISTS product_snapshots_default PARTITION OF product_snapshots DEFAULT;
+
+-- Creates the partition for one day, moving rows for that day out of the default partition first
+CREATE OR REPLACE FUNCTION create_product_snapshots_partition(day DATE)
+RETURNS VOID AS $$
+DECLARE
+  partition_name TEXT := 'product_snapshots_' || to_char(day, 'YYYYMMDD');
 BEGIN
-    IF NEW.id IS NULL THEN
-        NEW.id = uuid_generate_v4()::text;
-    END IF;
-    RETURN NEW;
+  PERFORM pg_advisory_xact_lock(hashtext(partition_name));
+  IF to_regclass(partition_name) IS NOT NULL THEN
+    RETURN;
+  END IF;
+  EXECUTE format(
+    'CREATE TABLE %I (LIKE product_snapshots INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+    partition_name
+  );
+  EXECUTE format(
+    'WITH moved AS (DELETE FROM product_snapshots_default WHERE scraped_at >= %L AND scraped_at < %L RETURNING *) '
+    'INSERT INTO %I SELECT * FROM moved',
+    day, day + 1, partition_name
+  );
+  EXECUTE format(
+    'ALTER TABLE product_snapshots ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+    partition_name, day, day + 1
+  );
 END;
 $$ LANGUAGE plpgsql;
 
-CREATE TRIGGER trigger_set_blinkit_products_uuid
-BEFORE INSERT ON blinkit_products
-FOR EACH ROW
-EXECUTE FUNCTION set_uuid_if_not_provided();
+-- Change log written by the diff stage between consecutive scrapes
+CREATE TABLE IF NOT EXISTS product_changes (
+    id TEXT PRIMARY KEY,
+    detected_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    change_type TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    store_id TEXT,
+    variant_id TEXT,
+    product_id TEXT,
+    search_query TEXT,
+    location TEXT,
+    name TEXT,
+    brand TEXT,
+    category TEXT,
+    old_price DECIMAL,
+    new_price DECIMAL,
+    old_in_stock BOOLEAN,
+    new_in_stock BOOLEAN,
+    old_rank INTEGER,
+    new_rank INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS idx_changes_platform_store_time ON product_changes(platform, store_id, detected_at);
+CREATE INDEX IF NOT EXISTS idx_changes_detected_at ON product_changes(detected_at);
+
+-- Normalized layout: static attributes once per variant version
+CREATE TABLE IF NOT EXISTS product_dim (
+    platform TEXT NOT NULL,
+    variant_id TEXT NOT NULL,
+    product_id TEXT,
+    name TEXT,
+    brand TEXT,
+    quantity TEXT,
+    quantity_value DECIMAL,
+    quantity_unit TEXT,
+    category TEXT,
+    sub_category TEXT,
+    images TEXT[],  -- prefix ids from image_prefixes in place of the shared URL prefix
+    rating DECIMAL,
+    canonical_id TEXT,
+    attr_hash TEXT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (platform, variant_id, attr_hash)
+);
+
+CREATE INDEX IF NOT EXISTS idx_product_dim_canonical_id ON product_dim(canonical_id);
 
--- Make sure the uuid-ossp extension is enabled for uuid_generate_v4()
-CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+CREATE TABLE IF NOT EXISTS image_prefixes (
+    id TEXT PRIMARY KEY,
+    prefix TEXT NOT NULL
+);
@@ -0,0 +1,430 @@
+"""
+Local stand-in for the platform APIs, for end-to-end and load tests without touching the live sites.
+
+Every platform is served under its own prefix (/blinkit, /bigbasket, /instamart, /zepto), which
+is where the adapters send traffic when MOCK_UPSTREAM_URL is set:
+
+    python mock_upstream.py --port 9000 --pages 3 --latency-ms 150 --rate-429 0.02
+    MOCK_UPSTREAM_URL=http://127.0.0.1:9000 uvicorn app.main:app
+
+Replay: a request is answered from a recording with the same key when there is one, otherwise
+from a synthetic response built on sample_responses/ with pagination rewritten (blinkit
+next_url, instamart hasMorePages / hasMore, zepto currentPage, bigbasket page size) so the
+adapters walk --pages pages. Faults (latency, 429s, challenge pages, 5xx errors, truncated JSON)
+are drawn per request and can be changed at runtime with POST /__mock/faults; counters are
+at GET /__mock/stats.
+
+Record (--record): requests are forwarded to the real hosts and successful responses are saved
+to --recordings-dir for later replay. Zepto search requests need headers from a browser capture;
+with --zepto-curls the capture endpoint hands out the templates saved there by the app.
+"""
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import functools
+import threading
+from contextlib import asynccontextmanager
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SAMPLES_DIR = os.path.join(ROOT, "sample_responses")
+
+UPSTREAM_HOSTS = {
+    "blinkit": "https://blinkit.com",
+    "bigbasket": "https://www.bigbasket.com",
+    "instamart": "https://www.swiggy.com",
+    "zepto": "https://api.zeptonow.com",
+}
+SAMPLES = {
+    "blinkit": "blinkit_search_sample_response.json",
+    "instamart": "swiggy_search_sample_response.json",
+    "zepto": "zepto_search_sample_response.json",
+}
+BIGBASKET_PAGE_SIZE = 30
+# Request headers not forwarded in record mode
+HOP_HEADERS = {"host", "content-length", "connection", "accept-encoding", "transfer-encoding"}
+# Keys of JSON request bodies that identify the page being asked for
+BODY_KEY_FIELDS = ("query", "pageNumber", "page", "offset")
+
+CHALLENGE_PAGE = (
+    "<!DOCTYPE html><html><head><title>Just a moment...</title></head>"
+    "<body><h1>Checking your browser before accessing the site.</h1>"
+    "<noscript>Enable JavaScript and cookies to continue</noscript></body></html>"
+)
+
+
+class Faults:
+    """Per-request fault probabilities and added latency; rates are drawn independently in order."""
+
+    FIELDS = ("latency_ms", "jitter_ms", "rate_429", "rate_challenge", "rate_error", "rate_truncated")
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, rate_429: float = 0, rate_challenge: float = 0,
+                 rate_error: float = 0, rate_truncated: float = 0, platforms: List[str] = None, seed: int = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.rate_challenge = rate_challenge
+        self.rate_error = rate_error
+        self.rate_truncated = rate_truncated
+        # Faults only apply to these platforms (all when empty)
+        self.platforms = platforms or []
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def update(self, values: Dict[str, Any]) -> None:
+        with self._lock:
+            for field in self.FIELDS:
+                if field in values:
+                    setattr(self, field, float(values[field]))
+            if "platforms" in values:
+                self.platforms = list(values["platforms"] or [])
+            if values.get("seed") is not None:
+                self.random.seed(values["seed"])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**{field: getattr(self, field) for field in self.FIELDS}, "platforms": self.platforms}
+
+    def draw(self, platform: str) -> Tuple[float, Optional[str]]:
+        """Seconds of added latency and the fault to inject, if any."""
+        with self._lock:
+            delay = max(0.0, self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            if self.platforms and platform not in self.platforms:
+                return delay, None
+            for fault, rate in (("429", self.rate_429), ("challenge", self.rate_challenge),
+                                ("error", self.rate_error), ("truncated", self.rate_truncated)):
+                if rate and self.random.random() < rate:
+                    return delay, fault
+        return delay, None
+
+
+class RecordingStore:
+    """Recorded responses as one JSON file per request key under <root>/<platform>/."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._index: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+        if os.path.isdir(root):
+            for platform in os.listdir(root):
+                directory = os.path.join(root, platform)
+                if not os.path.isdir(directory):
+                    continue
+                for name in os.listdir(directory):
+                    if name.endswith(".json"):
+                        self._index[(platform, name[:-5])] = os.path.join(directory, name)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @staticmethod
+    def digest(key: str) -> str:
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=10).hexdigest()
+
+    def get(self, platform: str, key: str) -> Optional[Dict[str, Any]]:
+        path = self._index.get((platform, self.digest(key)))
+        if path is None:
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def put(self, platform: str, key: str, status: int, content_type: str, body: bytes) -> None:
+        digest = self.digest(key)
+        path = os.path.join(self.root, platform, digest + ".json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = {
+            "key": key,
+            "recorded_at": time.time(),
+            "status": status,
+            "content_type": content_type,
+            "body": body.decode("utf-8", errors="replace"),
+        }
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        os.replace(path + ".tmp", path)
+        with self._lock:
+            self._index[(platform, digest)] = path
+
+
+def request_key(method: str, path: str, params: Dict[str, str], body: bytes) -> str:
+    """Identity of a request for replay: method, path, sorted query params and the paging fields of a JSON body."""
+    key = f"{method} /{path.strip('/')}"
+    if params:
+        key += "?" + urlencode(sorted(params.items()))
+    if body:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            fields = {name: data[name] for name in BODY_KEY_FIELDS if name in data}
+            if fields:
+                key += " " + json.dumps(fields, sort_keys=True)
+    return key
+
+
+@functools.lru_cache(maxsize=None)
+def load_sample(platform: str) -> Dict[str, Any]:
+    with open(os.path.join(SAMPLES_DIR, SAMPLES[platform]), encoding="utf-8") as f:
+        return json.load(f)
+
+
+@functools.lru_cache(maxsize=None)
+def instamart_sample_size() -> int:
+    widgets = load_sample("instamart").get("data", {}).get("widgets", []) or []
+    return sum(len(item.get("variations", []) or []) for widget in widgets
+               for item in widget.get("data", []) or [] if isinstance(item, dict)) or 1
+
+
+def with_path(data: Dict[str, Any], path: Tuple[str, ...], updates: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of `data` with the dict at `path` updated, sharing every untouched branch with the original."""
+    if not path:
+        return {**data, **updates}
+    return {**data, path[0]: with_path(data.get(path[0]) or {}, path[1:], updates)}
+
+
+def bigbasket_page(query: str, page: int, pages: int) -> Dict[str, Any]:
+    count = BIGBASKET_PAGE_SIZE if page < pages else BIGBASKET_PAGE_SIZE // 3
+    slug = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-") or "item"
+    products = []
+    for i in range(count):
+        rank = (page - 1) * BIGBASKET_PAGE_SIZE + i
+        mrp = 40 + (rank * 7) % 160
+        products.append({
+            "id": 40000000 + int(hashlib.md5(f"{slug}:{rank}".encode()).hexdigest()[:6], 16),
+            "desc": f"Mock {query} {rank + 1}",
+            "w": f"{(rank % 4 + 1) * 250} g",
+            "brand": {"name": f"Brand {rank % 7}"},
+            "pricing": {"discount": {"mrp": str(mrp), "prim_price": {"sp": str(round(mrp * 0.9, 2))}}},
+            "availability": {"button": "Add", "avail_status": "001"},
+            "category": {"tlc_name": "Fruits & Vegetables", "mlc_name": "Fresh Vegetables"},
+            "images": [{"l": f"https://www.bbassets.com/media/uploads/p/l/{slug}-{rank}.jpg"}],
+            "visibility": {"fc_id": 236},
+            "rating_info": {"avg_rating": round(3.5 + (rank % 15) / 10, 1)},
+        })
+    return {"tabs": [{"tab_name": "All", "product_info": {"products": products}}]}
+
+
+def zepto_capture(query: str, pages: int, base_url: str) -> Dict[str, Any]:
+    """Request templates shaped like the app's Playwright capture, one per page."""
+    return {"requests": [{
+        "url": f"{base_url}/api/v3/search",
+        "method": "POST",
+        "headers": {
+            "content-type": "application/json",
+            "accept": "application/json, text/plain, */*",
+            "storeid": "REPLACE_ME_STORE_ID",
+        },
+        "body": json.dumps({"query": query, "pageNumber": page, "mode": "AUTOSUGGEST"}),
+    } for page in range(pages)]}
+
+
+def synthetic_response(platform: str, path: str, params: Dict[str, str], body: bytes, pages: int,
+                       base_url: str) -> Optional[Any]:
+    """A response for endpoints the adapters call, built from the samples; None for unknown paths."""
+    path = "/" + path.strip("/")
+    if platform == "blinkit":
+        if path == "/v1/layout/categories":
+            names = ("vegetables-fruits", "dairy-breakfast", "munchies", "cold-drinks-juices", "atta-rice-dal")
+            return {"response": {"snippets": [
+                {"data": {"click_action": {"url": f"/cn/{name}/{name}/cid/{i + 1}/{(i + 1) * 10}"}}}
+                for i, name in enumerate(names)
+            ]}}
+        if path in ("/v1/layout/search", "/v1/layout/listing_widgets"):
+            page = int(params.get("mock_page", 1))
+            next_url = f"{path}?{urlencode({**params, 'mock_page': page + 1})}" if page < pages else None
+            return with_path(load_sample("blinkit"), ("response", "pagination"), {"next_url": next_url})
+    elif platform == "instamart":
+        if path == "/api/instamart/search":
+            page = int(params.get("pageNumber", 0))
+            return with_path(load_sample("instamart"), ("data",), {"pageNumber": page, "hasMorePages": page < pages - 1})
+        if path == "/api/instamart/home":
+            names = ("Fresh Vegetables", "Fresh Fruits", "Dairy, Bread and Eggs", "Munchies")
+            return {"data": {"widgets": [{"data": [
+                {"action": {"link": f"swiggy://stores/instamart/category-listing?{urlencode({'categoryName': name})}"}}
+                for name in names
+            ]}]}}
+        if path == "/api/instamart/category-listing":
+            size = instamart_sample_size()
+            offset = int(params.get("offset", 0) or 0)
+            return with_path(load_sample("instamart"), ("data",),
+                             {"hasMore": offset // size < pages - 1, "offset": offset + size})
+    elif platform == "zepto":
+        if path == "/__capture":
+            return zepto_capture(params.get("query", ""), min(pages, int(params.get("max_pages", pages))), base_url)
+        if path == "/api/v3/search":
+            try:
+                page = int(json.loads(body or b"{}").get("pageNumber", 0))
+            except (ValueError, AttributeError):
+                page = 0
+            return {**load_sample("zepto"), "currentPage": page, "hasReachedEnd": page >= pages - 1}
+    elif platform == "bigbasket":
+        if path == "/":
+            return "<html><head><title>bigbasket</title></head><body></body></html>"
+        if path == "/ui-svc/v1/category-tree":
+            return {"categories": [{"url": f"/pc/fruits-vegetables/{leaf}/"}
+                                   for leaf in ("fresh-vegetables", "fresh-fruits", "herbs-seasonings")]}
+        if path == "/listing-svc/v2/products":
+            return bigbasket_page(params.get("slug", ""), int(params.get("page", 1) or 1), pages)
+    return None
+
+
+@functools.lru_cache(maxsize=512)
+def render_synthetic(platform: str, path: str, params: Tuple[Tuple[str, str], ...], body: bytes, pages: int,
+                     base_url: str) -> Tuple[Optional[bytes], str]:
+    """Encoded synthetic response and its media type; cached so the mock stays cheap under load."""
+    data = synthetic_response(platform, path, dict(params), body, pages, base_url)
+    if data is None:
+        return None, "application/json"
+    if isinstance(data, str):
+        return data.encode("utf-8"), "text/html"
+    return json.dumps(data, separators=(",", ":")).encode("utf-8"), "application/json"
+
+
+def fault_response(fault: str) -> Response:
+    if fault == "429":
+        return JSONResponse({"error": "Too Many Requests"}, status_code=429, headers={"Retry-After": "5"})
+    if fault == "challenge":
+        return Response(CHALLENGE_PAGE, status_code=403, media_type="text/html", headers={"cf-mitigated": "challenge"})
+    if fault == "truncated":
+        return Response(b'{"response": {"snippets": [{"data": ', media_type="application/json")
+    return JSONResponse({"error": "mock upstream error"}, status_code=503)
+
+
+def load_zepto_templates(curl_dir: str, query: str, base_url: str) -> Optional[Dict[str, Any]]:
+    """Templates captured by the app for this query, pointed at the mock so they are recorded on the way through."""
+    path = os.path.join(curl_dir, f"{query.lower().replace(' ', '-')}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        captured = json.load(f)["requests"]
+    for request in captured:
+        request["url"] = re.sub(r"^https?://[^/]+", base_url, request["url"])
+    return {"requests": captured}
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    client = None
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        yield
+        if client is not None:
+            await client.aclose()
+
+    app = FastAPI(title="Mock upstream", lifespan=lifespan)
+    faults = Faults(args.latency_ms, args.jitter_ms, args.rate_429, args.rate_challenge, args.rate_error,
+                    args.rate_truncated, args.fault_platforms, args.seed)
+    recordings = RecordingStore(args.recordings_dir)
+    stats: Counter = Counter()
+    state: Dict[str, Any] = {"pages": args.pages}
+
+    if args.record:
+        import httpx
+        client = httpx.AsyncClient(timeout=30, follow_redirects=True)
+
+    @app.get("/__mock/stats")
+    async def get_stats():
+        return {"mode": "record" if args.record else "replay", "pages": state["pages"],
+                "recordings": len(recordings), "faults": faults.to_dict(), "counts": dict(stats)}
+
+    @app.post("/__mock/faults")
+    async def set_faults(request: Request):
+        values = await request.json()
+        faults.update(values)
+        if "pages" in values:
+            state["pages"] = max(1, int(values["pages"]))
+        return {"faults": faults.to_dict(), "pages": state["pages"]}
+
+    @app.post("/__mock/reset")
+    async def reset_stats():
+        stats.clear()
+        return {"ok": True}
+
+    @app.api_route("/{platform}/{path:path}", methods=["GET", "POST"])
+    async def upstream(platform: str, path: str, request: Request):
+        if platform not in UPSTREAM_HOSTS:
+            return JSONResponse({"error": f"unknown platform '{platform}'"}, status_code=404)
+        stats[f"{platform}.requests"] += 1
+        params = dict(request.query_params)
+        body = await request.body()
+        base_url = f"{str(request.base_url).rstrip('/')}/{platform}"
+
+        delay, fault = faults.draw(platform)
+        if delay:
+            await asyncio.sleep(delay)
+        if fault:
+            stats[f"{platform}.fault.{fault}"] += 1
+            return fault_response(fault)
+
+        key = request_key(request.method, path, params, body)
+        if client is not None:
+            if platform == "zepto" and path.strip("/") == "__capture":
+                captured = load_zepto_templates(args.zepto_curls, params.get("query", ""), base_url) if args.zepto_curls else None
+                if captured is None:
+                    return JSONResponse({"error": "no captured zepto request templates for this query"}, status_code=404)
+                return captured
+            headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_HEADERS}
+            upstream_response = await client.request(request.method, f"{UPSTREAM_HOSTS[platform]}/{path}",
+                                                     params=params, content=body, headers=headers)
+            content_type = upstream_response.headers.get("content-type", "application/json")
+            stats[f"{platform}.upstream.{upstream_response.status_code}"] += 1
+            if upstream_response.status_code == 200:
+                recordings.put(platform, key, 200, content_type, upstream_response.content)
+                stats[f"{platform}.recorded"] += 1
+            return Response(upstream_response.content, status_code=upstream_response.status_code, media_type=content_type)
+
+        recorded = recordings.get(platform, key)
+        if recorded is not None:
+            stats[f"{platform}.replayed"] += 1
+            return Response(recorded["body"], status_code=recorded["status"], media_type=recorded["content_type"])
+        if args.strict:
+            stats[f"{platform}.unmatched"] += 1
+            return JSONResponse({"error": f"no recording for {key}"}, status_code=404)
+
+        content, media_type = render_synthetic(platform, path, tuple(sorted(params.items())), body, state["pages"], base_url)
+        if content is None:
+            stats[f"{platform}.unmatched"] += 1
+            return JSONResponse({"error": f"no mock for /{path}"}, status_code=404)
+        stats[f"{platform}.synthetic"] += 1
+        return Response(content, media_type=media_type)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record/replay mock of the platform APIs with fault injection")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--recordings-dir", default=os.path.join(ROOT, "outputs", "mock_recordings"),
+                        help="Where recordings are read from and written to")
+    parser.add_argument("--record", action="store_true", help="Forward to the real hosts and save the responses")
+    parser.add_argument("--zepto-curls", default=os.path.join(ROOT, "curls", "zepto"),
+                        help="Captured zepto request templates handed out in record mode")
+    parser.add_argument("--strict", action="store_true", help="Answer 404 instead of a synthetic response when nothing was recorded")
+    parser.add_argument("--pages", type=int, default=3, help="Result pages per synthetic search or category listing")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Uniform +/- jitter on the added latency")
+    parser.add_argument("--rate-429", type=float, default=0, help="Share of requests answered 429 Too Many Requests")
+    parser.add_argument("--rate-challenge", type=float, default=0, help="Share answered with a 403 bot challenge page")
+    parser.add_argument("--rate-error", type=float, default=0, help="Share answered with a 5xx error")
+    parser.add_argument("--rate-truncated", type=float, default=0, help="Share answered 200 with truncated JSON")
+    parser.add_argument("--fault-platforms", nargs="*", help="Only inject faults for these platforms")
+    parser.add_argument("--seed", type=int, help="Seed for fault draws, for repeatable runs")
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
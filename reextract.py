@@ -0,0 +1,145 @@
+import argparse
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.archive import RawArchive
+from app.core.config import RAW_ARCHIVE_DIR, DATASET_LAYOUT, MATCHING_ENABLED
+
+EXCLUDE_FIELDS = ["id", "created_at", "updated_at"]
+
+_archive: Optional[RawArchive] = None
+
+
+def _init_worker(root: str) -> None:
+    global _archive
+    _archive = RawArchive(root)
+
+
+def extract(platform: str, kind: str, query: str, page: Optional[str], response_data: Dict[str, Any]) -> List[Any]:
+    """Run the platform's current extractor exactly as the live adapter does for this kind of page."""
+    if platform == "blinkit":
+        from app.api.search_blinkit import extract_products
+        products = extract_products(response_data)
+        if kind == "category":
+            for product in products:
+                product.search_query = query
+        return products
+    if platform == "bigbasket":
+        from app.api.search_bigbasket import extract_products_bigbasket, BIGBASKET_PAGE_SIZE
+        products = extract_products_bigbasket(response_data, query)
+        page_number = int(page or 1)
+        for idx, product in enumerate(products):
+            product.organic_rank = (page_number - 1) * BIGBASKET_PAGE_SIZE + idx + 1
+        return products
+    if platform == "instamart":
+        from app.api.search_instamart import extract_products, extract_listing_products
+        if kind == "category":
+            return extract_listing_products(response_data, query, int(page or 0))
+        return extract_products(response_data)
+    if platform == "zepto":
+        from app.api.search_zepto import extract_products
+        return extract_products(response_data, query) or []
+    raise ValueError(f"No extractor for platform '{platform}'")
+
+
+def reextract_entry(entry: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]], Optional[str]]:
+    from app.utils.format_utils import model_to_dict
+    from app.utils.quantity_utils import set_unit_prices
+
+    try:
+        response_data = json.loads(_archive.read(entry["digest"]))
+        products = extract(entry["platform"], entry["kind"], entry["query"], entry["page"], response_data)
+        set_unit_prices(products)
+        return entry, [model_to_dict(product, EXCLUDE_FIELDS) for product in products], None
+    except Exception as e:
+        return entry, [], f"{type(e).__name__}: {e}"
+
+
+def save_to_db(entry: Dict[str, Any], rows: List[Dict[str, Any]]) -> bool:
+    from app.db.models import Product
+    from app.db.utils import product_to_row, save_rows_to_db, snapshot_bucket
+    from app.core.matching import product_matcher
+
+    products = [Product(**row) for row in rows]
+    if MATCHING_ENABLED:
+        product_matcher.assign_products(products)
+    # Snapshots land in the bucket of the original fetch, not the time of the backfill
+    bucket = snapshot_bucket(datetime.fromtimestamp(entry["fetched_at"], tz=timezone.utc))
+    return save_rows_to_db([product_to_row(product, None, bucket) for product in products], "products")
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay archived raw responses through the current extractors")
+    parser.add_argument("--archive-dir", default=RAW_ARCHIVE_DIR, help="Root of the raw response archive")
+    parser.add_argument("--platform", help="Only this platform")
+    parser.add_argument("--query", help="Only this query (category pages use 'category:<name>')")
+    parser.add_argument("--location", help="Only this store id or 'lat,lon'")
+    parser.add_argument("--kind", choices=["search", "category"], help="Only search or category pages")
+    parser.add_argument("--since", help="Fetched at or after this ISO time (UTC unless an offset is given)")
+    parser.add_argument("--until", help="Fetched before this ISO time")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Extraction processes")
+    parser.add_argument("--dataset-root", help="Write the products to this Parquet dataset")
+    parser.add_argument("--layout", default=DATASET_LAYOUT, help="Parquet dataset layout: wide or normalized")
+    parser.add_argument("--city", default="unknown", help="City partition for the Parquet dataset")
+    parser.add_argument("--save-to-db", action="store_true", help="Write the products to the configured storage backend")
+    args = parser.parse_args()
+
+    archive = RawArchive(args.archive_dir)
+    entries = list(archive.entries(
+        platform=args.platform, query=args.query, location=args.location, kind=args.kind,
+        since=parse_time(args.since), until=parse_time(args.until),
+    ))
+    print(f"Re-extracting {len(entries)} archived responses with {args.workers} workers")
+    if not entries:
+        return
+
+    sink = None
+    if args.dataset_root:
+        from app.utils.dataset_utils import ParquetDatasetSink
+        sink = ParquetDatasetSink(args.dataset_root, layout=args.layout)
+    if args.save_to_db and MATCHING_ENABLED:
+        from app.core.matching import product_matcher
+        product_matcher.load_state()
+
+    stats = Counter()
+    chunksize = max(1, min(64, len(entries) // (args.workers * 4) or 1))
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(args.archive_dir,)) as executor:
+        # map keeps archive order, so the dataset and DB receive pages in fetch order
+        for entry, rows, error in executor.map(reextract_entry, entries, chunksize=chunksize):
+            if error:
+                stats["failed"] += 1
+                print(f"Failed {entry['platform']} '{entry['query']}' at {entry['location']} (#{entry['id']}): {error}")
+                continue
+            stats["responses"] += 1
+            stats["products"] += len(rows)
+            if sink is not None:
+                fetched = datetime.fromtimestamp(entry["fetched_at"], tz=timezone.utc)
+                coordinates = entry["location"] if entry["platform"] in ("blinkit", "bigbasket") else None
+                sink.append(rows, platform=entry["platform"], query=entry["query"], city=args.city,
+                            scrape_date=fetched.date(), coordinates=coordinates)
+            if args.save_to_db and rows and not save_to_db(entry, rows):
+                stats["db_failures"] += 1
+
+    if sink is not None:
+        sink.close()
+        stats["parquet_files"] = sink.files_written
+    if args.save_to_db and MATCHING_ENABLED:
+        product_matcher.save_state()
+    print(", ".join(f"{key}={value}" for key, value in sorted(stats.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,11 +6,14 @@ import time
 from datetime import datetime
 import os
 
+from app.utils.dataset_utils import ParquetDatasetSink
+
 # ===== CONFIGURATION - MODIFY THESE PARAMETERS =====
 QUERIES = ["Fruits", "Vegetables"]  # Add your search queries here
 COORDINATES_CSV = "BangaloreCords1.csv"  # CSV file containing coordinates
 BASE_URL = "http://localhost:8001"  # FastAPI server URL
 DELAY_BETWEEN_REQUESTS = 1  # Seconds to wait between requests
+OUTPUT_FORMAT = "csv"  # "csv" (one file per query/coordinate) or "parquet" (partitioned dataset)
 OUTPUT_DIR = "Testing2"  # Directory to save output files
 # =================================================
 
@@ -90,13 +93,15 @@ def read_coordinates_from_csv(csv_file: str) -> List[Dict[str, str]]:
 
 def scrape_products_for_all_coordinates(queries: List[str], coordinates_data: List[Dict[str, str]], 
                                        base_url: str = "http://localhost:8001", 
-                                       delay: int = 2, output_dir: str = "scraped_data"):
+                                       delay: int = 2, output_dir: str = "scraped_data", output_format: str = "csv"):
     scraper = BlinkitScraper(base_url)
     
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
         print(f"Created output directory: {output_dir}")
     
+    sink = ParquetDatasetSink(output_dir) if output_format == "parquet" else None
+    
     total_products = 0
     successful_coordinates = 0
     
@@ -116,8 +121,11 @@ def scrape_products_for_all_coordinates(queries: List[str], coordinates_data: Li
             print(f"  Found {len(products)} products for '{query}'")
             
             if products:
-                filename = os.path.join(output_dir, f"blinkit_{query.lower()}_{safe_centroid}.csv")
-                scraper.save_to_csv(products, filename)
+                if sink:
+                    sink.append(products, platform="blinkit", query=query, city=city, coordinates=centroid)
+                else:
+                    filename = os.path.join(output_dir, f"blinkit_{query.lower()}_{safe_centroid}.csv")
+                    scraper.save_to_csv(products, filename)
                 total_products += len(products)
                 if j == 1:  # Count successful coordinates only once per coordinate
                     successful_coordinates += 1
@@ -132,6 +140,10 @@ def scrape_products_for_all_coordinates(queries: List[str], coordinates_data: Li
             print(f"Waiting {delay} seconds before next coordinates...")
             time.sleep(delay)
     
+    if sink:
+        sink.close()
+        print(f"Wrote {sink.rows_written} rows in {sink.files_written} Parquet files")
+    
     print(f"\n{'='*50}")
     print(f"SCRAPING COMPLETED")
     print(f"{'='*50}")
@@ -149,6 +161,7 @@ def main():
     print(f"Base URL: {BASE_URL}")
     print(f"Delay: {DELAY_BETWEEN_REQUESTS}s")
     print(f"Output Directory: {OUTPUT_DIR}")
+    print(f"Output Format: {OUTPUT_FORMAT}")
     print("=" * 60)
     
     coordinates_data = read_coordinates_from_csv(COORDINATES_CSV)
@@ -162,7 +175,8 @@ def main():
         coordinates_data=coordinates_data,
         base_url=BASE_URL,
         delay=DELAY_BETWEEN_REQUESTS,
-        output_dir=OUTPUT_DIR
+        output_dir=OUTPUT_DIR,
+        output_format=OUTPUT_FORMAT
     )
 
 if __name__ == "__main__":
@@ -7,11 +7,14 @@ from datetime import datetime
 import os
 import random
 
+from app.utils.dataset_utils import ParquetDatasetSink
+
 # ===== CONFIGURATION - MODIFY THESE PARAMETERS =====
 QUERIES = ["Fruits", "Vegetables"]  # Add your search queries here
 COORDINATES_CSV = "BangaloreCords.csv"  # CSV file containing coordinates
 BASE_URL = "http://localhost:8002"  # FastAPI server URL
 DELAY_BETWEEN_REQUESTS = 1  # Seconds to wait between requests
+OUTPUT_FORMAT = "csv"  # "csv" (one file per query/coordinate) or "parquet" (partitioned dataset)
 OUTPUT_DIR = "Testing1"  # Directory to save output files
 PROXY_FILE = "ProxiesBlinkit1.txt"  # Proxy file path
 # =================================================
@@ -134,13 +137,15 @@ def read_coordinates_from_csv(csv_file: str) -> List[Dict[str, str]]:
 def scrape_products_for_all_coordinates(queries: List[str], coordinates_data: List[Dict[str, str]], 
                                        base_url: str = "http://localhost:8002", 
                                        delay: int = 2, output_dir: str = "scraped_data",
-                                       proxies: List[Dict[str, str]] = None):
+                                       proxies: List[Dict[str, str]] = None, output_format: str = "csv"):
     scraper = BlinkitScraper(base_url, proxies)
     
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
         print(f"Created output directory: {output_dir}")
     
+    sink = ParquetDatasetSink(output_dir) if output_format == "parquet" else None
+    
     total_products = 0
     successful_coordinates = 0
     
@@ -160,8 +165,11 @@ def scrape_products_for_all_coordinates(queries: List[str], coordinates_data: Li
             print(f"  Found {len(products)} products for '{query}'")
             
             if products:
-                filename = os.path.join(output_dir, f"blinkit_{query.lower()}_{safe_centroid}.csv")
-                scraper.save_to_csv(products, filename)
+                if sink:
+                    sink.append(products, platform="blinkit", query=query, city=city, coordinates=centroid)
+                else:
+                    filename = os.path.join(output_dir, f"blinkit_{query.lower()}_{safe_centroid}.csv")
+                    scraper.save_to_csv(products, filename)
                 total_products += len(products)
                 if j == 1:  # Count successful coordinates only once per coordinate
                     successful_coordinates += 1
@@ -176,6 +184,10 @@ def scrape_products_for_all_coordinates(queries: List[str], coordinates_data: Li
             print(f"Waiting {delay} seconds before next coordinates...")
             time.sleep(delay)
     
+    if sink:
+        sink.close()
+        print(f"Wrote {sink.rows_written} rows in {sink.files_written} Parquet files")
+    
     print(f"\n{'='*50}")
     print(f"SCRAPING COMPLETED")
     print(f"{'='*50}")
@@ -193,6 +205,7 @@ def main():
     print(f"Base URL: {BASE_URL}")
     print(f"Delay: {DELAY_BETWEEN_REQUESTS}s")
     print(f"Output Directory: {OUTPUT_DIR}")
+    print(f"Output Format: {OUTPUT_FORMAT}")
     print(f"Proxy File: {PROXY_FILE}")
     print("=" * 60)
     
@@ -212,6 +225,7 @@ def main():
         base_url=BASE_URL,
         delay=DELAY_BETWEEN_REQUESTS,
         output_dir=OUTPUT_DIR,
+        output_format=OUTPUT_FORMAT,
         proxies=proxies
     )
 
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.db.backends import SQLiteBackend, StorageBackend
+
+SNAPSHOT_KEY = ("platform", "store_id", "variant_id", "scraped_at")
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "products.db"))
+    yield backend
+    backend.close()
+
+
+def snapshot(hour, price, variant_id="v1"):
+    return {
+        "platform": "zepto",
+        "store_id": "s1",
+        "variant_id": variant_id,
+        "scraped_at": START + timedelta(hours=hour),
+        "price": price,
+        "in_stock": True,
+    }
+
+
+def test_base_backend_is_abstract():
+    with pytest.raises(TypeError):
+        StorageBackend()
+
+
+def test_upsert_replaces_rows_on_conflict(backend):
+    assert backend.write_rows("product_snapshots", [snapshot(0, 10.0), snapshot(1, 11.0)], conflict_columns=SNAPSHOT_KEY)
+    assert backend.write_rows("product_snapshots", [snapshot(1, 12.5)], conflict_columns=SNAPSHOT_KEY)
+
+    rows = backend.select("product_snapshots", columns=["scraped_at", "price", "in_stock"], order_by="scraped_at")
+    assert [row["price"] for row in rows] == [10.0, 12.5]
+    assert rows[1]["scraped_at"] == (START + timedelta(hours=1)).isoformat()
+    assert rows[1]["in_stock"] == 1
+
+
+def test_select_filters_on_range_and_orders(backend):
+    rows = [snapshot(hour, 10.0 + hour) for hour in range(6)] + [snapshot(2, 99.0, variant_id="v2")]
+    assert backend.write_rows("product_snapshots", rows, conflict_columns=SNAPSHOT_KEY)
+
+    selected = backend.select(
+        "product_snapshots",
+        columns=["price"],
+        eq={"variant_id": "v1"},
+        gte={"scraped_at": (START + timedelta(hours=1)).isoformat()},
+        lte={"scraped_at": (START + timedelta(hours=4)).isoformat()},
+        order_by="scraped_at",
+        descending=True,
+    )
+    assert [row["price"] for row in selected] == [14.0, 13.0, 12.0, 11.0]
+
+    limited = backend.select("product_snapshots", columns=["variant_id"], in_={"variant_id": ["v2"]}, limit=5)
+    assert limited == [{"variant_id": "v2"}]
+
+
+def test_json_columns_round_trip(backend):
+    row = {
+        "id": "p1", "platform": "zepto", "store_id": "s1", "product_id": "p1", "variant_id": "v1",
+        "name": "Milk", "price": 30.0, "images": ["https://cdn.example.com/a.jpg"],
+        "platform_specific_details": {"pack": "1 l"},
+    }
+    assert backend.write_rows("products", [row], conflict_columns=("id",))
+
+    stored = backend.select("products", columns=["images", "platform_specific_details"], eq={"id": "p1"})
+    assert stored == [{"images": ["https://cdn.example.com/a.jpg"], "platform_specific_details": {"pack": "1 l"}}]
+
+
+def test_select_orders_by_several_columns_with_strict_bound(backend):
+    rows = [snapshot(hour, 10.0, variant_id=variant) for hour in range(2) for variant in ("v2", "v1")]
+    assert backend.write_rows("product_snapshots", rows, conflict_columns=SNAPSHOT_KEY)
+
+    ordered = backend.select("product_snapshots", columns=["variant_id"], order_by=["scraped_at", "variant_id"])
+    assert [row["variant_id"] for row in ordered] == ["v1", "v2", "v1", "v2"]
+
+    later = backend.select("product_snapshots", columns=["variant_id"], gt={"scraped_at": START.isoformat()}, order_by="variant_id")
+    assert [row["variant_id"] for row in later] == ["v1", "v2"]
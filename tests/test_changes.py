@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+from app.core.changes import ChangeDetector
+
+
+def product(variant_id, price, in_stock=True, rank=1, store_id="s1"):
+    return SimpleNamespace(store_id=store_id, variant_id=variant_id, product_id=variant_id, price=price, mrp=price,
+                           in_stock=in_stock, organic_rank=rank, inventory=None, name=variant_id, brand=None, category=None)
+
+
+def types_of(events):
+    return sorted((e["variant_id"], e["change_type"]) for e in events)
+
+
+def test_first_scrape_is_a_baseline_then_changes_are_reported():
+    detector = ChangeDetector()
+    assert detector.diff("zepto", "s1", "milk", [product("a", 10), product("b", 20)]) == []
+
+    events = detector.diff("zepto", "s1", "milk", [product("a", 12), product("b", 20, in_stock=False), product("c", 5)])
+    assert types_of(events) == [("a", "price_up"), ("b", "stock_out"), ("c", "new_listing")]
+
+
+def test_full_scrape_reports_missing_variants_as_delisted():
+    detector = ChangeDetector()
+    detector.diff("zepto", "s1", "milk", [product("a", 10), product("b", 20)])
+    assert types_of(detector.diff("zepto", "s1", "milk", [product("a", 10)])) == [("b", "delisted")]
+
+
+def test_partial_scrape_does_not_delist_unseen_variants():
+    detector = ChangeDetector()
+    detector.diff("zepto", "s1", "milk", [product("a", 10), product("b", 20)])
+
+    events = detector.diff("zepto", "s1", "milk", [product("a", 11)], partial=True)
+    assert types_of(events) == [("a", "price_up")]
+    # Membership is kept, so b is still delisted once a complete scrape misses it
+    assert types_of(detector.diff("zepto", "s1", "milk", [product("a", 11)])) == [("b", "delisted")]
+
+
+def test_seq_continues_after_reload(tmp_path):
+    path = str(tmp_path / "state.json.gz")
+    detector = ChangeDetector()
+    detector.diff("zepto", "s1", "milk", [product("a", 10)])
+    last = detector.diff("zepto", "s1", "milk", [product("a", 12)])[-1]["seq"]
+    detector.save_state(path)
+
+    restarted = ChangeDetector()
+    restarted.load_state(path)
+    events = restarted.diff("zepto", "s1", "milk", [product("a", 15)])
+    assert events and events[0]["seq"] == last + 1
+    assert restarted.recent(after_seq=last) == events
@@ -0,0 +1,30 @@
+import pytest
+
+from app.api.changes import _cursor, _persisted_changes
+from app.db.backends import SQLiteBackend
+from app.db.utils import CHANGES_TABLE
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "changes.db"))
+    yield backend
+    backend.close()
+
+
+def change(event_id, detected_at):
+    return {"id": event_id, "detected_at": detected_at, "change_type": "price_up", "platform": "zepto", "store_id": "s1"}
+
+
+def test_cursor_pages_through_a_burst_sharing_one_timestamp(backend):
+    burst = "2024-01-01T10:00:00+00:00"
+    rows = [change(f"e{i}", burst) for i in range(5)] + [change("f0", "2024-01-01T10:00:01+00:00")]
+    assert backend.write_rows(CHANGES_TABLE, rows, conflict_columns=("id",))
+
+    seen = []
+    page = _persisted_changes(backend, {}, "2024-01-01T00:00:00+00:00", None, 2)
+    while page:
+        seen += [event["id"] for event in page]
+        detected_at, _, last_id = _cursor(page[-1]).rpartition("|")
+        page = _persisted_changes(backend, {}, detected_at, last_id, 2)
+    assert seen == ["e0", "e1", "e2", "e3", "e4", "f0"]
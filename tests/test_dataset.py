@@ -0,0 +1,81 @@
+import os
+from datetime import date
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from app.utils import dataset_utils
+from app.utils.dataset_utils import DATASET_FIELDS, ParquetDatasetSink, compact_partitions, load_dataset
+
+
+def store_rows(store_id, name, image, price):
+    return [
+        {"store_id": store_id, "product_id": "p1", "variant_id": "v1", "name": name, "price": price,
+         "quantity": "500 g", "images": f"https://cdn.example.com/{image}.jpg"},
+        {"store_id": store_id, "product_id": "p2", "variant_id": "v2", "name": "Bread", "price": 40.0,
+         "quantity": "1 pc", "images": "https://cdn.example.com/bread.jpg"},
+    ]
+
+
+def write(root, layout):
+    # Two stores list v1 with different names and images on the same day
+    with ParquetDatasetSink(str(root), layout=layout) as sink:
+        sink.append(store_rows("s1", "Tomato", "tomato-a", 30.0), "zepto", "tomato", "blr", date(2024, 1, 1))
+        sink.append(store_rows("s2", "Tomato Hybrid", "tomato-b", 32.0), "zepto", "tomato", "blr", date(2024, 1, 1))
+        sink.append(store_rows("s1", "Tomato", "tomato-a", 31.0), "zepto", "tomato", "blr", date(2024, 1, 2))
+
+
+def as_rows(table):
+    columns = [c for c in DATASET_FIELDS if c in table.column_names] + ["date"]
+    return sorted(tuple(str(row.get(c)) for c in columns) for row in table.to_pylist())
+
+
+def test_normalized_layout_matches_wide_for_multi_store_rows(tmp_path):
+    write(tmp_path / "wide", "wide")
+    write(tmp_path / "normalized", "normalized")
+
+    wide = load_dataset(str(tmp_path / "wide"))
+    normalized = load_dataset(str(tmp_path / "normalized"))
+    assert normalized.num_rows == wide.num_rows == 6
+    assert as_rows(normalized) == as_rows(wide)
+
+    by_store = {(r["store_id"], r["date"]): (r["name"], r["images"]) for r in normalized.to_pylist() if r["variant_id"] == "v1"}
+    assert by_store[("s2", "2024-01-01")] == ("Tomato Hybrid", ["https://cdn.example.com/tomato-b.jpg"])
+    assert by_store[("s1", "2024-01-02")] == ("Tomato", ["https://cdn.example.com/tomato-a.jpg"])
+
+
+def test_compaction_keeps_every_dimension_version(tmp_path):
+    root = tmp_path / "normalized"
+    write(root, "normalized")
+    write(root, "normalized")
+    before = as_rows(load_dataset(str(root)))
+
+    assert compact_partitions(str(root)) > 0
+    assert as_rows(load_dataset(str(root))) == before
+
+
+@pytest.mark.parametrize("crash_after", [1, 2])
+def test_compaction_recovers_an_interrupted_swap(tmp_path, monkeypatch, crash_after):
+    root = tmp_path / "wide"
+    write(root, "wide")
+    write(root, "wide")
+    before = as_rows(load_dataset(str(root)))
+
+    # Crash between the two renames of the first swap, or before the second partition is retired
+    renames, rename = [], os.rename
+
+    def crashing_rename(source, target):
+        if len(renames) == crash_after:
+            raise OSError("crash")
+        renames.append(source)
+        rename(source, target)
+
+    monkeypatch.setattr(dataset_utils.os, "rename", crashing_rename)
+    with pytest.raises(OSError):
+        compact_partitions(str(root))
+    monkeypatch.setattr(dataset_utils.os, "rename", rename)
+
+    assert compact_partitions(str(root)) > 0
+    assert as_rows(load_dataset(str(root))) == before
+    assert not [d for _, dirs, _ in os.walk(root) for d in dirs if d.startswith(".")]
@@ -0,0 +1,54 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.db import utils
+from app.db.backends import SQLiteBackend
+
+BUCKET = datetime(2024, 1, 1, tzinfo=timezone.utc).isoformat()
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "products.db"))
+    yield backend
+    backend.close()
+
+
+def product_row(store_id, variant_id, name, image, price):
+    return {"platform": "zepto", "store_id": store_id, "product_id": variant_id, "variant_id": variant_id,
+            "name": name, "price": price, "images": [f"https://cdn.example.com/{image}.jpg"], "snapshot_bucket": BUCKET}
+
+
+def save_normalized(backend, rows):
+    dims, prefixes, attr_hashes = utils.dim_rows(rows)
+    assert utils.save_dimensions(backend, dims, prefixes)
+    assert utils.save_snapshots(backend, rows, attr_hashes)
+
+
+def test_dimensions_keep_one_version_per_store_variant(backend):
+    rows = [product_row("s1", "dim-v1", "Tomato", "tomato-a", 30.0), product_row("s2", "dim-v1", "Tomato Hybrid", "tomato-b", 32.0)]
+    save_normalized(backend, rows)
+
+    versions = backend.select("product_dim", columns=["name", "attr_hash"], eq={"variant_id": "dim-v1"})
+    assert sorted(v["name"] for v in versions) == ["Tomato", "Tomato Hybrid"]
+
+    names = {v["attr_hash"]: v["name"] for v in versions}
+    snapshots = backend.select("product_snapshots", columns=["store_id", "attr_hash"], eq={"variant_id": "dim-v1"})
+    assert {s["store_id"]: names[s["attr_hash"]] for s in snapshots} == {"s1": "Tomato", "s2": "Tomato Hybrid"}
+
+
+def test_known_versions_are_not_rewritten(backend):
+    rows = [product_row("s1", "dim-v2", "Onion", "onion-a", 20.0), product_row("s2", "dim-v2", "Onion Red", "onion-b", 21.0)]
+    save_normalized(backend, rows)
+
+    dims, _, _ = utils.dim_rows(rows)
+    assert utils._changed_dims(backend, dims) == []
+
+
+def test_snapshot_partitions_are_created_a_day_ahead(backend, monkeypatch):
+    days = []
+    monkeypatch.setattr(backend, "ensure_partition", lambda table, day: days.append(day))
+    monkeypatch.setattr(utils, "_partitioned_days", set())
+    assert utils.save_snapshots(backend, [product_row("s1", "dim-v3", "Potato", "potato", 25.0)])
+    assert days == ["2024-01-01", "2024-01-02"]
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.api import history
+from app.db.backends import SQLiteBackend
+from app.db.utils import SNAPSHOT_KEY, SNAPSHOT_TABLE
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    backend = SQLiteBackend(str(tmp_path / "history.db"))
+    rows = [{"platform": "zepto", "store_id": "s1", "variant_id": "v1", "scraped_at": START + timedelta(hours=h), "price": 10.0 + h}
+            for h in range(10)]
+    assert backend.write_rows(SNAPSHOT_TABLE, rows, conflict_columns=SNAPSHOT_KEY)
+    monkeypatch.setattr(history, "get_storage_backend", lambda: backend)
+    yield backend
+    backend.close()
+
+
+def test_history_downsamples_into_buckets(backend):
+    result = history.product_history("zepto", "v1", start=START, end=START + timedelta(hours=10), interval="6h", max_points=500)
+    points = result["series"][0]["points"]
+    assert result["truncated"] is False
+    assert [(p["samples"], p["price_min"], p["price_max"], p["price_last"]) for p in points] == [(6, 10.0, 15.0, 15.0), (4, 16.0, 19.0, 19.0)]
+
+
+def test_long_ranges_keep_the_newest_rows(backend, monkeypatch):
+    monkeypatch.setattr(history, "MAX_HISTORY_ROWS", 4)
+    result = history.product_history("zepto", "v1", start=START, end=START + timedelta(hours=10), interval="raw", max_points=500)
+    assert result["truncated"] is True
+    assert result["covered_from"] == (START + timedelta(hours=6)).isoformat()
+    assert [p["price_last"] for p in result["series"][0]["points"]] == [16.0, 17.0, 18.0, 19.0]
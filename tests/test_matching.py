@@ -0,0 +1,45 @@
+from app.core.matching import ProductMatcher, name_tokens, normalize_pack, packs_compatible
+
+
+def test_normalize_pack_and_tolerance():
+    assert normalize_pack("2 x 200 ml") == ("l", 0.4)
+    assert normalize_pack(None) is None
+    assert packs_compatible(("kg", 1.0), normalize_pack("999 g"))
+    assert not packs_compatible(("kg", 1.0), ("kg", 0.5))
+
+
+def test_name_tokens_drop_brand_sizes_and_stopwords():
+    assert name_tokens("Amul Taaza Toned Fresh Milk 500 ml", "amul") == frozenset({"taaza", "toned", "milk"})
+
+
+def test_same_product_across_platforms_shares_a_canonical_id():
+    matcher = ProductMatcher()
+    zepto = matcher.assign("zepto", "z1", "Amul Taaza Toned Milk", "Amul", "500 ml")
+    blinkit = matcher.assign("blinkit", "b1", "Amul Taaza Toned Fresh Milk (Pouch)", "Amul", "500 ml")
+    assert zepto == blinkit
+    assert matcher.stats()["cross_platform"] == 1
+
+
+def test_different_pack_sizes_or_brands_stay_apart():
+    matcher = ProductMatcher()
+    half_litre = matcher.assign("zepto", "z1", "Amul Taaza Toned Milk", "Amul", "500 ml")
+    assert matcher.assign("blinkit", "b1", "Amul Taaza Toned Milk", "Amul", "1 l") != half_litre
+    assert matcher.assign("blinkit", "b2", "Nandini Toned Milk", "Nandini", "500 ml") != half_litre
+
+
+def test_brand_inferred_from_the_name():
+    matcher = ProductMatcher()
+    canonical = matcher.assign("zepto", "z1", "Amul Taaza Toned Milk", "Amul", "500 ml")
+    assert matcher.assign("instamart", "i1", "Amul Taaza Toned Milk 500 ml") == canonical
+
+
+def test_assignments_survive_save_and_load(tmp_path):
+    path = str(tmp_path / "match_index.json.gz")
+    matcher = ProductMatcher()
+    canonical = matcher.assign("zepto", "z1", "Amul Taaza Toned Milk", "Amul", "500 ml")
+    matcher.save_state(path)
+
+    reloaded = ProductMatcher()
+    reloaded.load_state(path)
+    assert reloaded.canonical_id("zepto", "z1") == canonical
+    assert reloaded.assign("blinkit", "b1", "Amul Taaza Toned Milk", "Amul", "500 ml") == canonical
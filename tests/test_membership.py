@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+from app.core.membership import StoreMembership
+
+
+def products(*variant_ids, store_id="s1"):
+    return [SimpleNamespace(store_id=store_id, variant_id=v, new_listing=None) for v in variant_ids]
+
+
+def test_first_scrape_of_a_query_is_a_baseline(tmp_path):
+    membership = StoreMembership(str(tmp_path))
+    first = products("v1", "v2")
+    assert membership.flag_new_listings("zepto", "blr", "tomato", first) == 0
+    assert [p.new_listing for p in first] == [False, False]
+
+    second = products("v1", "v3")
+    assert membership.flag_new_listings("zepto", "blr", "tomato", second) == 1
+    assert [p.new_listing for p in second] == [False, True]
+
+    # Another query in the same store starts with its own baseline
+    assert membership.flag_new_listings("zepto", "blr", "onion", products("v4")) == 0
+
+
+def test_baseline_decision_holds_across_pages(tmp_path):
+    membership = StoreMembership(str(tmp_path))
+    baselines = {}
+    assert membership.flag_new_listings("zepto", "blr", "tomato", products("v1"), baselines=baselines) == 0
+    assert membership.flag_new_listings("zepto", "blr", "tomato", products("v2"), baselines=baselines) == 0
+    assert baselines == {"s1": True}
+
+
+def test_saved_filters_keep_the_baseline(tmp_path):
+    membership = StoreMembership(str(tmp_path))
+    membership.flag_new_listings("zepto", "blr", "tomato", products("v1"))
+    assert membership.save_state() == 1
+    assert membership.save_state() == 0
+
+    reloaded = StoreMembership(str(tmp_path))
+    batch = products("v1", "v2")
+    assert reloaded.flag_new_listings("zepto", "blr", "tomato", batch) == 1
+    assert [p.new_listing for p in batch] == [False, True]
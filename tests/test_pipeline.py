@@ -0,0 +1,22 @@
+import asyncio
+import threading
+
+from app.core import pipeline
+
+
+def test_async_handler_runs_the_stages_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def fake_process(platform, location, query, products, **diff_options):
+        threads.append((threading.get_ident(), diff_options))
+        return []
+
+    monkeypatch.setattr(pipeline, "_process", fake_process)
+
+    async def run():
+        await pipeline.handle_scraped_products_async("zepto", "s1", "milk", [], partial=True)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    assert threads and threads[0][0] != loop_thread
+    assert threads[0][1] == {"partial": True}
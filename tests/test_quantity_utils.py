@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils import quantity_utils
+from app.utils.quantity_utils import parse_quantities, parse_quantity, quantity_fields, set_unit_prices, unit_columns
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("500 g", (0.5, "kg")),
+    ("1.5kg", (1.5, "kg")),
+    ("2 x 200 ml", (0.4, "l")),
+    ("200 ml x 2", (0.4, "l")),
+    ("Pack of 2 (200 g each)", (0.4, "kg")),
+    ("Pack of 6 (6 pcs)", (6.0, "pc")),
+    ("Pack of 4", (4.0, "pc")),
+    ("1,000 ml", (1.0, "l")),
+    ("family size", (None, None)),
+    (None, (None, None)),
+])
+def test_parse_quantity(text, expected):
+    assert parse_quantity(text) == expected
+
+
+def test_column_mode_parses_each_distinct_value_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(quantity_utils, "parse_quantity", lambda text: calls.append(text) or (1.0, "kg"))
+
+    values, units = parse_quantities(["1 kg", "1 kg", None, "1 kg", None])
+    assert calls == ["1 kg", None]
+    assert values == [1.0] * 5 and units == ["kg"] * 5
+
+
+def test_column_mode_matches_row_mode():
+    quantities = ["500 g", "2 x 200 ml", None, "500 g", "Pack of 4", "odd"]
+    prices = [50, 80, 10, None, 100, 5]
+    columns = unit_columns(quantities, prices)
+    rows = [quantity_fields(q, p) for q, p in zip(quantities, prices)]
+    assert [dict(zip(columns, values)) for values in zip(*columns.values())] == rows
+
+
+def test_set_unit_prices_fills_models():
+    products = [SimpleNamespace(quantity="500 g", price=40.0), SimpleNamespace(quantity=None, price=10.0)]
+    set_unit_prices(products)
+    assert (products[0].quantity_value, products[0].quantity_unit, products[0].unit_price) == (0.5, "kg", 80.0)
+    assert products[1].quantity_value is None and products[1].unit_price is None
@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from app.core.transport import CurlCliTransport, Transport, TransportRequest
+
+
+def fake_curl(tmp_path, output: bytes) -> str:
+    (tmp_path / "response").write_bytes(output)
+    script = tmp_path / "curl"
+    script.write_text(f"#!/bin/sh\ncat > /dev/null\ncat '{tmp_path / 'response'}'\n")
+    os.chmod(script, 0o755)
+    return str(script)
+
+
+def test_transport_requires_send():
+    with pytest.raises(TypeError):
+        Transport()
+
+
+def test_curl_skips_interim_and_proxy_connect_blocks(tmp_path):
+    output = (b"HTTP/1.1 200 Connection established\r\n\r\n"
+              b"HTTP/1.1 100 Continue\r\n\r\n"
+              b"HTTP/2 200\r\ncontent-type: application/json\r\n\r\n"
+              b'{"ok": true}')
+    response = CurlCliTransport(fake_curl(tmp_path, output)).send(TransportRequest("POST", "https://example.com", data="{}"))
+    assert response.status_code == 200
+    assert response.headers == {"content-type": "application/json"}
+    assert response.json() == {"ok": True}
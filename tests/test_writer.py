@@ -0,0 +1,78 @@
+import asyncio
+import json
+import threading
+import time
+
+from app.db import writer as writer_module
+from app.db.writer import BackgroundDBWriter
+
+
+def spill_entry(table, rows):
+    return json.dumps({"table": table, "rows": rows}) + "\n"
+
+
+def make_writer(tmp_path, **options):
+    return BackgroundDBWriter(queue_size=100, batch_size=10, concurrency=2, max_retries=2, retry_backoff=0,
+                              spill_path=str(tmp_path / "spill.ndjson"), **options)
+
+
+def test_failed_batches_are_spilled_and_replayed_on_next_start(tmp_path, monkeypatch):
+    saved = []
+    monkeypatch.setattr(writer_module, "save_rows_to_db", lambda rows, table: False)
+
+    async def first_run():
+        writer = make_writer(tmp_path)
+        await writer.start()
+        await writer.submit([{"id": i} for i in range(15)], "products")
+        await writer.stop(timeout=5)
+        return writer
+
+    assert asyncio.run(first_run()).stats["rows_spilled"] == 15
+
+    monkeypatch.setattr(writer_module, "save_rows_to_db", lambda rows, table: saved.extend(rows) or True)
+
+    async def second_run():
+        writer = make_writer(tmp_path)
+        await writer.start()
+        await writer.stop(timeout=5)
+
+    asyncio.run(second_run())
+    assert sorted(row["id"] for row in saved) == list(range(15))
+    assert not (tmp_path / "spill.ndjson").exists() and not (tmp_path / "spill.ndjson.replay").exists()
+
+
+def test_interrupted_replay_file_is_replayed_with_newer_spills(tmp_path, monkeypatch):
+    saved = []
+    monkeypatch.setattr(writer_module, "save_rows_to_db", lambda rows, table: saved.extend(rows) or True)
+    # A replay that crashed mid-way, with a truncated last line, plus rows spilled by the run after it
+    (tmp_path / "spill.ndjson.replay").write_text(spill_entry("products", [{"id": 1}]) + '{"table": "prod')
+    (tmp_path / "spill.ndjson").write_text(spill_entry("products", [{"id": 2}]))
+
+    async def run():
+        writer = make_writer(tmp_path)
+        await writer.start()
+        await writer.stop(timeout=5)
+
+    asyncio.run(run())
+    assert sorted(row["id"] for row in saved) == [1, 2]
+    assert not (tmp_path / "spill.ndjson.replay").exists()
+
+
+def test_stop_spills_in_flight_rows_within_one_timeout(tmp_path, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(writer_module, "save_rows_to_db", lambda rows, table: release.wait(5))
+
+    async def run():
+        writer = make_writer(tmp_path)
+        await writer.start()
+        await writer.submit([{"id": i} for i in range(30)], "products")
+        start = time.perf_counter()
+        await writer.stop(timeout=0.5)
+        elapsed = time.perf_counter() - start
+        release.set()
+        return writer, elapsed
+
+    writer, elapsed = asyncio.run(run())
+    assert elapsed < 1.0
+    spilled = [row["id"] for line in (tmp_path / "spill.ndjson").read_text().splitlines() for row in json.loads(line)["rows"]]
+    assert sorted(spilled) == list(range(30))